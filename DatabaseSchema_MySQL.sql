@@ -3,11 +3,15 @@
 
 SET FOREIGN_KEY_CHECKS = 0;
 DROP TABLE IF EXISTS user_passwords;
+DROP TABLE IF EXISTS user_budget_features;
 DROP TABLE IF EXISTS user_expense_habit;
 DROP TABLE IF EXISTS budget_expense_items;
 DROP TABLE IF EXISTS admin_logs;
+DROP TABLE IF EXISTS blockchain_verification_checkpoints;
+DROP TABLE IF EXISTS blockchain_tip;
 DROP TABLE IF EXISTS blockchain_transactions;
 DROP TABLE IF EXISTS blockchain;
+DROP TABLE IF EXISTS user_daily_rollup;
 DROP TABLE IF EXISTS transactions;
 DROP TABLE IF EXISTS contact_info;
 DROP TABLE IF EXISTS fraud_list;
@@ -122,13 +126,34 @@ CREATE TABLE `transactions` (
   `note` TEXT,
   `type` ENUM('Transfer', 'Deposit', 'Withdrawal', 'Payment', 'Refund'),
   `location` VARCHAR(255),
-  INDEX `idx_sender_id` (`sender_id`),
-  INDEX `idx_receiver_id` (`receiver_id`),
+  `category` VARCHAR(50),
+  INDEX `idx_sender_timestamp` (`sender_id`, `timestamp`),
+  INDEX `idx_sender_category` (`sender_id`, `category`, `timestamp`),
+  INDEX `idx_receiver_timestamp` (`receiver_id`, `timestamp`),
   INDEX `idx_timestamp` (`timestamp`),
   FOREIGN KEY (`sender_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE,
   FOREIGN KEY (`receiver_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+CREATE TABLE `user_daily_rollup` (
+  `user_id` CHAR(36) NOT NULL,
+  `day` DATE NOT NULL,
+  `direction` ENUM('sent', 'received') NOT NULL,
+  `type` VARCHAR(20) NOT NULL DEFAULT '',
+  `payment_method` VARCHAR(100) NOT NULL DEFAULT '',
+  `tx_count` INT NOT NULL DEFAULT 0,
+  `total_amount` DECIMAL(15,2) NOT NULL DEFAULT 0,
+  `sum_squares` DECIMAL(30,4) NOT NULL DEFAULT 0,
+  `business_hours_count` INT NOT NULL DEFAULT 0,
+  `small_count` INT NOT NULL DEFAULT 0,
+  `medium_count` INT NOT NULL DEFAULT 0,
+  `large_count` INT NOT NULL DEFAULT 0,
+  `last_timestamp` DATETIME,
+  PRIMARY KEY (`user_id`, `day`, `direction`, `type`, `payment_method`),
+  INDEX `idx_day` (`day`),
+  FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE `blockchain_transactions` (
   `id` CHAR(36) PRIMARY KEY,
   `user_id` CHAR(36),
@@ -136,8 +161,15 @@ CREATE TABLE `blockchain_transactions` (
   `current_balance` DECIMAL(15,2),
   `method` VARCHAR(100),
   `timestamp` DATETIME,
+  `seq` BIGINT NOT NULL AUTO_INCREMENT,
+  `block_index` INT NULL,
+  `leaf_index` INT NULL,
+  `merkle_proof` TEXT NULL,
+  UNIQUE KEY `uk_seq` (`seq`),
   INDEX `idx_user_id` (`user_id`),
   INDEX `idx_timestamp` (`timestamp`),
+  INDEX `idx_user_seq` (`user_id`, `seq`),
+  INDEX `idx_pending` (`block_index`, `seq`),
   FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -149,11 +181,35 @@ CREATE TABLE `blockchain` (
   `previous_hash` VARCHAR(255),
   `hash` VARCHAR(255),
   `transaction_id` CHAR(36),
+  `hash_version` TINYINT NOT NULL DEFAULT 0,
+  `merkle_root` VARCHAR(64) NULL,
+  `tx_count` INT NOT NULL DEFAULT 1,
   INDEX `idx_transaction_id` (`transaction_id`),
   INDEX `idx_index` (`index`),
   FOREIGN KEY (`transaction_id`) REFERENCES `blockchain_transactions` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+CREATE TABLE `blockchain_tip` (
+  `id` TINYINT PRIMARY KEY,
+  `last_index` INT NOT NULL,
+  `last_hash` VARCHAR(255) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO `blockchain_tip` (`id`, `last_index`, `last_hash`) VALUES (1, -1, '0');
+
+CREATE TABLE `blockchain_verification_checkpoints` (
+  `user_id` CHAR(36) PRIMARY KEY,
+  `last_seq` BIGINT NOT NULL DEFAULT 0,
+  `last_index` INT NOT NULL,
+  `last_hash` VARCHAR(255) NOT NULL,
+  `running_balance` DECIMAL(15,2) NOT NULL,
+  `last_timestamp` DATETIME,
+  `verified_blocks` INT NOT NULL DEFAULT 0,
+  `updated_at` DATETIME,
+  `full_verified_at` DATETIME,
+  FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE `admin_logs` (
   `id` CHAR(36) PRIMARY KEY,
   `admin_id` CHAR(36),
@@ -200,6 +256,16 @@ CREATE TABLE `user_expense_habit` (
   FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+CREATE TABLE `user_budget_features` (
+  `user_id` CHAR(36) PRIMARY KEY,
+  `schema_version` CHAR(16) NOT NULL,
+  `features` VARBINARY(255) NOT NULL,
+  `monthly_income` DOUBLE NOT NULL,
+  `updated_at` DATETIME NOT NULL,
+  INDEX `idx_schema_version` (`schema_version`),
+  FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE `user_passwords` (
   `user_id` VARCHAR(255) PRIMARY KEY,
   `password` VARCHAR(255)
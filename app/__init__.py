@@ -2,6 +2,19 @@ from flask import Flask
 import pymysql
 import json
 from .routes import register_blueprints
+from .db_pool import init_pool
+from .utils.event_log import init_event_log
+from .utils.blockchain_utils import start_chain_reverification_job
+from .utils.block_appender import init_block_appender
+from .utils.fraud_cache import init_fraud_cache
+from .utils.spend_counters import init_spend_counters
+from .utils.rollup_utils import init_rollup_commands
+from .utils.overspending_detector import init_category_commands
+from .utils.ml_budget_generator import init_ml_budget_commands
+from .utils.model_registry import init_model_registry
+from .utils.training_jobs import init_training_jobs
+from .utils.budget_lookup import init_budget_lookup
+from .utils.feature_store import init_feature_store
 
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -9,16 +22,14 @@ class CustomJSONEncoder(json.JSONEncoder):
             return dict(obj)
         return super(CustomJSONEncoder, self).default(obj)
 
-def get_db_connection():
-    """Get MySQL database connection"""
-    from flask import current_app
-    
+def connect_mysql(config):
+    """Open a new MySQL connection from app config"""
     connection = pymysql.connect(
-        host=current_app.config['MYSQL_HOST'],
-        port=current_app.config['MYSQL_PORT'],
-        user=current_app.config['MYSQL_USER'],
-        password=current_app.config['MYSQL_PASSWORD'],
-        database=current_app.config['MYSQL_DATABASE'],
+        host=config['MYSQL_HOST'],
+        port=config['MYSQL_PORT'],
+        user=config['MYSQL_USER'],
+        password=config['MYSQL_PASSWORD'],
+        database=config['MYSQL_DATABASE'],
         charset='utf8mb4',
         cursorclass=pymysql.cursors.DictCursor,
         autocommit=False,  # We'll handle commits manually
@@ -27,11 +38,33 @@ def get_db_connection():
     )
     return connection
 
+def get_db_connection():
+    """Get MySQL database connection (pooled unless MYSQL_POOL_ENABLED is off)"""
+    from flask import current_app
+    
+    pool = getattr(current_app, 'db_pool', None)
+    if pool is None:
+        return connect_mysql(current_app.config)
+    return pool.connection()
+
 def create_app():
     app = Flask(__name__)
     app.json_encoder = CustomJSONEncoder
     app.config.from_object('app.config.Config')
     app.get_db_connection = staticmethod(get_db_connection)
+    init_pool(app, lambda: connect_mysql(app.config))
+    init_event_log(app)
+    init_fraud_cache(app)
+    init_spend_counters(app)
+    init_block_appender(app)
+    start_chain_reverification_job(app)
+    init_rollup_commands(app)
+    init_category_commands(app)
+    init_model_registry(app)
+    init_training_jobs(app)
+    init_ml_budget_commands(app)
+    init_budget_lookup(app)
+    init_feature_store(app)
     
     # Add custom filter to handle MySQL result objects in templates
     @app.template_filter('tojson_safe')
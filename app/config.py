@@ -10,6 +10,81 @@ class Config:
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '6251wnwnwn')
     MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE', 'fin_guard')
     
+    # Connection pool (see app/db_pool.py)
+    MYSQL_POOL_ENABLED = os.environ.get('MYSQL_POOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    MYSQL_POOL_MIN_SIZE = int(os.environ.get('MYSQL_POOL_MIN_SIZE', 2))
+    MYSQL_POOL_MAX_SIZE = int(os.environ.get('MYSQL_POOL_MAX_SIZE', 10))
+    MYSQL_POOL_IDLE_TIMEOUT = int(os.environ.get('MYSQL_POOL_IDLE_TIMEOUT', 300))
+    MYSQL_POOL_CHECKOUT_TIMEOUT = int(os.environ.get('MYSQL_POOL_CHECKOUT_TIMEOUT', 10))
+    MYSQL_POOL_HEALTH_CHECK_INTERVAL = int(os.environ.get('MYSQL_POOL_HEALTH_CHECK_INTERVAL', 5))
+    
+    # Background event log (see app/utils/event_log.py); set the URL to also
+    # forward batches to the /log endpoint
+    EVENT_LOG_QUEUE_SIZE = int(os.environ.get('EVENT_LOG_QUEUE_SIZE', 10000))
+    EVENT_LOG_BATCH_SIZE = int(os.environ.get('EVENT_LOG_BATCH_SIZE', 100))
+    EVENT_LOG_HTTP_SINK_URL = os.environ.get('EVENT_LOG_HTTP_SINK_URL')
+    
+    # Transfers verify only the ledger blocks appended since each user's
+    # checkpoint; this background sweep re-verifies every chain in full (0 = off)
+    BLOCKCHAIN_REVERIFY_INTERVAL = int(os.environ.get('BLOCKCHAIN_REVERIFY_INTERVAL', 6 * 60 * 60))
+    
+    # Block appender (see app/utils/block_appender.py): chains pending ledger
+    # entries under the chain-tip lock, up to BATCH_SIZE blocks per commit
+    BLOCKCHAIN_APPENDER_ENABLED = os.environ.get('BLOCKCHAIN_APPENDER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    BLOCKCHAIN_APPEND_BATCH_SIZE = int(os.environ.get('BLOCKCHAIN_APPEND_BATCH_SIZE', 500))
+    BLOCKCHAIN_APPEND_POLL_INTERVAL = float(os.environ.get('BLOCKCHAIN_APPEND_POLL_INTERVAL', 1.0))
+    
+    # Full-chain verification (see app/utils/chain_verifier.py); 0 workers = one per CPU
+    BLOCKCHAIN_VERIFY_CHUNK_SIZE = int(os.environ.get('BLOCKCHAIN_VERIFY_CHUNK_SIZE', 5000))
+    BLOCKCHAIN_VERIFY_WORKERS = int(os.environ.get('BLOCKCHAIN_VERIFY_WORKERS', 0))
+    
+    # IANA timezone transaction timestamps are stored in (default: server local time);
+    # /api/transaction-report converts its ?tz= bucket edges into it
+    DB_TIMEZONE = os.environ.get('DB_TIMEZONE')
+    
+    # Flagged-user set (see app/utils/fraud_cache.py): reloaded from fraud_list at
+    # most this many seconds apart; local writes update it immediately
+    FRAUD_CACHE_TTL = float(os.environ.get('FRAUD_CACHE_TTL', 60))
+    
+    # Month-to-date spend counters for overspending checks (see
+    # app/utils/spend_counters.py): 'local' per-process LRU or 'redis' (shared);
+    # counters are re-read from SQL at most SPEND_COUNTER_TTL seconds apart
+    SPEND_COUNTER_BACKEND = os.environ.get('SPEND_COUNTER_BACKEND', 'local')
+    SPEND_COUNTER_REDIS_URL = os.environ.get('SPEND_COUNTER_REDIS_URL', 'redis://localhost:6379/0')
+    SPEND_COUNTER_MAX_ENTRIES = int(os.environ.get('SPEND_COUNTER_MAX_ENTRIES', 100000))
+    SPEND_COUNTER_TTL = float(os.environ.get('SPEND_COUNTER_TTL', 300))
+    
+    # Budget model registry (see app/utils/model_registry.py): versions live under
+    # ML_MODEL_DIR (default <repo>/models); each process re-checks for a newly
+    # published version at most every ML_MODEL_CHECK_INTERVAL seconds
+    ML_MODEL_DIR = os.environ.get('ML_MODEL_DIR')
+    ML_MODEL_MMAP = os.environ.get('ML_MODEL_MMAP', 'false').lower() in ('1', 'true', 'yes')
+    ML_MODEL_CHECK_INTERVAL = float(os.environ.get('ML_MODEL_CHECK_INTERVAL', 5))
+    ML_MODEL_KEEP_VERSIONS = int(os.environ.get('ML_MODEL_KEEP_VERSIONS', 3))
+
+    # Background model training (see app/utils/training_jobs.py): category models
+    # are fitted in ML_TRAINING_WORKERS processes; a job lock untouched for
+    # ML_TRAINING_TIMEOUT seconds is considered abandoned
+    ML_TRAINING_WORKERS = int(os.environ.get('ML_TRAINING_WORKERS', min(4, os.cpu_count() or 1)))
+    ML_TRAINING_TIMEOUT = float(os.environ.get('ML_TRAINING_TIMEOUT', 3600))
+    ML_TRAINING_KEEP_JOBS = int(os.environ.get('ML_TRAINING_KEEP_JOBS', 20))
+
+    # What training fits (see app/utils/multi_output_budget.py): 'per_category'
+    # (a scaler and forest per category), 'multi_forest' or 'multi_boosting'
+    ML_BUDGET_MODEL_KIND = os.environ.get('ML_BUDGET_MODEL_KIND', 'per_category')
+
+    # Training rows fetched per server-side cursor round trip (see app/utils/training_loader.py)
+    TRAINING_CHUNK_SIZE = int(os.environ.get('TRAINING_CHUNK_SIZE', 50000))
+
+    # Distilled budget lookup table (see app/utils/budget_lookup.py): smart budgets
+    # use it for cells whose 95th-percentile total error is within this share of income
+    DISTILLED_BUDGET_MAX_ERROR = float(os.environ.get('DISTILLED_BUDGET_MAX_ERROR', 0.05))
+
+    # Stored per-user budget feature vectors (see app/utils/feature_store.py), read and
+    # written BUDGET_FEATURE_CHUNK_SIZE users per query; false scores from the raw tables
+    BUDGET_FEATURE_STORE = os.environ.get('BUDGET_FEATURE_STORE', 'true').lower() in ('1', 'true', 'yes')
+    BUDGET_FEATURE_CHUNK_SIZE = int(os.environ.get('BUDGET_FEATURE_CHUNK_SIZE', 1000))
+    
     # SQLAlchemy Database URI for MySQL
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 
         f'mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}')
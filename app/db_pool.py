@@ -0,0 +1,312 @@
+"""
+MySQL connection pool for FinGuard.
+Keeps a bounded set of PyMySQL connections alive between requests so helpers
+calling current_app.get_db_connection() no longer pay a TCP/auth handshake each time.
+"""
+
+import threading
+import time
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+
+# ER_LOCK_DEADLOCK and ER_LOCK_WAIT_TIMEOUT: InnoDB rolled the transaction back
+# (or gave up waiting) and the whole unit of work can simply be retried.
+RETRYABLE_MYSQL_ERRORS = (1213, 1205)
+
+
+def is_retryable_error(exc):
+    """True for deadlock / lock-wait-timeout errors that warrant a retry"""
+    return (isinstance(exc, pymysql.err.OperationalError)
+            and bool(exc.args) and exc.args[0] in RETRYABLE_MYSQL_ERRORS)
+
+
+class PoolExhaustedError(pymysql.err.OperationalError):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class PooledConnection:
+    """Proxy around a raw PyMySQL connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._closed = False
+
+    def __getattr__(self, name):
+        if self._closed:
+            raise pymysql.err.InterfaceError(0, 'Connection already returned to pool')
+        return getattr(self._raw, name)
+
+    def close(self):
+        """Return the connection to its owner instead of closing the socket"""
+        if self._closed:
+            return
+        self._closed = True
+        _release_to_request(self._pool, self._raw)
+
+    @property
+    def open(self):
+        return not self._closed and self._raw.open
+
+
+class ConnectionPool:
+    """Thread-safe pool with min/max size, checkout health checks and idle eviction"""
+
+    def __init__(self, connect, min_size=2, max_size=10, idle_timeout=300,
+                 checkout_timeout=10, health_check_interval=5):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min_size=%s max_size=%s' % (min_size, max_size))
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = []  # list of (raw_connection, last_used_monotonic)
+        self._size = 0
+        self._warmed = False
+        self._stats = {
+            'checkouts': 0,
+            'creations': 0,
+            'evictions': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _create(self):
+        raw = self._connect()
+        with self._cond:
+            self._stats['creations'] += 1
+        return raw
+
+    def _warm(self):
+        """Open min_size connections on first use rather than at import time"""
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            needed = max(0, self.min_size - self._size)
+            self._size += needed
+        for created in range(needed):
+            try:
+                raw = self._create()
+            except Exception:
+                # Give back the slots not opened yet and warm again on the next checkout
+                with self._cond:
+                    self._size -= needed - created
+                    self._warmed = False
+                    self._cond.notify_all()
+                raise
+            self.release(raw)
+
+    def _evict_idle_locked(self, now):
+        """Close connections idle past idle_timeout while keeping min_size alive"""
+        if not self.idle_timeout:
+            return []
+        evicted = []
+        kept = []
+        # Oldest connections sit at the front of the list
+        for raw, last_used in self._idle:
+            if (now - last_used > self.idle_timeout
+                    and self._size - len(evicted) > self.min_size):
+                evicted.append(raw)
+            else:
+                kept.append((raw, last_used))
+        self._idle = kept
+        self._size -= len(evicted)
+        self._stats['evictions'] += len(evicted)
+        return evicted
+
+    def _is_healthy(self, raw, last_used, now):
+        if not raw.open:
+            return False
+        if now - last_used < self.health_check_interval:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Check out a raw connection, waiting up to checkout_timeout for one to free up"""
+        if not self._warmed:
+            self._warm()
+
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        while True:
+            raw = None
+            last_used = None
+            create = False
+            with self._cond:
+                evicted = self._evict_idle_locked(time.monotonic())
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolExhaustedError(
+                            2013, 'Timed out waiting for a database connection '
+                                  '(max_size=%d)' % self.max_size)
+                    self._cond.wait(remaining)
+                if self._idle:
+                    # LIFO keeps the hot connections hot and lets cold ones age out
+                    raw, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+            _close_quietly(evicted)
+
+            if create:
+                try:
+                    raw = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(raw, last_used, time.monotonic()):
+                with self._cond:
+                    self._size -= 1
+                    self._stats['health_check_failures'] += 1
+                    self._cond.notify()
+                _close_quietly([raw])
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._stats['checkouts'] += 1
+                self._stats['wait_time_total'] += waited
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+            return raw
+
+    def release(self, raw):
+        """Return a raw connection, ending any open transaction first"""
+        try:
+            if raw.open and raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                # Preserve the old close() semantics: uncommitted work is discarded
+                raw.rollback()
+        except Exception:
+            _close_quietly([raw])
+
+        with self._cond:
+            if raw.open:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+    def connection(self):
+        """Get a connection wrapped so that close() returns it to the pool"""
+        return PooledConnection(self, _acquire_for_request(self))
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones are closed on release)"""
+        with self._cond:
+            idle = [raw for raw, _ in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+            self._warmed = False
+        _close_quietly(idle)
+
+    def metrics(self):
+        """Snapshot of pool counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['min_size'] = self.min_size
+            stats['max_size'] = self.max_size
+        checkouts = stats['checkouts']
+        stats['wait_time_avg'] = stats['wait_time_total'] / checkouts if checkouts else 0.0
+        return stats
+
+
+def _close_quietly(connections):
+    for raw in connections:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+# Per-request reuse: a connection closed during a request is parked on flask.g
+# and handed to the next get_db_connection() call of the same request, then
+# returned to the pool when the app context tears down.
+
+def _request_state():
+    from flask import g, has_app_context
+    if not has_app_context():
+        return None
+    state = g.get('_db_pool_state')
+    if state is None:
+        state = {'leased': [], 'parked': []}
+        g._db_pool_state = state
+    return state
+
+
+def _acquire_for_request(pool):
+    state = _request_state()
+    if state is None:
+        return pool.acquire()
+    if state['parked']:
+        raw = state['parked'].pop()
+    else:
+        raw = pool.acquire()
+        state['leased'].append(raw)
+    return raw
+
+
+def _release_to_request(pool, raw):
+    state = _request_state()
+    if state is None or not any(raw is leased for leased in state['leased']):
+        pool.release(raw)
+        return
+    try:
+        if raw.open and raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            raw.rollback()
+    except Exception:
+        state['leased'] = [c for c in state['leased'] if c is not raw]
+        pool.release(raw)
+        return
+    state['parked'].append(raw)
+
+
+def release_request_connections(pool):
+    """Return every connection leased during this app context to the pool"""
+    from flask import g
+    state = g.pop('_db_pool_state', None)
+    if not state:
+        return
+    for raw in state['leased']:
+        pool.release(raw)
+
+
+def init_pool(app, connect):
+    """Create app.db_pool from config and hook request teardown"""
+    config = app.config
+    if not config.get('MYSQL_POOL_ENABLED', True):
+        app.db_pool = None
+        return None
+
+    pool = ConnectionPool(
+        connect,
+        min_size=config.get('MYSQL_POOL_MIN_SIZE', 2),
+        max_size=config.get('MYSQL_POOL_MAX_SIZE', 10),
+        idle_timeout=config.get('MYSQL_POOL_IDLE_TIMEOUT', 300),
+        checkout_timeout=config.get('MYSQL_POOL_CHECKOUT_TIMEOUT', 10),
+        health_check_interval=config.get('MYSQL_POOL_HEALTH_CHECK_INTERVAL', 5),
+    )
+    app.db_pool = pool
+
+    @app.teardown_appcontext
+    def _return_db_connections(exc):
+        release_request_connections(pool)
+
+    return pool
@@ -327,3 +327,27 @@ def admin_transaction_history_api(user_id):
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/admin/api/db-pool-metrics')
+def admin_db_pool_metrics_api():
+    pool = getattr(current_app, 'db_pool', None)
+    if pool is None:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    metrics = pool.metrics()
+    metrics['enabled'] = True
+    return jsonify({'success': True, 'data': metrics})
+
+@admin_bp.route('/admin/api/event-log-metrics')
+def admin_event_log_metrics_api():
+    from app.utils.event_log import event_log
+    return jsonify({'success': True, 'data': event_log.metrics()})
+
+@admin_bp.route('/admin/api/spend-counter-metrics')
+def admin_spend_counter_metrics_api():
+    from app.utils.spend_counters import spend_counters
+    return jsonify({'success': True, 'data': spend_counters.metrics()})
+
+@admin_bp.route('/admin/api/block-appender-metrics')
+def admin_block_appender_metrics_api():
+    from app.utils.block_appender import block_appender
+    return jsonify({'success': True, 'data': block_appender.metrics()})
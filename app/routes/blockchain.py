@@ -3,17 +3,21 @@ Blockchain management routes for FinGuard application.
 Provides endpoints for blockchain validation, fraud detection, and analytics.
 """
 
-from flask import Blueprint, jsonify, request, render_template, redirect, url_for, session
+from flask import Blueprint, jsonify, request, render_template, redirect, url_for, session, current_app
 from app.utils.blockchain_utils import (
     verify_entire_blockchain, 
     get_blockchain_analytics,
     get_user_blockchain_summary,
-    flag_user_as_fraud
+    flag_user_as_fraud,
+    get_inclusion_proof,
+    verify_inclusion_proof,
+    detect_balance_inconsistencies
 )
 from app.utils.user_utils import get_current_user
 from app.utils.jwt_auth import token_required, get_current_user_from_jwt
 from app.utils.permissions_utils import has_permission
 from app.utils.fraud_utils import get_fraud_reports
+from app.utils.chain_verifier import verify_chain_streaming, verification_jobs
 import json
 
 blockchain_bp = Blueprint('blockchain', __name__)
@@ -21,7 +25,13 @@ blockchain_bp = Blueprint('blockchain', __name__)
 @blockchain_bp.route('/api/blockchain/verify', methods=['POST'])
 @token_required
 def verify_blockchain_api():
-    """API endpoint to verify entire blockchain integrity"""
+    """API endpoint to verify entire blockchain integrity.
+    
+    Starts a background run and returns its job id; poll
+    /api/blockchain/verify/<job_id> for progress. Pass ``start_index`` to
+    resume from a previous run's ``next_index`` and ``wait: true`` to verify
+    synchronously instead.
+    """
     user = get_current_user_from_jwt()
     if not user:
         return jsonify({'error': 'Authentication required'}), 401
@@ -31,14 +41,28 @@ def verify_blockchain_api():
         return jsonify({'error': 'Admin access required'}), 403
     
     try:
-        is_valid, errors = verify_entire_blockchain()
+        data = request.get_json(silent=True) or {}
+        start_index = int(data.get('start_index') or 0)
+        
+        if data.get('wait'):
+            result = verify_chain_streaming(start_index)
+            return jsonify({
+                'success': True,
+                'blockchain_valid': result['valid'],
+                'errors': result['errors'],
+                'error_count': result['error_count'],
+                'verified_blocks': result['verified_blocks'],
+                'next_index': result['next_index'],
+                'message': 'Blockchain verification complete'
+            }), 200
         
+        job = verification_jobs.start(current_app._get_current_object(), start_index)
         return jsonify({
             'success': True,
-            'blockchain_valid': is_valid,
-            'errors': errors,
-            'message': 'Blockchain verification complete'
-        }), 200
+            'job': job,
+            'status_url': url_for('blockchain.verify_blockchain_status_api', job_id=job['job_id']),
+            'message': 'Blockchain verification started'
+        }), 202
         
     except Exception as e:
         return jsonify({
@@ -46,6 +70,28 @@ def verify_blockchain_api():
             'error': str(e)
         }), 500
 
+@blockchain_bp.route('/api/blockchain/verify/<job_id>', methods=['GET'])
+@token_required
+def verify_blockchain_status_api(job_id):
+    """API endpoint to poll a background blockchain verification run"""
+    user = get_current_user_from_jwt()
+    if not user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    # Check if user has admin permissions
+    if not has_permission(user['id'], 'perm_admin_access'):
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    job = verification_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Verification job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job,
+        'blockchain_valid': job['valid']
+    }), 200
+
 @blockchain_bp.route('/api/blockchain/analytics', methods=['GET'])
 @token_required
 def blockchain_analytics_api():
@@ -98,6 +144,36 @@ def user_blockchain_summary_api(user_id):
             'error': str(e)
         }), 500
 
+@blockchain_bp.route('/api/blockchain/proof/<entry_id>', methods=['GET'])
+@token_required
+def inclusion_proof_api(entry_id):
+    """API endpoint to get a Merkle inclusion proof for one ledger entry"""
+    current_user = get_current_user_from_jwt()
+    if not current_user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    try:
+        proof = get_inclusion_proof(entry_id)
+        if proof is None:
+            return jsonify({'success': False, 'error': 'Entry not found or not chained yet'}), 404
+        
+        # Users can only view proofs for their own entries unless they're admin
+        if (current_user['id'] != proof['entry']['user_id']
+                and not has_permission(current_user['id'], 'perm_admin_access')):
+            return jsonify({'error': 'Permission denied'}), 403
+        
+        return jsonify({
+            'success': True,
+            'proof': proof,
+            'verified': verify_inclusion_proof(proof)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @blockchain_bp.route('/api/blockchain/flag-fraud', methods=['POST'])
 @token_required
 def flag_fraud_api():
@@ -218,68 +294,13 @@ def detect_fraud_api():
         return jsonify({'error': 'Admin access required'}), 403
     
     try:
-        from app.utils.blockchain_utils import get_blockchain_connection
-        connection = get_blockchain_connection()
-        
-        fraud_detected = []
-        
-        with connection.cursor() as cursor:
-            # Get all users with blockchain transactions
-            cursor.execute("""
-                SELECT DISTINCT bt.user_id, u.first_name, u.last_name
-                FROM blockchain_transactions bt
-                JOIN users u ON bt.user_id = u.id
-                ORDER BY bt.user_id
-            """)
-            
-            users = cursor.fetchall()
-            
-            for user_data in users:
-                user_id = user_data['user_id']
-                
-                # Check blockchain integrity for this user
-                summary = get_user_blockchain_summary(user_id)
-                
-                # Look for suspicious patterns
-                if summary.get('total_blocks', 0) == 0:
-                    continue
-                
-                # Check for impossible balance changes
-                cursor.execute("""
-                    SELECT bt.amount, bt.current_balance, bt.timestamp
-                    FROM blockchain_transactions bt
-                    WHERE bt.user_id = %s
-                    ORDER BY bt.timestamp ASC
-                """, (user_id,))
-                
-                transactions = cursor.fetchall()
-                
-                if len(transactions) > 1:
-                    for i in range(1, len(transactions)):
-                        prev_balance = transactions[i-1]['current_balance']
-                        current_amount = transactions[i]['amount']
-                        current_balance = transactions[i]['current_balance']
-                        
-                        expected_balance = prev_balance + current_amount
-                        
-                        # Allow for small rounding errors
-                        if abs(expected_balance - current_balance) > 0.01:
-                            fraud_detected.append({
-                                'user_id': user_id,
-                                'user_name': f"{user_data['first_name']} {user_data['last_name']}",
-                                'reason': f'Balance inconsistency: Expected {expected_balance}, Got {current_balance}',
-                                'timestamp': transactions[i]['timestamp']
-                            })
-                            
-                            # Flag user as fraud
-                            flag_user_as_fraud(user_id, f"Automated Detection: Balance inconsistency detected")
-                            break
+        sweep = detect_balance_inconsistencies()
         
         return jsonify({
             'success': True,
-            'fraud_detected': fraud_detected,
-            'total_users_checked': len(users),
-            'total_fraud_detected': len(fraud_detected)
+            'fraud_detected': sweep['fraud_detected'],
+            'total_users_checked': sweep['total_users_checked'],
+            'total_fraud_detected': sweep['total_fraud_detected']
         }), 200
         
     except Exception as e:
@@ -287,6 +308,3 @@ def detect_fraud_api():
             'success': False,
             'error': str(e)
         }), 500
-    finally:
-        if 'connection' in locals():
-            connection.close()
@@ -2,8 +2,9 @@
 ML Budget Route - Flask routes for machine learning budget generation
 """
 
-from flask import Blueprint, request, jsonify, session, render_template
+from flask import Blueprint, request, jsonify, session, render_template, url_for
 from app.utils.ml_budget_generator import budget_generator
+from app.utils.training_jobs import TrainingJobConflict, submit_budget_training, training_jobs
 from app.utils.auth import login_required
 import logging
 
@@ -11,32 +12,33 @@ logger = logging.getLogger(__name__)
 
 ml_budget_bp = Blueprint('ml_budget', __name__)
 
+def _start_training(message):
+    """Submit a background training job; 202 with its id, or 409 with the running one"""
+    try:
+        job = submit_budget_training()
+    except TrainingJobConflict as e:
+        return jsonify({
+            'success': False,
+            'message': 'Budget models are already being trained',
+            'job': e.job
+        }), 409
+    return jsonify({
+        'success': True,
+        'message': message,
+        'job_id': job['job_id'],
+        'job': job,
+        'status_url': url_for('ml_budget.training_job_status', job_id=job['job_id'])
+    }), 202
+
 @ml_budget_bp.route('/train-budget-models', methods=['POST'])
 @login_required
 def train_budget_models():
     """
-    Train ML models for budget generation
+    Start training the ML models for budget generation in the background
     This should be called by admin users to train/retrain the models
     """
     try:
-        # Check if user has admin privileges (you may want to implement this check)
-        user_id = session.get('user_id')
-        
-        # Train the models
-        success = budget_generator.train_models()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Budget ML models trained successfully',
-                'models_trained': len(budget_generator.models)
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to train budget models. Check if there is sufficient data.'
-            }), 400
-            
+        return _start_training('Budget model training started')
     except Exception as e:
         logger.error(f"Error in train_budget_models: {e}")
         return jsonify({
@@ -44,6 +46,17 @@ def train_budget_models():
             'message': f'Error training models: {str(e)}'
         }), 500
 
+@ml_budget_bp.route('/training-jobs/<job_id>', methods=['GET'])
+@login_required
+def training_job_status(job_id):
+    """
+    Status, progress and metrics of a training job
+    """
+    job = training_jobs.get(budget_generator.registry, job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Training job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
 @ml_budget_bp.route('/generate-ai-budget', methods=['POST'])
 @login_required
 def generate_ai_budget():
@@ -136,25 +149,8 @@ def retrain_models():
     Retrain models with new data (admin function)
     """
     try:
-        # This should ideally check for admin privileges
-        user_id = session.get('user_id')
-        
-        # Force retrain models
-        budget_generator.model_trained = False
-        success = budget_generator.train_models()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Models retrained successfully',
-                'models_count': len(budget_generator.models)
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to retrain models'
-            }), 400
-            
+        # Trains into a new registry version; predictions keep the live one until it is published
+        return _start_training('Model retraining started')
     except Exception as e:
         logger.error(f"Error in retrain_models: {e}")
         return jsonify({
@@ -169,9 +165,8 @@ def model_status():
     Get detailed status of ML models
     """
     try:
-        # Force load models to check if they exist
-        if not budget_generator.model_trained:
-            budget_generator._load_models()
+        # Force a check for a newly published version
+        bundle = budget_generator._load_models()
         
         model_details = {}
         if budget_generator.models:
@@ -186,10 +181,15 @@ def model_status():
             'success': True,
             'model_trained': budget_generator.model_trained,
             'models_count': len(budget_generator.models),
-            'available_categories': list(budget_generator.models.keys()) if budget_generator.models else [],
+            'available_categories': budget_generator.categories,
+            'model_kind': bundle.meta.get('model_kind', 'per_category') if bundle else None,
             'model_details': model_details,
             'scalers_count': len(budget_generator.scalers),
-            'encoders_count': len(budget_generator.label_encoders)
+            'encoders_count': len(budget_generator.label_encoders),
+            'model_version': bundle.version if bundle else None,
+            'model_metrics': bundle.meta.get('metrics', {}) if bundle else {},
+            'available_versions': budget_generator.registry.versions(),
+            'training_job': training_jobs.active(budget_generator.registry)
         })
     except Exception as e:
         logger.error(f"Error getting model status: {e}")
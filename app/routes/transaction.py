@@ -4,9 +4,9 @@ from .user import get_current_user
 from app.utils.transaction_utils import get_user_by_id, send_money, lookup_user_by_identifier, is_user_flagged_fraud, get_all_transactions
 from app.utils.permissions_utils import has_permission
 from app.utils.jwt_auth import token_required, get_current_user_from_jwt
-from app.utils.overspending_detector import detect_overspending
+from app.utils.overspending_detector import detect_overspending, detect_overspending_batch
+from app.utils.report_utils import period_report, range_report
 from datetime import datetime, timedelta
-import calendar
 
 transaction_bp = Blueprint('transaction', __name__)
 
@@ -41,6 +41,17 @@ def check_overspending():
         return jsonify({'error': 'Authentication required'}), 401
     
     data = request.get_json()
+    if isinstance(data.get('expenses'), list):
+        # Basket of pending expenses: [{'description': ..., 'amount': ...}, ...]
+        try:
+            expenses = [(item.get('description', ''), float(item.get('amount', 0))) for item in data['expenses']]
+        except (ValueError, TypeError, AttributeError):
+            return jsonify({'error': 'Invalid amount'}), 400
+        return jsonify({
+            'success': True,
+            'overspending_batch': detect_overspending_batch(user['id'], expenses)
+        }), 200
+
     expense_description = data.get('description', '')
     expense_amount = data.get('amount', 0)
     
@@ -196,76 +207,26 @@ def send_money_route():
 
 @transaction_bp.route('/api/transaction-report')
 def transaction_report():
+    """Received/spent per bucket. Either a dashboard ``period`` (monthly, weekly,
+    yearly) or a ``granularity`` (day, week, month, quarter, year) with optional
+    ISO ``start``/``end``; ``tz`` is an IANA timezone name for bucket edges."""
     user = get_current_user()
     if not user:
         return jsonify({'error': 'Unauthorized'}), 401
 
-    period = request.args.get('period', 'monthly')
-    now = datetime.now()
-    data = []
-
-    conn = current_app.get_db_connection()
+    tz_name = request.args.get('tz')
+    granularity = request.args.get('granularity')
     try:
-        with conn.cursor() as cursor:
-            if period == 'yearly':
-                labels = []
-                received = []
-                spent = []
-                current_year = now.year
-                for y in range(current_year - 3, current_year + 1):
-                    labels.append(str(y))
-                    # Received
-                    cursor.execute('''SELECT IFNULL(SUM(amount),0) FROM transactions
-                        WHERE receiver_id = %s  AND YEAR(timestamp) = %s''', (user['id'], y))
-                    row = cursor.fetchone()
-                    if row:
-                        received.append(float(list(row.values())[0]))
-                    else:
-                        received.append(0)
-                    # Spent
-                    cursor.execute('''SELECT IFNULL(SUM(amount),0) FROM transactions
-                        WHERE sender_id = %s AND YEAR(timestamp) = %s''', (user['id'], y))
-                    row = cursor.fetchone()
-                    spent.append(float(list(row.values())[0]) if row else 0)
-                return jsonify({'labels': labels, 'received': received, 'spent': spent})
-
-            elif period == 'weekly':
-                year = now.year
-                month = now.month
-                num_days = calendar.monthrange(year, month)[1]
-                num_weeks = (num_days + 6) // 7
-                labels = [f'Week {i+1}' for i in range(num_weeks)]
-                received = [0] * num_weeks
-                spent = [0] * num_weeks
-                for week in range(num_weeks):
-                    start = datetime(year, month, 1) + timedelta(days=7*week)
-                    end = start + timedelta(days=7)
-                    cursor.execute('SELECT IFNULL(SUM(amount),0) FROM transactions WHERE receiver_id = %s AND timestamp >= %s AND timestamp < %s', (user['id'], start, end))
-                    row = cursor.fetchone()
-                    received[week] = float(list(row.values())[0]) if row else 0
-                    cursor.execute('SELECT IFNULL(SUM(amount),0) FROM transactions WHERE sender_id = %s AND timestamp >= %s AND timestamp < %s', (user['id'], start, end))
-                    row = cursor.fetchone()
-                    spent[week] = float(list(row.values())[0]) if row else 0
-                return jsonify({'labels': labels, 'received': received, 'spent': spent})
-
-            else:  # monthly (default)
-                labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-                received = []
-                spent = []
-                year = now.year
-                for m in range(1, 13):
-                    # Received
-                    cursor.execute('''SELECT IFNULL(SUM(amount),0) FROM transactions
-                        WHERE receiver_id = %s  AND YEAR(timestamp) = %s AND MONTH(timestamp) = %s''',
-                        (user['id'], year, m))
-                    row = cursor.fetchone()
-                    received.append(float(list(row.values())[0]) if row else 0)
-                    # Spent
-                    cursor.execute('''SELECT IFNULL(SUM(amount),0) FROM transactions
-                        WHERE sender_id = %s  AND YEAR(timestamp) = %s AND MONTH(timestamp) = %s''',
-                        (user['id'], year, m))
-                    row = cursor.fetchone()
-                    spent.append(float(list(row.values())[0]) if row else 0)
-                return jsonify({'labels': labels, 'received': received, 'spent': spent, 'year': year})
-    finally:
-        conn.close()
+        if granularity:
+            start = request.args.get('start')
+            end = request.args.get('end')
+            return jsonify(range_report(
+                user['id'], granularity,
+                datetime.fromisoformat(start) if start else None,
+                datetime.fromisoformat(end) if end else None,
+                tz_name
+            ))
+        return jsonify(period_report(user['id'], request.args.get('period', 'monthly'), tz_name))
+    except ValueError as e:
+        # ReportError, or a malformed start/end date
+        return jsonify({'error': str(e)}), 400
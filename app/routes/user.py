@@ -329,9 +329,11 @@ def profile():
 
 @user_bp.route('/log', methods=['POST'])
 def log_js_message():
-    data = request.get_json()
-    message = data.get('message', '')
-    print(f'[JS LOG] {message}')
+    data = request.get_json() or {}
+    # Single message from the browser, or a batch from the event log http sink
+    messages = data.get('messages') or [data.get('message', '')]
+    for message in messages:
+        print(f'[JS LOG] {message}')
     return jsonify({'status': 'ok'})
 
 @user_bp.route('/api/category-summary', methods=['GET'])
@@ -344,29 +346,29 @@ def category_summary_api():
     conn = current_app.get_db_connection()
     try:
         with conn.cursor() as cursor:
-            # Get all categories from budget_expense_categories for this user
+            # Budget per category (all budgets ever created by user) against
+            # expenditure in that category (only sent transactions)
             cursor.execute('''
-                SELECT DISTINCT category_name
-                FROM budget_expense_categories
-                WHERE budget_id IN (SELECT id FROM budgets WHERE user_id = %s)
-            ''', (user_id,))
-            categories = [row['category_name'] for row in cursor.fetchall()]
-            summary = []
-            for cat in categories:
-                # Sum budget for this category (all budgets ever created by user)
-                cursor.execute('''
-                    SELECT COALESCE(SUM(amount),0) as total_budget
-                    FROM budget_expense_categories
-                    WHERE category_name = %s AND budget_id IN (SELECT id FROM budgets WHERE user_id = %s)
-                ''', (cat, user_id))
-                budget = cursor.fetchone()['total_budget']
-                # Sum expenditure for this category (only sent transactions)
-                cursor.execute('''
-                    SELECT COALESCE(SUM(amount),0) as total_expense
+                SELECT b.category_name, b.total_budget, COALESCE(e.total_expense, 0) AS total_expense
+                FROM (
+                    SELECT c.category_name, SUM(c.amount) AS total_budget
+                    FROM budgets bu
+                    JOIN budget_expense_categories c ON c.budget_id = bu.id
+                    WHERE bu.user_id = %s
+                    GROUP BY c.category_name
+                ) b
+                LEFT JOIN (
+                    SELECT category, SUM(amount) AS total_expense
                     FROM transactions
-                    WHERE sender_id = %s AND note = %s
-                ''', (user_id, cat))
-                expense = cursor.fetchone()['total_expense']
+                    WHERE sender_id = %s
+                    GROUP BY category
+                ) e ON e.category = b.category_name
+                ORDER BY b.category_name
+            ''', (user_id, user_id))
+            summary = []
+            for row in cursor.fetchall():
+                budget = row['total_budget'] or 0
+                expense = row['total_expense']
                 # Condition
                 diff = budget - expense
                 if diff >= 0:
@@ -374,7 +376,7 @@ def category_summary_api():
                 else:
                     condition = f"${-diff:.2f} overspent"
                 summary.append({
-                    'category': cat,
+                    'category': row['category_name'],
                     'budget': float(budget),
                     'expenditure': float(expense),
                     'condition': condition
@@ -3,6 +3,10 @@ from flask import current_app
 import uuid
 from datetime import datetime
 from .advanced_sql_utils import AdvancedSQLUtils, AdvancedReportingUtils
+from .fraud_cache import flagged_users
+from .rollup_utils import record_transaction_rollup
+from .overspending_detector import categorize_expense
+from .spend_counters import spend_counters
 
 def get_role_name_by_id(role_id):
     conn = current_app.get_db_connection()
@@ -151,12 +155,15 @@ def update_user_balance(user_id, amount):
         conn.close()
 
 def insert_transaction_admin(tx_id, amount, sender_id, receiver_id, note, tx_type):
+    category = categorize_expense(note)
     conn = current_app.get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('''INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location) VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s)''',
-                (tx_id, amount, 'admin_add', sender_id, receiver_id, note, tx_type, None))
+            cursor.execute('''INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location, category) VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s)''',
+                (tx_id, amount, 'admin_add', sender_id, receiver_id, note, tx_type, None, category))
+            record_transaction_rollup(cursor, tx_id)
         conn.commit()
+        spend_counters.add(sender_id, category, amount)
     finally:
         conn.close()
 
@@ -177,6 +184,7 @@ def insert_fraud_list(fraud_id, user_id, reported_user_id, reason):
             cursor.execute('INSERT INTO fraud_list (id, user_id, reported_user_id, reason) VALUES (%s, %s, %s, %s)',
                 (fraud_id, user_id, reported_user_id, reason))
         conn.commit()
+        flagged_users.add([reported_user_id])
     finally:
         conn.close()
 
@@ -186,6 +194,7 @@ def delete_fraud_list(reported_user_id):
         with conn.cursor() as cursor:
             cursor.execute('DELETE FROM fraud_list WHERE reported_user_id = %s', (reported_user_id,))
         conn.commit()
+        flagged_users.discard([reported_user_id])
     finally:
         conn.close()
 
@@ -2,6 +2,7 @@
 from flask import current_app
 import uuid
 from typing import Tuple, Optional, Dict, List
+from .rollup_utils import get_user_totals, get_user_pattern_stats
 
 
 class AdvancedSQLUtils:
@@ -59,38 +60,9 @@ class AdvancedSQLUtils:
     
     @staticmethod
     def calculate_user_statistics(user_id: str) -> Dict:
-        """Calculate comprehensive user statistics using stored procedure"""
-        conn = current_app.get_db_connection()
+        """Calculate comprehensive user statistics from the daily rollup"""
         try:
-            with conn.cursor() as cursor:
-                cursor.callproc('CalculateUserStatistics', [user_id, None, None, None, None, None])
-                
-                # Fetch the OUT parameters
-                cursor.execute("""
-                    SELECT @_CalculateUserStatistics_1 as total_sent,
-                           @_CalculateUserStatistics_2 as total_received,
-                           @_CalculateUserStatistics_3 as transaction_count,
-                           @_CalculateUserStatistics_4 as avg_transaction,
-                           @_CalculateUserStatistics_5 as last_transaction_date
-                """)
-                result = cursor.fetchone()
-                
-                if result:
-                    return {
-                        'total_sent': float(result['total_sent'] or 0),
-                        'total_received': float(result['total_received'] or 0),
-                        'transaction_count': int(result['transaction_count'] or 0),
-                        'avg_transaction': float(result['avg_transaction'] or 0),
-                        'last_transaction_date': result['last_transaction_date']
-                    }
-                else:
-                    return {
-                        'total_sent': 0.0,
-                        'total_received': 0.0,
-                        'transaction_count': 0,
-                        'avg_transaction': 0.0,
-                        'last_transaction_date': None
-                    }
+            return get_user_totals(user_id)
         except Exception as e:
             print(f"Error calculating user statistics: {e}")
             return {
@@ -100,8 +72,6 @@ class AdvancedSQLUtils:
                 'avg_transaction': 0.0,
                 'last_transaction_date': None
             }
-        finally:
-            conn.close()
     
     @staticmethod
     def bulk_balance_update(admin_id: str, user_id: str, amount: float, reason: str) -> Tuple[bool, str]:
@@ -260,53 +230,30 @@ class AdvancedReportingUtils:
     
     @staticmethod
     def get_transaction_pattern_analysis(user_id: str) -> Dict:
-        """Advanced transaction pattern analysis for a user"""
+        """Advanced transaction pattern analysis for a user.
+        Additive stats come from the daily rollup; distinct locations and
+        counterparties still need the raw rows, read per side by index."""
+        try:
+            analysis = get_user_pattern_stats(user_id)
+        except Exception as e:
+            print(f"Error getting transaction pattern analysis: {e}")
+            return {}
+        
         conn = current_app.get_db_connection()
         try:
             with conn.cursor() as cursor:
-                # Complex query with multiple subqueries and analytics
-                query = """
+                cursor.execute("""
                 SELECT 
-                    -- Basic stats
-                    COUNT(*) as total_transactions,
-                    AVG(amount) as avg_amount,
-                    STDDEV(amount) as amount_stddev,
-                    
-                    -- Time-based patterns
-                    COUNT(CASE WHEN HOUR(timestamp) BETWEEN 9 AND 17 THEN 1 END) as business_hours_txs,
-                    COUNT(CASE WHEN DAYOFWEEK(timestamp) IN (1,7) THEN 1 END) as weekend_txs,
-                    
-                    -- Amount patterns
-                    COUNT(CASE WHEN amount < 100 THEN 1 END) as small_txs,
-                    COUNT(CASE WHEN amount BETWEEN 100 AND 1000 THEN 1 END) as medium_txs,
-                    COUNT(CASE WHEN amount > 1000 THEN 1 END) as large_txs,
-                    
-                    -- Recent activity
-                    COUNT(CASE WHEN timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY) THEN 1 END) as recent_week_txs,
-                    COUNT(CASE WHEN timestamp >= DATE_SUB(NOW(), INTERVAL 30 DAY) THEN 1 END) as recent_month_txs,
-                    
-                    -- Location diversity
                     COUNT(DISTINCT location) as unique_locations,
-                    
-                    -- Payment method diversity
-                    COUNT(DISTINCT payment_method) as unique_payment_methods,
-                    
-                    -- Counterparty analysis
-                    COUNT(DISTINCT 
-                        CASE WHEN sender_id = %s THEN receiver_id 
-                             WHEN receiver_id = %s THEN sender_id 
-                        END
-                    ) as unique_counterparties
-                FROM transactions
-                WHERE sender_id = %s OR receiver_id = %s
-                """
-                cursor.execute(query, (user_id, user_id, user_id, user_id))
-                result = cursor.fetchone()
-                
-                if result:
-                    return dict(result)
-                else:
-                    return {}
+                    COUNT(DISTINCT counterparty) as unique_counterparties
+                FROM (
+                    SELECT location, receiver_id AS counterparty FROM transactions WHERE sender_id = %s
+                    UNION ALL
+                    SELECT location, sender_id AS counterparty FROM transactions WHERE receiver_id = %s
+                ) t
+                """, (user_id, user_id))
+                analysis.update(cursor.fetchone() or {})
+                return analysis
         except Exception as e:
             print(f"Error getting transaction pattern analysis: {e}")
             return {}
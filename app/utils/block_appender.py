@@ -0,0 +1,144 @@
+"""
+Block-append service for FinGuard's blockchain ledger.
+Transfers only record ledger entries; this service chains pending entries under
+the single chain-tip row lock, one Merkle block per batch and one commit per
+block, so concurrent writers can never fork the chain.
+"""
+
+import threading
+import time
+import logging
+from flask import current_app
+from app.db_pool import is_retryable_error
+from .blockchain_utils import _append_pending_blocks
+
+logger = logging.getLogger(__name__)
+
+MAX_APPEND_ATTEMPTS = 3
+
+
+class BlockAppender:
+    """Chains pending ledger entries in batches, on a daemon thread when started
+    or inline on notify() otherwise"""
+
+    def __init__(self, batch_size=500, poll_interval=1.0):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._app = None
+        self._worker = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            'appended': 0,
+            'batches': 0,
+            'largest_batch': 0,
+            'busy_time': 0.0,
+            'conflicts': 0,
+            'errors': 0,
+        }
+
+    def configure(self, batch_size=None, poll_interval=None):
+        with self._lock:
+            if batch_size is not None:
+                self.batch_size = batch_size
+            if poll_interval is not None:
+                self.poll_interval = poll_interval
+
+    def start(self, app):
+        """Run the appender on a daemon thread bound to ``app``"""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return self._worker
+            self._app = app
+            self._worker = threading.Thread(target=self._run, name='finguard-block-appender', daemon=True)
+            self._worker.start()
+            return self._worker
+
+    @property
+    def running(self):
+        return self._worker is not None and self._worker.is_alive()
+
+    def notify(self):
+        """Signal that new ledger entries were committed; never raises"""
+        if self.running:
+            self._wake.set()
+            return
+        try:
+            self.append_pending()
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            logger.warning(f"Inline block append failed: {e}")
+
+    def append_pending(self, max_blocks=None):
+        """Chain pending entries batch by batch until none are left (or
+        ``max_blocks`` were appended); returns the number of blocks appended"""
+        appended = 0
+        conflicts = 0
+        conn = current_app.get_db_connection()
+        try:
+            while max_blocks is None or appended < max_blocks:
+                limit = self.batch_size if max_blocks is None else min(self.batch_size, max_blocks - appended)
+                started = time.perf_counter()
+                try:
+                    with conn.cursor() as cursor:
+                        count = _append_pending_blocks(cursor, limit)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    conflicts += 1
+                    if not is_retryable_error(e) or conflicts >= MAX_APPEND_ATTEMPTS:
+                        raise
+                    with self._lock:
+                        self._stats['conflicts'] += 1
+                    continue
+                conflicts = 0
+                elapsed = time.perf_counter() - started
+                if not count:
+                    break
+                appended += count
+                with self._lock:
+                    self._stats['appended'] += count
+                    self._stats['batches'] += 1
+                    self._stats['largest_batch'] = max(self._stats['largest_batch'], count)
+                    self._stats['busy_time'] += elapsed
+        finally:
+            conn.close()
+        return appended
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.append_pending()
+                except Exception as e:
+                    with self._lock:
+                        self._stats['errors'] += 1
+                    logger.warning(f"Block appender failed: {e}")
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['running'] = self.running
+        stats['batch_size'] = self.batch_size
+        stats['avg_batch'] = stats['appended'] / stats['batches'] if stats['batches'] else 0.0
+        stats['appends_per_sec'] = stats['appended'] / stats['busy_time'] if stats['busy_time'] else 0.0
+        return stats
+
+
+# Create global instance
+block_appender = BlockAppender()
+
+
+def init_block_appender(app):
+    """Configure the global block appender from app config and start it"""
+    block_appender.configure(
+        batch_size=app.config.get('BLOCKCHAIN_APPEND_BATCH_SIZE', 500),
+        poll_interval=app.config.get('BLOCKCHAIN_APPEND_POLL_INTERVAL', 1.0),
+    )
+    if app.config.get('BLOCKCHAIN_APPENDER_ENABLED', True):
+        block_appender.start(app)
+    app.block_appender = block_appender
+    return block_appender
@@ -0,0 +1,75 @@
+"""
+Canonical binary encoding of FinGuard block headers and ledger entries.
+Every field has exactly one byte representation: integers are fixed-width
+big-endian, money is an integer number of cents, timestamps are microseconds
+since the Unix epoch (naive values are taken as UTC, as MySQL returns them) and
+strings are length-prefixed UTF-8. Each record starts with the encoding version
+and a record type, so a later encoding can never collide with this one.
+"""
+
+import hashlib
+import struct
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+ENCODING_VERSION = 1
+
+HEADER_RECORD = 1
+ENTRY_RECORD = 2
+
+CENT = Decimal('0.01')
+EPOCH = datetime(1970, 1, 1)
+NO_TIMESTAMP = -(1 << 63)
+GENESIS_HASH = '0'
+
+_HEADER = struct.Struct('>BBQqI32s32s')
+_ENTRY = struct.Struct('>BBqqq')
+_LENGTH = struct.Struct('>H')
+
+
+def cents(value) -> int:
+    """Money as an integer number of cents, rounded the way DECIMAL(15,2) rounds"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int(value.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def epoch_micros(timestamp) -> int:
+    if timestamp is None:
+        return NO_TIMESTAMP
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = timestamp - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _digest(hex_hash: str) -> bytes:
+    # The genesis block's previous hash is the '0' sentinel rather than a digest
+    if hex_hash == GENESIS_HASH:
+        return bytes(32)
+    return bytes.fromhex(hex_hash)
+
+
+def _text(value: str) -> bytes:
+    data = value.encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+
+def encode_block_header(index: int, timestamp: datetime, merkle_root: str,
+                        tx_count: int, previous_hash: str) -> bytes:
+    return _HEADER.pack(ENCODING_VERSION, HEADER_RECORD, index, epoch_micros(timestamp), tx_count,
+                        _digest(merkle_root), _digest(previous_hash))
+
+
+def encode_ledger_entry(entry_id: str, user_id: str, amount, balance, method: str,
+                        timestamp: datetime) -> bytes:
+    return (_ENTRY.pack(ENCODING_VERSION, ENTRY_RECORD, cents(amount), cents(balance),
+                        epoch_micros(timestamp))
+            + _text(entry_id) + _text(user_id) + _text(method or ''))
+
+
+def header_hash(index: int, timestamp: datetime, merkle_root: str, tx_count: int,
+                previous_hash: str) -> str:
+    """SHA-256 of the encoded block header"""
+    return hashlib.sha256(encode_block_header(index, timestamp, merkle_root, tx_count,
+                                              previous_hash)).hexdigest()
@@ -7,11 +7,29 @@ and detect fraudulent activities.
 
 import hashlib
 import json
+import threading
+import time
 import uuid
 from datetime import datetime, timezone
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from typing import Dict, List, Optional, Tuple
 from flask import current_app
+from app.db_pool import is_retryable_error
+from . import block_encoding, merkle
+from .fraud_cache import flagged_users
+
+# Hash versions recorded on each block. Legacy (0) blocks hashed a payload that
+# was never stored, so only their balance progression can be re-checked; ledger
+# blocks from version 1 on hash a payload rebuilt purely from stored columns.
+# Version 2 blocks batch many entries under a Merkle root; each entry keeps its
+# inclusion proof. Version 3 hashes the same batch header and leaves through the
+# canonical binary encoding in block_encoding instead of JSON.
+LEGACY_HASH_VERSION = 0
+LEDGER_HASH_VERSION = 1
+MERKLE_HASH_VERSION = 2
+BINARY_MERKLE_HASH_VERSION = 3
+MERKLE_HASH_VERSIONS = (MERKLE_HASH_VERSION, BINARY_MERKLE_HASH_VERSION)
+CURRENT_HASH_VERSION = BINARY_MERKLE_HASH_VERSION
 
 class Block:
     """Represents a single block in the blockchain"""
@@ -41,6 +59,35 @@ class Block:
         """Verify if the block's hash is valid"""
         return self.hash == self.calculate_hash()
 
+class MerkleBlock:
+    """A block carrying a batch of ledger entries under a Merkle root"""
+    
+    def __init__(self, index: int, timestamp: datetime, merkle_root: str,
+                 tx_count: int, previous_hash: str, hash_version: int = CURRENT_HASH_VERSION):
+        self.index = index
+        self.timestamp = timestamp
+        self.merkle_root = merkle_root
+        self.tx_count = tx_count
+        self.previous_hash = previous_hash
+        self.hash_version = hash_version
+        self.hash = self.calculate_hash()
+    
+    def calculate_hash(self) -> str:
+        """Calculate the SHA-256 hash of the block header"""
+        if self.hash_version == BINARY_MERKLE_HASH_VERSION:
+            return block_encoding.header_hash(self.index, self.timestamp, self.merkle_root,
+                                              self.tx_count, self.previous_hash)
+        
+        header = json.dumps({
+            'index': self.index,
+            'timestamp': self.timestamp.isoformat(),
+            'merkle_root': self.merkle_root,
+            'tx_count': self.tx_count,
+            'previous_hash': self.previous_hash
+        }, sort_keys=True)
+        
+        return hashlib.sha256(header.encode()).hexdigest()
+
 class FinGuardBlockchain:
     """Blockchain implementation for FinGuard financial transactions"""
     
@@ -104,38 +151,107 @@ def get_blockchain_connection():
     """Get database connection for blockchain operations"""
     return current_app.get_db_connection()
 
+CENT = Decimal('0.01')
+
+def _to_cents(value) -> Decimal:
+    # DECIMAL(15,2) columns round half away from zero on insert
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+def _ledger_block_data(user_id: str, amount, balance, method: str, timestamp: datetime) -> dict:
+    """Block payload for a ledger entry, reproducible from the stored row"""
+    return {
+        'user_id': user_id,
+        'amount': float(_to_cents(amount)),
+        'balance': float(_to_cents(balance)),
+        'type': method,
+        'timestamp': timestamp.isoformat() if timestamp else None
+    }
+
+def _entry_leaf_hash(entry_id: str, user_id: str, amount, balance, method: str,
+                     timestamp: datetime, hash_version: int = CURRENT_HASH_VERSION) -> str:
+    """Merkle leaf for one ledger entry, reproducible from the stored row"""
+    if hash_version == BINARY_MERKLE_HASH_VERSION:
+        return merkle.leaf_hash(block_encoding.encode_ledger_entry(
+            entry_id, user_id, amount, balance, method, timestamp))
+    payload = dict(_ledger_block_data(user_id, amount, balance, method, timestamp), id=entry_id)
+    return merkle.leaf_hash(json.dumps(payload, sort_keys=True).encode())
+
+def _entry_is_included(record: dict) -> bool:
+    """Check a chained entry against its block's Merkle root via its stored proof"""
+    leaf = _entry_leaf_hash(record['entry_id'], record['user_id'], record['amount'],
+                            record['current_balance'], record['method'], record['entry_timestamp'],
+                            record['hash_version'])
+    return merkle.verify_proof(leaf, merkle.decode_proof(record['merkle_proof']), record['merkle_root'])
+
+def _expected_block_hash(record: dict) -> Optional[str]:
+    """Recompute a block's hash from its blockchain/blockchain_transactions
+    columns, or None when the block's hash version cannot be reproduced"""
+    version = record.get('hash_version') or LEGACY_HASH_VERSION
+    if version == LEGACY_HASH_VERSION:
+        return None
+    if version == BINARY_MERKLE_HASH_VERSION:
+        return block_encoding.header_hash(record['index'], record['timestamp'], record['merkle_root'],
+                                          record['tx_count'], record['previous_hash'])
+    if version == MERKLE_HASH_VERSION:
+        return MerkleBlock(record['index'], record['timestamp'], record['merkle_root'],
+                           record['tx_count'], record['previous_hash'], MERKLE_HASH_VERSION).hash
+    if not record.get('user_id'):
+        return None
+    block_data = _ledger_block_data(
+        record['user_id'], record['amount'], record['current_balance'],
+        record['method'], record['timestamp']
+    )
+    return Block(
+        index=record['index'],
+        timestamp=record['timestamp'],
+        transaction_data=block_data,
+        previous_hash=record['previous_hash'],
+        transaction_id=record['transaction_id']
+    ).calculate_hash()
+
+def _create_blockchain_transaction(cursor, user_id: str, amount: Decimal, current_balance: Decimal,
+                                   method: str, transaction_id: str = None,
+                                   timestamp: datetime = None) -> Optional[str]:
+    """Insert a blockchain transaction record using an open cursor (no commit)"""
+    blockchain_tx_id = transaction_id or str(uuid.uuid4())
+    
+    # First check if user exists
+    cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
+    user_exists = cursor.fetchone()
+    
+    if not user_exists:
+        print(f"User {user_id} does not exist, cannot create blockchain transaction")
+        return None
+    
+    # Insert blockchain transaction
+    cursor.execute("""
+        INSERT INTO blockchain_transactions 
+        (id, user_id, amount, current_balance, method, timestamp)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (
+        blockchain_tx_id,
+        user_id,
+        _to_cents(amount),
+        _to_cents(current_balance),
+        method,
+        timestamp or datetime.now()
+    ))
+    
+    print(f"Blockchain transaction created: id={blockchain_tx_id}, user_id={user_id}, amount={amount}")
+    return blockchain_tx_id
+
 def create_blockchain_transaction(user_id: str, amount: Decimal, current_balance: Decimal, 
                                 method: str, transaction_id: str = None) -> str:
     """Create a blockchain transaction record"""
     try:
         connection = get_blockchain_connection()
-        blockchain_tx_id = transaction_id or str(uuid.uuid4())
         
         with connection.cursor() as cursor:
-            # First check if user exists
-            cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-            user_exists = cursor.fetchone()
-            
-            if not user_exists:
-                print(f"User {user_id} does not exist, cannot create blockchain transaction")
-                return None
-            
-            # Insert blockchain transaction
-            cursor.execute("""
-                INSERT INTO blockchain_transactions 
-                (id, user_id, amount, current_balance, method, timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                blockchain_tx_id,
-                user_id,
-                float(amount),
-                float(current_balance),
-                method,
-                datetime.now()
-            ))
-            
-            connection.commit()
-            print(f"Blockchain transaction created: id={blockchain_tx_id}, user_id={user_id}, amount={amount}")
+            blockchain_tx_id = _create_blockchain_transaction(
+                cursor, user_id, amount, current_balance, method, transaction_id
+            )
+            if blockchain_tx_id:
+                connection.commit()
             return blockchain_tx_id
             
     except Exception as e:
@@ -146,58 +262,147 @@ def create_blockchain_transaction(user_id: str, amount: Decimal, current_balance
         if 'connection' in locals():
             connection.close()
 
+def _lock_chain_tip(cursor) -> Tuple[int, str]:
+    """Lock the single chain-tip row and return (last_index, last_hash).
+    Every block append serializes on this row, so the chain stays linear."""
+    cursor.execute("SELECT last_index, last_hash FROM blockchain_tip WHERE id = 1 FOR UPDATE")
+    tip = cursor.fetchone()
+    if tip:
+        return tip['last_index'], tip['last_hash']
+    
+    # Tip row missing (database predates it): seed it from the chain itself
+    cursor.execute("""
+        SELECT `index`, hash FROM blockchain 
+        ORDER BY `index` DESC LIMIT 1
+    """)
+    latest_block = cursor.fetchone()
+    last_index = latest_block['index'] if latest_block else -1
+    last_hash = latest_block['hash'] if latest_block else '0'
+    cursor.execute("INSERT INTO blockchain_tip (id, last_index, last_hash) VALUES (1, %s, %s)",
+                   (last_index, last_hash))
+    return last_index, last_hash
+
+def _set_chain_tip(cursor, last_index: int, last_hash: str) -> None:
+    cursor.execute("UPDATE blockchain_tip SET last_index = %s, last_hash = %s WHERE id = 1",
+                   (last_index, last_hash))
+
+_INSERT_BLOCK_SQL = """
+    INSERT INTO blockchain 
+    (id, `index`, type, timestamp, previous_hash, hash, transaction_id, hash_version,
+     merkle_root, tx_count)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _add_block_to_chain(cursor, block_data: dict, transaction_id: str, timestamp: datetime = None,
+                        hash_version: int = LEGACY_HASH_VERSION) -> Optional[Block]:
+    """Append a block using an open cursor (no commit); returns the new block.
+    The chain tip stays locked until the caller's transaction ends."""
+    # First check if the blockchain_transactions record exists
+    cursor.execute("SELECT id FROM blockchain_transactions WHERE id = %s", (transaction_id,))
+    tx_exists = cursor.fetchone()
+    
+    if not tx_exists:
+        print(f"Blockchain transaction {transaction_id} does not exist, cannot add block")
+        return None
+    
+    last_index, last_hash = _lock_chain_tip(cursor)
+    
+    # Create the block
+    block = Block(
+        index=last_index + 1,
+        timestamp=timestamp or datetime.now(timezone.utc),
+        transaction_data=block_data,
+        previous_hash=last_hash,
+        transaction_id=transaction_id
+    )
+    
+    # Insert the block into the database
+    cursor.execute(_INSERT_BLOCK_SQL, (
+        str(uuid.uuid4()),
+        block.index,
+        block_data.get('type', 'transaction'),
+        block.timestamp,
+        block.previous_hash,
+        block.hash,
+        transaction_id,
+        hash_version,
+        None,
+        1
+    ))
+    cursor.execute("UPDATE blockchain_transactions SET block_index = %s WHERE id = %s",
+                   (block.index, transaction_id))
+    _set_chain_tip(cursor, block.index, block.hash)
+    
+    print(f"Block added successfully: index={block.index}, hash={block.hash}")
+    return block
+
+def _append_pending_blocks(cursor, limit: int) -> int:
+    """
+    Chain up to ``limit`` pending ledger entries, oldest first, as one Merkle
+    block under the chain-tip lock (no commit). Each entry gets its position
+    and inclusion proof. Returns the number of entries chained.
+    
+    Entries are read after the tip is locked, so each batch sees everything
+    committed by the previous one; a user's entries are inserted under their
+    row lock, so their ``seq`` order is also their chain order.
+    """
+    last_index, last_hash = _lock_chain_tip(cursor)
+    cursor.execute("""
+        SELECT id, user_id, amount, current_balance, method, timestamp
+        FROM blockchain_transactions
+        WHERE block_index IS NULL
+        ORDER BY seq ASC
+        LIMIT %s
+    """, (limit,))
+    entries = cursor.fetchall()
+    if not entries:
+        return 0
+    
+    leaves = [
+        _entry_leaf_hash(entry['id'], entry['user_id'], entry['amount'],
+                         entry['current_balance'], entry['method'], entry['timestamp'])
+        for entry in entries
+    ]
+    root, proofs = merkle.build_tree(leaves)
+    block = MerkleBlock(last_index + 1, datetime.now().replace(microsecond=0),
+                        root, len(entries), last_hash)
+    
+    cursor.execute(_INSERT_BLOCK_SQL, (
+        str(uuid.uuid4()), block.index, 'batch', block.timestamp, block.previous_hash,
+        block.hash, None, block.hash_version, block.merkle_root, block.tx_count
+    ))
+    
+    # One statement for the whole batch rather than an UPDATE per entry
+    ids = [entry['id'] for entry in entries]
+    cases = ' '.join(['WHEN %s THEN %s'] * len(ids))
+    placeholders = ', '.join(['%s'] * len(ids))
+    params = [block.index]
+    for position, entry_id in enumerate(ids):
+        params += [entry_id, position]
+    for entry_id, proof in zip(ids, proofs):
+        params += [entry_id, merkle.encode_proof(proof)]
+    params += ids
+    cursor.execute(f"""
+        UPDATE blockchain_transactions
+        SET block_index = %s,
+            leaf_index = CASE id {cases} END,
+            merkle_proof = CASE id {cases} END
+        WHERE id IN ({placeholders})
+    """, params)
+    
+    _set_chain_tip(cursor, block.index, block.hash)
+    return len(entries)
+
 def add_block_to_chain(block_data: dict, transaction_id: str) -> bool:
     """Add a new block to the blockchain in the database"""
     try:
         connection = get_blockchain_connection()
         
         with connection.cursor() as cursor:
-            # First check if the blockchain_transactions record exists
-            cursor.execute("SELECT id FROM blockchain_transactions WHERE id = %s", (transaction_id,))
-            tx_exists = cursor.fetchone()
-            
-            if not tx_exists:
-                print(f"Blockchain transaction {transaction_id} does not exist, cannot add block")
-                return False
-            
-            # Get the latest block to determine the new index and previous hash
-            cursor.execute("""
-                SELECT `index`, hash FROM blockchain 
-                ORDER BY `index` DESC LIMIT 1
-            """)
-            latest_block = cursor.fetchone()
-            
-            # Calculate new block properties
-            new_index = (latest_block['index'] + 1) if latest_block else 0
-            previous_hash = latest_block['hash'] if latest_block else '0'
-            
-            # Create the block
-            block = Block(
-                index=new_index,
-                timestamp=datetime.now(timezone.utc),
-                transaction_data=block_data,
-                previous_hash=previous_hash,
-                transaction_id=transaction_id
-            )
-            
-            # Insert the block into the database
-            cursor.execute("""
-                INSERT INTO blockchain 
-                (id, `index`, type, timestamp, previous_hash, hash, transaction_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                str(uuid.uuid4()),
-                block.index,
-                block_data.get('type', 'transaction'),
-                block.timestamp,
-                block.previous_hash,
-                block.hash,
-                transaction_id
-            ))
-            
-            connection.commit()
-            print(f"Block added successfully: index={block.index}, hash={block.hash}")
-            return True
+            added = _add_block_to_chain(cursor, block_data, transaction_id) is not None
+            if added:
+                connection.commit()
+            return added
             
     except Exception as e:
         print(f"Error adding block to chain: {e}")
@@ -207,6 +412,133 @@ def add_block_to_chain(block_data: dict, transaction_id: str) -> bool:
         if 'connection' in locals():
             connection.close()
 
+def _load_checkpoint(cursor, user_id: str) -> Optional[dict]:
+    """Read a user's verification checkpoint"""
+    cursor.execute("""
+        SELECT last_seq, last_index, last_hash, running_balance, last_timestamp, verified_blocks
+        FROM blockchain_verification_checkpoints
+        WHERE user_id = %s
+    """, (user_id,))
+    checkpoint = cursor.fetchone()
+    if checkpoint:
+        checkpoint['running_balance'] = Decimal(str(checkpoint['running_balance']))
+    return checkpoint
+
+def _save_checkpoint(cursor, user_id: str, state: dict, full: bool = False) -> None:
+    """Upsert a user's verification checkpoint (no commit)"""
+    now = datetime.now()
+    cursor.execute("""
+        INSERT INTO blockchain_verification_checkpoints
+        (user_id, last_seq, last_index, last_hash, running_balance, last_timestamp,
+         verified_blocks, updated_at, full_verified_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            last_seq = VALUES(last_seq),
+            last_index = VALUES(last_index),
+            last_hash = VALUES(last_hash),
+            running_balance = VALUES(running_balance),
+            last_timestamp = VALUES(last_timestamp),
+            verified_blocks = VALUES(verified_blocks),
+            updated_at = VALUES(updated_at),
+            full_verified_at = COALESCE(VALUES(full_verified_at), full_verified_at)
+    """, (
+        user_id,
+        state['last_seq'],
+        state['last_index'],
+        state['last_hash'],
+        state['running_balance'],
+        state['last_timestamp'],
+        state['verified_blocks'],
+        now,
+        now if full else None
+    ))
+
+_USER_ENTRIES_SQL = """
+    SELECT bt.id AS entry_id, bt.seq, bt.user_id, bt.amount, bt.current_balance, bt.method,
+           bt.timestamp AS entry_timestamp, bt.merkle_proof,
+           b.`index`, b.timestamp, b.previous_hash, b.hash, b.transaction_id, b.hash_version,
+           b.merkle_root, b.tx_count
+    FROM blockchain_transactions bt
+    LEFT JOIN blockchain b
+           ON b.`index` = bt.block_index
+          AND (b.transaction_id = bt.id OR b.transaction_id IS NULL)
+    WHERE bt.user_id = %s AND bt.seq > %s
+    ORDER BY bt.seq ASC
+"""
+
+def _verify_user_chain(cursor, user_id: str,
+                       checkpoint: dict = None) -> Tuple[List[str], Optional[dict], Optional[Decimal]]:
+    """
+    Verify a user's ledger entries recorded after ``checkpoint`` (from genesis
+    when None): every reproducible block hash must match and each balance must
+    equal the previous balance plus the amount.
+    
+    Returns (errors, state, running_balance). ``state`` is the checkpoint for
+    the last entry that is already chained; entries still waiting for the
+    block appender only count towards ``running_balance``. Inconsistent blocks
+    are reported but still advance the state, so an anomaly is flagged once
+    rather than re-scanned on every transfer.
+    """
+    # (user_id, seq) index keeps this proportional to the new entries only
+    cursor.execute(_USER_ENTRIES_SQL, (user_id, checkpoint['last_seq'] if checkpoint else 0))
+    
+    state = dict(checkpoint) if checkpoint else None
+    running_balance = state['running_balance'] if state else None
+    at_frontier = True
+    errors = []
+    for record in cursor.fetchall():
+        chained = record['index'] is not None
+        if chained:
+            expected_hash = _expected_block_hash(record)
+            if expected_hash is not None and expected_hash != record['hash']:
+                errors.append(f"Hash mismatch at block {record['index']}")
+            if record['hash_version'] in MERKLE_HASH_VERSIONS and not _entry_is_included(record):
+                errors.append(f"Merkle proof mismatch at block {record['index']}")
+        
+        balance = Decimal(str(record['current_balance']))
+        if running_balance is not None:
+            if abs(running_balance + Decimal(str(record['amount'])) - balance) > CENT:
+                label = f"block {record['index']}" if chained else f"pending entry {record['seq']}"
+                errors.append(f"Balance inconsistency at {label}")
+        running_balance = balance
+        
+        if not chained:
+            at_frontier = False
+        if at_frontier:
+            state = {
+                'last_seq': record['seq'],
+                'last_index': record['index'],
+                'last_hash': record['hash'],
+                'running_balance': balance,
+                'last_timestamp': record['entry_timestamp'],
+                'verified_blocks': (state['verified_blocks'] if state else 0) + 1
+            }
+    return errors, state, running_balance
+
+def _validate_transaction_blockchain(cursor, user_id: str, transaction_amount: Decimal,
+                                     current_balance: Decimal,
+                                     checkpoint: Optional[dict]) -> Tuple[bool, str, Optional[dict]]:
+    """Validate a transaction against the entries recorded since ``checkpoint``;
+    returns (valid, message, state) without writing anything"""
+    errors, state, running_balance = _verify_user_chain(cursor, user_id, checkpoint)
+    
+    if running_balance is None:
+        # First transaction for user - create genesis entry
+        return True, "First transaction - blockchain initialized", state
+    
+    if errors:
+        return False, errors[0], state
+    
+    # Validate current transaction against expected balance
+    expected_new_balance = running_balance + Decimal(str(transaction_amount))
+    if abs(expected_new_balance - Decimal(str(current_balance))) > CENT:
+        return False, f"Current transaction balance mismatch", state
+    
+    return True, "Blockchain validation successful", state
+
+def _checkpoint_moved(checkpoint: Optional[dict], state: Optional[dict]) -> bool:
+    return state is not None and (checkpoint is None or state['last_seq'] != checkpoint['last_seq'])
+
 def validate_transaction_blockchain(user_id: str, transaction_amount: Decimal, 
                                   current_balance: Decimal) -> Tuple[bool, str]:
     """Validate a transaction against the blockchain"""
@@ -214,60 +546,14 @@ def validate_transaction_blockchain(user_id: str, transaction_amount: Decimal,
         connection = get_blockchain_connection()
         
         with connection.cursor() as cursor:
-            # Get user's blockchain transaction history
-            cursor.execute("""
-                SELECT bt.amount, bt.current_balance, bt.timestamp,
-                       b.hash, b.previous_hash, b.index
-                FROM blockchain_transactions bt
-                JOIN blockchain b ON bt.id = b.transaction_id
-                WHERE bt.user_id = %s
-                ORDER BY b.index ASC
-            """, (user_id,))
-            
-            blockchain_history = cursor.fetchall()
-            
-            if not blockchain_history:
-                # First transaction for user - create genesis entry
-                return True, "First transaction - blockchain initialized"
-            
-            # Validate blockchain integrity
-            calculated_balance = Decimal('0.00')
-            previous_hash = '0'
-            
-            for i, record in enumerate(blockchain_history):
-                # Recreate block data for hash verification
-                block_data = {
-                    'user_id': user_id,
-                    'amount': float(record['amount']),
-                    'balance': float(record['current_balance']),
-                    'timestamp': record['timestamp'].isoformat(),
-                    'type': 'transaction'
-                }
-                
-                # Verify hash integrity
-                expected_hash = Block(
-                    index=record['index'],
-                    timestamp=record['timestamp'],
-                    transaction_data=block_data,
-                    previous_hash=previous_hash
-                ).calculate_hash()
-                
-                if expected_hash != record['hash']:
-                    return False, f"Hash mismatch at transaction {i+1}"
-                
-                # Verify balance progression
-                calculated_balance += Decimal(str(record['amount']))
-                if abs(calculated_balance - Decimal(str(record['current_balance']))) > Decimal('0.01'):
-                    return False, f"Balance inconsistency at transaction {i+1}"
-                
-                previous_hash = record['hash']
-            
-            # Validate current transaction against expected balance
-            expected_new_balance = calculated_balance + transaction_amount
-            if abs(expected_new_balance - current_balance) > Decimal('0.01'):
-                return False, f"Current transaction balance mismatch"
-            
-            return True, "Blockchain validation successful"
+            checkpoint = _load_checkpoint(cursor, user_id)
+            is_valid, message, state = _validate_transaction_blockchain(
+                cursor, user_id, transaction_amount, current_balance, checkpoint
+            )
+            if _checkpoint_moved(checkpoint, state):
+                _save_checkpoint(cursor, user_id, state)
+        connection.commit()
+        return is_valid, message
             
     except Exception as e:
         print(f"Error validating blockchain: {e}")
@@ -276,92 +562,222 @@ def validate_transaction_blockchain(user_id: str, transaction_amount: Decimal,
         if 'connection' in locals():
             connection.close()
 
+def _record_ledger_entry(cursor, user_id: str, transaction_amount: Decimal,
+                         current_balance: Decimal, transaction_type: str,
+                         transaction_details: dict, flagged: List[str]) -> Tuple[bool, str]:
+    """Validate and record one ledger entry on an open cursor (no commit).
+    The entry is chained later by the block appender, so transfers never
+    wait on the chain tip. Users flagged for fraud are appended to ``flagged``."""
+    checkpoint = _load_checkpoint(cursor, user_id)
+    is_valid, validation_message, state = _validate_transaction_blockchain(
+        cursor, user_id, transaction_amount, current_balance, checkpoint
+    )
+    
+    if not is_valid:
+        print(f"Blockchain validation failed: {validation_message}")
+        # Mark user as potentially fraudulent but don't block transaction
+        if _flag_user_as_fraud(cursor, user_id, f"Blockchain inconsistency: {validation_message}"):
+            flagged.append(user_id)
+    
+    if _checkpoint_moved(checkpoint, state):
+        _save_checkpoint(cursor, user_id, state)
+    
+    # DATETIME columns drop sub-second precision; the appender hashes the stored
+    # value, and transaction_details are not persisted so they stay out of the hash
+    timestamp = datetime.now().replace(microsecond=0)
+    blockchain_tx_id = _create_blockchain_transaction(
+        cursor, user_id, transaction_amount, current_balance, transaction_type,
+        timestamp=timestamp
+    )
+    
+    if not blockchain_tx_id:
+        print("Failed to create blockchain transaction record, but allowing transaction")
+        return True, "Transaction processed (blockchain recording failed)"
+    
+    return True, "Transaction processed and queued for the blockchain"
+
 def process_transaction_with_blockchain(user_id: str, transaction_amount: Decimal, 
                                       current_balance: Decimal, transaction_type: str,
-                                      transaction_details: dict) -> Tuple[bool, str]:
-    """Process a transaction with blockchain validation and recording"""
+                                      transaction_details: dict, cursor=None,
+                                      flagged: Optional[List[str]] = None) -> Tuple[bool, str]:
+    """Process a transaction with blockchain validation and recording.
+    
+    When ``cursor`` is given the ledger entry is written inside the caller's
+    transaction and nothing is committed here; deadlocks and lock-wait timeouts
+    are re-raised so the caller can retry the whole unit of work. The caller
+    should call ``block_appender.notify()`` once it has committed, and add the
+    users appended to ``flagged`` to ``flagged_users``.
+    """
+    if cursor is not None:
+        try:
+            return _record_ledger_entry(
+                cursor, user_id, transaction_amount, current_balance,
+                transaction_type, transaction_details, [] if flagged is None else flagged
+            )
+        except Exception as e:
+            if is_retryable_error(e):
+                raise
+            print(f"Error processing transaction with blockchain: {e}")
+            return True, f"Transaction processed (blockchain error: {str(e)})"
+    
     try:
-        # For now, let's allow transactions to proceed even if blockchain fails
-        # This prevents the blockchain from blocking legitimate transactions
-        
-        # Validate transaction against blockchain
-        is_valid, validation_message = validate_transaction_blockchain(
-            user_id, transaction_amount, current_balance
-        )
-        
-        if not is_valid:
-            print(f"Blockchain validation failed: {validation_message}")
-            # Mark user as potentially fraudulent but don't block transaction
-            flag_user_as_fraud(user_id, f"Blockchain inconsistency: {validation_message}")
-            # Still allow the transaction to proceed
-        
-        # Create blockchain transaction record
-        blockchain_tx_id = create_blockchain_transaction(
-            user_id, transaction_amount, current_balance, transaction_type
-        )
-        
-        if not blockchain_tx_id:
-            print("Failed to create blockchain transaction record, but allowing transaction")
-            return True, "Transaction processed (blockchain recording failed)"
-        
-        # Create block data
-        block_data = {
-            'user_id': user_id,
-            'amount': float(transaction_amount),
-            'balance': float(current_balance),
-            'type': transaction_type,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'details': transaction_details
-        }
+        # Blockchain problems never block the transaction itself; inconsistencies
+        # only flag the user for review
+        connection = get_blockchain_connection()
         
-        # Add block to chain
-        if not add_block_to_chain(block_data, blockchain_tx_id):
-            print("Failed to add block to blockchain, but allowing transaction")
-            return True, "Transaction processed (blockchain recording failed)"
+        flagged = []
+        with connection.cursor() as own_cursor:
+            result = _record_ledger_entry(
+                own_cursor, user_id, transaction_amount, current_balance,
+                transaction_type, transaction_details, flagged
+            )
+        connection.commit()
+        flagged_users.add(flagged)
         
-        return True, "Transaction processed and added to blockchain"
+        from .block_appender import block_appender
+        block_appender.notify()
+        return result
         
     except Exception as e:
         print(f"Error processing transaction with blockchain: {e}")
+        connection.rollback() if 'connection' in locals() else None
         # Don't block transactions due to blockchain errors
         return True, f"Transaction processed (blockchain error: {str(e)})"
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
+FLAG_INSERT_CHUNK = 1000
+
+def _flag_users_as_fraud(cursor, reasons: Dict[str, str]) -> List[str]:
+    """
+    Flag many users at once using an open cursor (no commit). Idempotent:
+    users already on fraud_list (per the cached set, then per the table) are
+    skipped, and each chunk is a single INSERT ... SELECT statement. Returns
+    the ids written; add them to ``flagged_users`` only once the caller has
+    committed, so a rolled-back flag never reaches the cache.
+    """
+    pending = [(user_id, reason) for user_id, reason in reasons.items()
+               if not flagged_users.contains(user_id)]
+    if not pending:
+        return []
+    
+    flagged = []
+    now = datetime.now()
+    for start in range(0, len(pending), FLAG_INSERT_CHUNK):
+        chunk = pending[start:start + FLAG_INSERT_CHUNK]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f"SELECT DISTINCT reported_user_id FROM fraud_list WHERE reported_user_id IN ({placeholders})",
+                       [user_id for user_id, _ in chunk])
+        existing = {row['reported_user_id'] for row in cursor.fetchall()}
+        chunk = [(user_id, reason) for user_id, reason in chunk if user_id not in existing]
+        if not chunk:
+            continue
+        rows = ' UNION ALL '.join(['SELECT %s AS id, %s AS reported_user_id, %s AS reason'] * len(chunk))
+        params = [now]
+        for user_id, reason in chunk:
+            params += [str(uuid.uuid4()), user_id, f"Blockchain Security Alert: {reason}"]
+        cursor.execute(f"""
+            INSERT INTO fraud_list (id, user_id, reported_user_id, reason, created_at)
+            SELECT v.id, 'system', v.reported_user_id, v.reason, %s
+            FROM ({rows}) v
+            WHERE NOT EXISTS (
+                SELECT 1 FROM fraud_list f WHERE f.reported_user_id = v.reported_user_id
+            )
+        """, params)
+        flagged += [user_id for user_id, _ in chunk]
+    
+    print(f"Flagged {len(flagged)} users for fraud")
+    return flagged
+
+def _flag_user_as_fraud(cursor, user_id: str, reason: str) -> bool:
+    """Flag a user as potentially fraudulent using an open cursor (no commit)"""
+    if not _flag_users_as_fraud(cursor, {user_id: reason}):
+        print(f"User {user_id} already flagged for fraud")
+        return False
+    
+    print(f"User {user_id} flagged for fraud: {reason}")
+    return True
+
+def flag_users_as_fraud(flags) -> int:
+    """Flag many (user_id, reason) pairs in bulk; returns the number of new flags"""
+    try:
+        connection = get_blockchain_connection()
+        
+        with connection.cursor() as cursor:
+            flagged = _flag_users_as_fraud(cursor, dict(flags))
+            connection.commit()
+        flagged_users.add(flagged)
+        return len(flagged)
+                
+    except Exception as e:
+        print(f"Error flagging users as fraud: {e}")
+        connection.rollback() if 'connection' in locals() else None
+        return 0
+    finally:
+        if 'connection' in locals():
+            connection.close()
 
 def flag_user_as_fraud(user_id: str, reason: str) -> bool:
     """Flag a user as potentially fraudulent"""
+    return flag_users_as_fraud([(user_id, reason)]) > 0
+
+_BALANCE_INCONSISTENCY_SQL = """
+    SELECT w.user_id, u.first_name, u.last_name, w.seq, w.timestamp,
+           w.expected_balance, w.current_balance
+    FROM (
+        SELECT d.*, ROW_NUMBER() OVER (PARTITION BY d.user_id ORDER BY d.seq) AS nth
+        FROM (
+            SELECT bt.user_id, bt.seq, bt.timestamp, bt.current_balance,
+                   LAG(bt.current_balance) OVER (PARTITION BY bt.user_id ORDER BY bt.seq)
+                       + bt.amount AS expected_balance
+            FROM blockchain_transactions bt
+        ) d
+        WHERE ABS(d.expected_balance - d.current_balance) > 0.01
+    ) w
+    JOIN users u ON u.id = w.user_id
+    WHERE w.nth = 1
+    ORDER BY w.user_id
+"""
+
+def detect_balance_inconsistencies(flag: bool = True) -> dict:
+    """
+    Sweep every user's ledger in one windowed query and report, per user, the
+    first entry whose balance is not the previous balance plus its amount.
+    Offending users are flagged with one bulk insert unless ``flag`` is False.
+    """
     try:
         connection = get_blockchain_connection()
-        
+
         with connection.cursor() as cursor:
-            # Check if user is already flagged
+            cursor.execute(_BALANCE_INCONSISTENCY_SQL)
+            rows = cursor.fetchall()
             cursor.execute("""
-                SELECT id FROM fraud_list WHERE reported_user_id = %s
-            """, (user_id,))
-            
-            existing_flag = cursor.fetchone()
-            
-            if not existing_flag:
-                # Flag the user
-                cursor.execute("""
-                    INSERT INTO fraud_list (id, user_id, reported_user_id, reason, created_at)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    str(uuid.uuid4()),
-                    'system',  # System-generated fraud flag
-                    user_id,
-                    f"Blockchain Security Alert: {reason}",
-                    datetime.now()
-                ))
-                
+                SELECT COUNT(DISTINCT bt.user_id) AS users
+                FROM blockchain_transactions bt
+                JOIN users u ON bt.user_id = u.id
+            """)
+            users_checked = cursor.fetchone()['users']
+
+            newly_flagged = []
+            if flag and rows:
+                newly_flagged = _flag_users_as_fraud(cursor, {
+                    row['user_id']: "Automated Detection: Balance inconsistency detected" for row in rows
+                })
                 connection.commit()
-                print(f"User {user_id} flagged for fraud: {reason}")
-                return True
-            else:
-                print(f"User {user_id} already flagged for fraud")
-                return False
-                
-    except Exception as e:
-        print(f"Error flagging user as fraud: {e}")
-        return False
+                flagged_users.add(newly_flagged)
+
+        return {
+            'fraud_detected': [{
+                'user_id': row['user_id'],
+                'user_name': f"{row['first_name']} {row['last_name']}",
+                'reason': f"Balance inconsistency: Expected {row['expected_balance']}, Got {row['current_balance']}",
+                'timestamp': row['timestamp']
+            } for row in rows],
+            'total_users_checked': users_checked,
+            'total_fraud_detected': len(rows),
+            'newly_flagged': len(newly_flagged)
+        }
     finally:
         if 'connection' in locals():
             connection.close()
@@ -381,8 +797,7 @@ def get_user_blockchain_summary(user_id: str) -> dict:
                     MAX(bt.timestamp) as last_transaction,
                     MAX(bt.current_balance) as current_balance
                 FROM blockchain_transactions bt
-                JOIN blockchain b ON bt.id = b.transaction_id
-                WHERE bt.user_id = %s
+                WHERE bt.user_id = %s AND bt.block_index IS NOT NULL
             """, (user_id,))
             
             summary = cursor.fetchone()
@@ -420,76 +835,154 @@ def get_user_blockchain_summary(user_id: str) -> dict:
         if 'connection' in locals():
             connection.close()
 
-def verify_entire_blockchain() -> Tuple[bool, List[str]]:
-    """Verify the integrity of the entire blockchain"""
+def get_inclusion_proof(entry_id: str) -> Optional[dict]:
+    """Inclusion proof for one ledger entry: the entry, its leaf hash, the
+    sibling path and the block header it resolves to (None if not chained yet)"""
     try:
         connection = get_blockchain_connection()
         
         with connection.cursor() as cursor:
-            # Get all blocks ordered by index
             cursor.execute("""
-                SELECT b.id, b.index, b.type, b.timestamp, b.previous_hash, b.hash,
-                       bt.user_id, bt.amount, bt.current_balance, bt.method
-                FROM blockchain b
-                LEFT JOIN blockchain_transactions bt ON b.transaction_id = bt.id
-                ORDER BY b.index ASC
-            """)
-            
-            blocks = cursor.fetchall()
-            errors = []
-            
-            if not blocks:
-                return True, ["No blocks found in blockchain"]
-            
-            # Verify each block
-            for i, block_data in enumerate(blocks):
-                if i == 0:
-                    # Genesis block
-                    if block_data['previous_hash'] != '0':
-                        errors.append(f"Genesis block has invalid previous hash")
-                    continue
-                
-                # Verify previous hash matches
-                previous_block = blocks[i - 1]
-                if block_data['previous_hash'] != previous_block['hash']:
-                    errors.append(f"Block {i} has invalid previous hash reference")
-                
-                # Recreate block for hash verification
-                if block_data['user_id']:  # Transaction block
-                    transaction_data = {
-                        'user_id': block_data['user_id'],
-                        'amount': float(block_data['amount']),
-                        'balance': float(block_data['current_balance']),
-                        'type': block_data['type'],
-                        'timestamp': block_data['timestamp'].isoformat()
-                    }
-                else:  # Genesis block
-                    transaction_data = {
-                        'type': 'genesis',
-                        'message': 'FinGuard Blockchain Genesis Block',
-                        'amount': 0.0,
-                        'user_id': 'system'
-                    }
-                
-                # Verify hash
-                expected_block = Block(
-                    index=block_data['index'],
-                    timestamp=block_data['timestamp'],
-                    transaction_data=transaction_data,
-                    previous_hash=block_data['previous_hash']
-                )
-                
-                if expected_block.hash != block_data['hash']:
-                    errors.append(f"Block {i} has invalid hash")
-            
-            return len(errors) == 0, errors
-            
+                SELECT bt.id, bt.user_id, bt.amount, bt.current_balance, bt.method, bt.timestamp,
+                       bt.block_index, bt.leaf_index, bt.merkle_proof,
+                       b.hash AS block_hash, b.previous_hash, b.timestamp AS block_timestamp,
+                       b.merkle_root, b.tx_count, b.hash_version
+                FROM blockchain_transactions bt
+                JOIN blockchain b
+                  ON b.`index` = bt.block_index AND b.transaction_id IS NULL
+                WHERE bt.id = %s
+            """, (entry_id,))
+            row = cursor.fetchone()
+        
+        if not row or row['hash_version'] not in MERKLE_HASH_VERSIONS:
+            return None
+        
+        return {
+            'entry': {
+                'id': row['id'],
+                'user_id': row['user_id'],
+                'amount': float(row['amount']),
+                'current_balance': float(row['current_balance']),
+                'method': row['method'],
+                'timestamp': row['timestamp'].isoformat()
+            },
+            'leaf_hash': _entry_leaf_hash(row['id'], row['user_id'], row['amount'],
+                                          row['current_balance'], row['method'], row['timestamp'],
+                                          row['hash_version']),
+            'leaf_index': row['leaf_index'],
+            'proof': merkle.decode_proof(row['merkle_proof']),
+            'block': {
+                'index': row['block_index'],
+                'hash': row['block_hash'],
+                'previous_hash': row['previous_hash'],
+                'timestamp': row['block_timestamp'].isoformat(),
+                'merkle_root': row['merkle_root'],
+                'tx_count': row['tx_count'],
+                'hash_version': row['hash_version']
+            }
+        }
     except Exception as e:
-        return False, [f"Blockchain verification error: {str(e)}"]
+        print(f"Error getting inclusion proof: {e}")
+        return None
     finally:
         if 'connection' in locals():
             connection.close()
 
+def verify_inclusion_proof(proof: dict) -> bool:
+    """Check an inclusion proof offline: the entry hashes to the leaf, the path
+    leads to the Merkle root, and the root is committed to by the block hash"""
+    entry = proof['entry']
+    block = proof['block']
+    hash_version = block.get('hash_version', MERKLE_HASH_VERSION)
+    leaf = _entry_leaf_hash(entry['id'], entry['user_id'], entry['amount'], entry['current_balance'],
+                            entry['method'], datetime.fromisoformat(entry['timestamp']), hash_version)
+    if leaf != proof['leaf_hash']:
+        return False
+    if not merkle.verify_proof(leaf, proof['proof'], block['merkle_root']):
+        return False
+    header = MerkleBlock(block['index'], datetime.fromisoformat(block['timestamp']),
+                         block['merkle_root'], block['tx_count'], block['previous_hash'], hash_version)
+    return header.hash == block['hash']
+
+def verify_entire_blockchain(start_index: int = 0) -> Tuple[bool, List[str]]:
+    """Verify the integrity of the entire blockchain (from ``start_index``).
+    Streams the chain in chunks and recomputes hashes in loky workers; see
+    chain_verifier.verify_chain_streaming for progress and resumable runs."""
+    from .chain_verifier import verify_chain_streaming
+    try:
+        result = verify_chain_streaming(start_index)
+        if not result['verified_blocks']:
+            return True, ["No blocks found in blockchain"]
+        return result['valid'], result['errors']
+    except Exception as e:
+        return False, [f"Blockchain verification error: {str(e)}"]
+
+REVERIFY_LOCK_NAME = 'finguard_chain_reverify'
+
+def reverify_all_user_chains() -> dict:
+    """
+    Re-verify every user's ledger from genesis, rewrite their checkpoints and
+    flag users whose history is inconsistent. A MySQL advisory lock keeps
+    concurrent app processes from running the sweep at the same time.
+    """
+    summary = {'users_checked': 0, 'blocks_checked': 0, 'inconsistent_users': [], 'skipped': False}
+    connection = get_blockchain_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (REVERIFY_LOCK_NAME,))
+            if not cursor.fetchone()['acquired']:
+                summary['skipped'] = True
+                return summary
+            try:
+                cursor.execute("SELECT DISTINCT user_id FROM blockchain_transactions WHERE user_id IS NOT NULL")
+                user_ids = [row['user_id'] for row in cursor.fetchall()]
+                
+                for user_id in user_ids:
+                    errors, state, _ = _verify_user_chain(cursor, user_id)
+                    if state is not None:
+                        _save_checkpoint(cursor, user_id, state, full=True)
+                        summary['blocks_checked'] += state['verified_blocks']
+                    flagged = False
+                    if errors:
+                        summary['inconsistent_users'].append({'user_id': user_id, 'errors': errors})
+                        flagged = _flag_user_as_fraud(cursor, user_id, f"Blockchain inconsistency: {errors[0]}")
+                    connection.commit()
+                    if flagged:
+                        flagged_users.add([user_id])
+                    summary['users_checked'] += 1
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (REVERIFY_LOCK_NAME,))
+        return summary
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def start_chain_reverification_job(app) -> Optional[threading.Thread]:
+    """Run reverify_all_user_chains every BLOCKCHAIN_REVERIFY_INTERVAL seconds
+    on a daemon thread (0 disables the job)"""
+    interval = app.config.get('BLOCKCHAIN_REVERIFY_INTERVAL', 0)
+    if not interval:
+        return None
+    
+    def _run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    summary = reverify_all_user_chains()
+                    if not summary['skipped']:
+                        print(f"Full chain re-verification: {summary['users_checked']} users, "
+                              f"{summary['blocks_checked']} blocks, "
+                              f"{len(summary['inconsistent_users'])} inconsistent")
+                except Exception as e:
+                    print(f"Error during full chain re-verification: {e}")
+    
+    thread = threading.Thread(target=_run, name='finguard-chain-reverify', daemon=True)
+    thread.start()
+    return thread
+
 def get_blockchain_analytics() -> dict:
     """Get analytics about the blockchain"""
     try:
@@ -499,18 +992,27 @@ def get_blockchain_analytics() -> dict:
             # Get blockchain statistics
             cursor.execute("""
                 SELECT 
-                    COUNT(DISTINCT b.id) as total_blocks,
-                    COUNT(DISTINCT bt.user_id) as unique_users,
-                    SUM(bt.amount) as total_volume,
-                    AVG(bt.amount) as avg_transaction,
-                    MIN(b.timestamp) as blockchain_start,
-                    MAX(b.timestamp) as last_block
-                FROM blockchain b
-                LEFT JOIN blockchain_transactions bt ON b.transaction_id = bt.id
+                    COUNT(*) as total_blocks,
+                    SUM(tx_count) as chained_transactions,
+                    MIN(timestamp) as blockchain_start,
+                    MAX(timestamp) as last_block
+                FROM blockchain
             """)
             
             stats = cursor.fetchone()
             
+            # Batched blocks carry many entries, so volume comes from the ledger itself
+            cursor.execute("""
+                SELECT 
+                    COUNT(DISTINCT user_id) as unique_users,
+                    SUM(amount) as total_volume,
+                    AVG(amount) as avg_transaction
+                FROM blockchain_transactions
+                WHERE block_index IS NOT NULL
+            """)
+            
+            stats.update(cursor.fetchone())
+            
             # Get fraud statistics
             cursor.execute("""
                 SELECT 
@@ -524,6 +1026,7 @@ def get_blockchain_analytics() -> dict:
             
             return {
                 'total_blocks': stats['total_blocks'] or 0,
+                'chained_transactions': int(stats['chained_transactions'] or 0),
                 'unique_users': stats['unique_users'] or 0,
                 'total_volume': float(stats['total_volume'] or 0),
                 'avg_transaction': float(stats['avg_transaction'] or 0),
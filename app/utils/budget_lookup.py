@@ -0,0 +1,372 @@
+"""
+Distilled lookup table of budget predictions for cold paths.
+
+``flask distill-budget-table`` turns the live budget models into a compact
+grid. Cells are keyed by income bracket (the monthly_income ranges
+_parse_income knows, clipped to the population's 1st-99th income
+percentile), dependents, living_situation, transport_mode,
+eating_out_frequency and savings. Savings is keyed too: the savings habit
+sets the Savings target, so averaging it out blows the error bound. Within
+each cell there are three continuous axes:
+- monthly income, with knots spread across the bracket;
+- fixed costs (rent, utilities, internet, loans) as a share of income;
+- variable costs (transport, groceries) as a share of income.
+
+Share knots are spread evenly over the population's 1st-99th percentile.
+Lookups interpolate trilinearly between knots, so any income inside the
+grid is served, not just the ones seen at distill time. Brackets keep
+interpolation from smoothing over the jumps the forests learn between
+income ranges. Every grid value is the mean model prediction over
+--samples real users whose key features, income and cost shares were set
+to the grid point's.
+
+The same pass scores the table against the models at random incomes and
+cost shares inside the grid. Each cell keeps the 95th-percentile error of
+its total budget, relative to income, and of each category. A lookup
+answers only when the user is inside the grid and the cell's total error is
+at most DISTILLED_BUDGET_MAX_ERROR. Otherwise the caller uses the full
+models.
+
+Tables are stored next to the model version they were distilled from
+(``<family>/<version>/budget_lookup.npz``), so a newly published version
+never serves an old table.
+"""
+
+import bisect
+import itertools
+import os
+import threading
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_FILE = 'budget_lookup.npz'
+KEY_COLUMNS = ['living_situation', 'transport_mode', 'eating_out_frequency', 'savings']
+# Cost fields per continuous axis; the first field takes the whole share when a user has none
+SHARE_FIELDS = [
+    ['rent', 'utilities_cost', 'mobile_internet_cost', 'loan_payment'],
+    ['grocery_cost', 'transport_cost'],
+]
+MAX_DEPENDENTS = 6
+DEFAULT_SAMPLES = 16
+DEFAULT_KNOTS = 5
+DEFAULT_INCOME_KNOTS = 3
+# Inner edges of the monthly_income ranges (see BudgetMLGenerator._parse_income)
+INCOME_BRACKETS = [20000, 40000, 60000, 80000, 100000]
+DEFAULT_MAX_ERROR = 0.05
+
+
+def cost_shares(user):
+    """(fixed, variable) habit costs as shares of income, or None without an income"""
+    income = user.get('monthly_income_numeric') or 0
+    if income <= 0:
+        return None
+    shares = []
+    for fields in SHARE_FIELDS:
+        spent = 0.0
+        for field in fields:
+            spent += float(user.get(field) or 0)
+        shares.append(spent / income)
+    return shares
+
+
+def _knot_weights(knots, points):
+    """Lower knot index and weight of the upper knot for each point on evenly spaced knots"""
+    position = (points - knots[..., 0]) / (knots[..., 1] - knots[..., 0])
+    knot = np.clip(np.floor(position).astype(int), 0, knots.shape[-1] - 2)
+    return knot, position - knot
+
+
+def income_edges(incomes):
+    """Bracket edges covering the 1st-99th percentile of ``incomes``"""
+    low, high = np.quantile(incomes, [0.01, 0.99])
+    if high <= low:
+        low, high = low * 0.9, high * 1.1
+    return [low] + [edge for edge in INCOME_BRACKETS if low < edge < high] + [high]
+
+
+class BudgetLookupTable:
+    """
+    Per-category amounts on a grid of (income bracket, dependents,
+    KEY_COLUMNS...) cells x (income, fixed share, variable share) knots,
+    with per-cell error bounds
+    """
+
+    def __init__(self, model_version, categories, income_knots, dependents, labels, knots,
+                 values, category_errors, total_errors, samples):
+        self.model_version = model_version
+        self.categories = list(categories)
+        self.income_knots = np.asarray(income_knots, dtype=float)  # (bracket, income knot)
+        self.dependents = np.asarray(dependents, dtype=int)
+        self.labels = {col: list(labels[col]) for col in KEY_COLUMNS}
+        self.knots = np.asarray(knots, dtype=float)
+        self.values = values                    # cell + (income knot, fixed knot, variable knot, category)
+        self.category_errors = category_errors  # cell + (category,), p95 absolute
+        self.total_errors = total_errors        # cell, p95 of |total error| / income
+        self.samples = samples
+        # Flat per-cell views keep the per-call work in plain Python
+        self._income_knots = self.income_knots.tolist()
+        self._income_edges = self.income_knots[:, 0].tolist() + [float(self.income_knots[-1, -1])]
+        self._knot_lists = self.knots.tolist()
+        self._max_dependents = int(self.dependents[-1])
+        self._strides = [stride // total_errors.itemsize for stride in total_errors.strides]
+        self._total_errors = total_errors.ravel().tolist()
+        self._cell_values = values.reshape((-1,) + values.shape[-4:])
+        self._label_index = {col: {label: i for i, label in enumerate(values_)}
+                             for col, values_ in self.labels.items()}
+
+    @property
+    def grid_shape(self):
+        """Knots per continuous axis: (income, fixed share, variable share)"""
+        return self.values.shape[-4:-1]
+
+    def predict(self, user, max_error=DEFAULT_MAX_ERROR):
+        """{category: amount} for a USER_DATA_QUERY row, or None outside the grid or error bound"""
+        income = float(user.get('monthly_income_numeric') or 0)
+        dependents = float(user.get('dependents') or 0)
+        edges = self._income_edges
+        if not edges[0] <= income <= edges[-1]:
+            return None
+        if not dependents.is_integer() or not 0 <= dependents <= self._max_dependents:
+            return None
+        bracket = min(bisect.bisect_right(edges, income) - 1, len(edges) - 2)
+        cell = bracket * self._strides[0] + int(dependents) * self._strides[1]
+        for col, stride in zip(KEY_COLUMNS, self._strides[2:]):
+            code = self._label_index[col].get(str(user.get(col)))
+            if code is None:
+                return None
+            cell += code * stride
+        if self._total_errors[cell] > max_error:
+            return None
+
+        shares = cost_shares(user)
+        if shares is None:
+            return None
+        corner = []
+        for knots, point in zip([self._income_knots[bracket]] + self._knot_lists, [income] + shares):
+            if not knots[0] <= point <= knots[-1]:
+                return None
+            knot = min(bisect.bisect_right(knots, point) - 1, len(knots) - 2)
+            corner.append((knot, (point - knots[knot]) / (knots[knot + 1] - knots[knot])))
+        (i, wi), (f, wf), (v, wv) = corner
+        amounts = self._cell_values[cell, i:i + 2, f:f + 2, v:v + 2]
+        weights = np.array([(1 - wi) * (1 - wf) * (1 - wv), (1 - wi) * (1 - wf) * wv,
+                            (1 - wi) * wf * (1 - wv), (1 - wi) * wf * wv,
+                            wi * (1 - wf) * (1 - wv), wi * (1 - wf) * wv,
+                            wi * wf * (1 - wv), wi * wf * wv])
+        return dict(zip(self.categories, (weights @ amounts.reshape(8, -1)).tolist()))
+
+    def coverage(self, max_error=DEFAULT_MAX_ERROR):
+        """Share of cells within the error bound"""
+        return float((self.total_errors <= max_error).mean())
+
+    def save(self, path):
+        tmp = f'{path}.tmp.npz'
+        np.savez_compressed(
+            tmp,
+            model_version=np.array(self.model_version),
+            categories=np.array(self.categories),
+            income_knots=self.income_knots,
+            dependents=self.dependents,
+            knots=self.knots,
+            values=self.values,
+            category_errors=self.category_errors,
+            total_errors=self.total_errors,
+            samples=np.array(self.samples),
+            **{f'labels_{col}': np.array(self.labels[col]) for col in KEY_COLUMNS}
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                str(data['model_version']), data['categories'].tolist(), data['income_knots'], data['dependents'],
+                {col: data[f'labels_{col}'].tolist() for col in KEY_COLUMNS}, data['knots'],
+                data['values'], data['category_errors'], data['total_errors'], int(data['samples'])
+            )
+
+
+def _cell_user(base, income, dependents, labels, shares):
+    """``base`` with a grid point's key features, its costs scaled to ``shares`` of income"""
+    user = dict(base, monthly_income_numeric=income, dependents=float(dependents), **labels)
+    for fields, share in zip(SHARE_FIELDS, shares):
+        spent = sum(float(base.get(field) or 0) for field in fields)
+        for field in fields:
+            user[field] = float(base.get(field) or 0) * share * income / spent if spent > 0 else 0.0
+        if spent <= 0:
+            user[fields[0]] = share * income
+    return user
+
+
+def _interpolate(values, axes):
+    """
+    values (cells, income knots, knots, knots, categories) at the (knot,
+    weight) pairs of ``axes``, each (cells, samples) -> (cells, samples, categories)
+    """
+    cells = np.arange(len(values))[:, None]
+    estimate = 0.0
+    for corner in itertools.product((0, 1), repeat=len(axes)):
+        index, weight = [cells], 1.0
+        for (knot, upper), bit in zip(axes, corner):
+            index.append(knot + bit)
+            weight = weight * (upper if bit else 1 - upper)
+        estimate = estimate + values[tuple(index)] * weight[..., None]
+    return estimate
+
+
+def distill_budget_table(generator, users, bundle=None, samples=DEFAULT_SAMPLES, knots=DEFAULT_KNOTS,
+                         income_knots=DEFAULT_INCOME_KNOTS, seed=0, cells_per_chunk=16):
+    """
+    Distill ``bundle`` (default: the live one) into a BudgetLookupTable, using
+    ``users`` (normalized USER_DATA_QUERY rows) as the population the other
+    features are drawn from
+    """
+    bundle = bundle or generator.bundle
+    population = [user for user in users if (user.get('monthly_income_numeric') or 0) > 0]
+    if not bundle or not population:
+        raise ValueError('Distilling needs trained models and users with an income')
+
+    edges = income_edges([float(user['monthly_income_numeric']) for user in population])
+    income_values = np.array([np.linspace(low, high, income_knots) for low, high in zip(edges, edges[1:])])
+    max_dependents = min(MAX_DEPENDENTS, int(max(float(user.get('dependents') or 0) for user in population)))
+    dependents = list(range(max_dependents + 1))
+    labels = {}
+    for col in KEY_COLUMNS:
+        encoder = bundle.label_encoders.get(col)
+        labels[col] = ([str(label) for label in encoder.classes_] if encoder is not None
+                       else sorted({str(user.get(col)) for user in population}))
+    # Knots span the 1st-99th percentile of each share in the population
+    shares = np.array([cost_shares(user) for user in population])
+    knot_values = np.array([np.linspace(low, max(high, low + 0.05), knots)
+                            for low, high in np.quantile(shares, [0.01, 0.99], axis=0).T])
+    share_grid = list(itertools.product(knot_values[0], knot_values[1]))
+    grid_shape = (income_knots, knots, knots)
+    points = income_knots * len(share_grid)
+
+    axes = [range(len(income_values)), dependents] + [range(len(labels[col])) for col in KEY_COLUMNS]
+    cells = list(itertools.product(*axes))
+    rng = np.random.default_rng(seed)
+    categories, values, category_errors, total_errors = None, [], [], []
+
+    for start in range(0, len(cells), cells_per_chunk):
+        chunk = cells[start:start + cells_per_chunk]
+        chunk_knots = income_values[[cell[0] for cell in chunk]]
+        # Check points: uniform incomes within each cell's bracket and uniform shares
+        check_incomes = rng.uniform(chunk_knots[:, :1], chunk_knots[:, -1:], (len(chunk), samples))
+        check_shares = rng.uniform(knot_values[:, :1, None], knot_values[:, -1:, None], (2, len(chunk), samples))
+        rows = []
+        for c, (bracket, dependent, *codes) in enumerate(chunk):
+            key = {col: labels[col][code] for col, code in zip(KEY_COLUMNS, codes)}
+            grid = [(income, point) for income in income_values[bracket] for point in share_grid]
+            for s, base in enumerate(rng.integers(len(population), size=samples)):
+                for income, point in grid + [(check_incomes[c, s], tuple(check_shares[:, c, s]))]:
+                    rows.append(_cell_user(population[base], income, dependent, key, point))
+
+        predictions = generator._predict_categories(generator._prepare_feature_matrix(rows, bundle), bundle)
+        categories = categories or list(predictions)
+        predicted = np.column_stack([predictions[category] for category in categories])
+        predicted = predicted.reshape(len(chunk), samples, points + 1, len(categories))
+
+        table = predicted[:, :, :points].mean(axis=1).reshape((len(chunk),) + grid_shape + (len(categories),))
+        estimate = _interpolate(table, [_knot_weights(chunk_knots[:, None, :], check_incomes)]
+                                + [_knot_weights(axis_knots, axis_shares)
+                                   for axis_knots, axis_shares in zip(knot_values, check_shares)])
+        actual = predicted[:, :, points]
+        values.append(table.astype(np.float32))
+        category_errors.append(np.percentile(np.abs(estimate - actual), 95, axis=1))
+        total_errors.append(np.percentile(np.abs(estimate.sum(axis=2) - actual.sum(axis=2)) / check_incomes,
+                                          95, axis=1))
+
+    shape = tuple(len(axis) for axis in axes)
+    return BudgetLookupTable(
+        bundle.version, categories, income_values, dependents, labels, knot_values,
+        np.concatenate(values).reshape(shape + grid_shape + (len(categories),)),
+        np.concatenate(category_errors).reshape(shape + (len(categories),)),
+        np.concatenate(total_errors).reshape(shape),
+        samples
+    )
+
+
+class DistilledBudgetLookup:
+    """The lookup table of the live model version, loaded once per version"""
+
+    def __init__(self, max_error=DEFAULT_MAX_ERROR):
+        self.max_error = max_error
+        self._version = None
+        self._table = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, max_error=None):
+        if max_error is not None:
+            self.max_error = max_error
+
+    @staticmethod
+    def table_path(registry, version):
+        return os.path.join(registry.family_dir, version, LOOKUP_FILE)
+
+    def table(self, registry, bundle):
+        """Table for ``bundle``'s version, or None if none was distilled"""
+        with self._lock:
+            # A missing table is looked for again after the registry's check interval
+            if bundle.version == self._version and (
+                    self._table is not None or time.monotonic() - self._checked_at < registry.check_interval):
+                return self._table
+            self._version, self._table, self._checked_at = bundle.version, None, time.monotonic()
+            path = self.table_path(registry, bundle.version)
+            if os.path.exists(path):
+                try:
+                    self._table = BudgetLookupTable.load(path)
+                    logger.info(f"Loaded budget lookup table for version {bundle.version}")
+                except Exception as e:
+                    logger.error(f"Error loading budget lookup table {path}: {e}")
+            return self._table
+
+    def predict(self, generator, user):
+        """Distilled {category: amount} for a user, or None to use the full models"""
+        bundle = generator.bundle
+        if bundle is None:
+            return None
+        table = self.table(generator.registry, bundle)
+        return table.predict(user, self.max_error) if table is not None else None
+
+    def distill(self, generator, samples=DEFAULT_SAMPLES, knots=DEFAULT_KNOTS, income_knots=DEFAULT_INCOME_KNOTS):
+        """Distill the live version from every user's habits and store it next to the models"""
+        bundle = generator.bundle
+        if bundle is None or not os.path.isdir(os.path.join(generator.registry.family_dir, bundle.version)):
+            raise ValueError('No published model version to distill')
+        table = distill_budget_table(generator, generator._get_users_data().values(), bundle, samples, knots,
+                                     income_knots)
+        table.save(self.table_path(generator.registry, bundle.version))
+        with self._lock:
+            self._version, self._table = bundle.version, table
+        return table
+
+
+# Create global instance
+budget_lookup = DistilledBudgetLookup()
+
+
+def init_budget_lookup(app):
+    """Configure the global lookup and register ``flask distill-budget-table``"""
+    import click
+    from .ml_budget_generator import budget_generator
+
+    budget_lookup.configure(max_error=app.config.get('DISTILLED_BUDGET_MAX_ERROR', DEFAULT_MAX_ERROR))
+    app.budget_lookup = budget_lookup
+
+    @app.cli.command('distill-budget-table')
+    @click.option('--samples', default=DEFAULT_SAMPLES, help='Users averaged per grid point')
+    @click.option('--knots', default=DEFAULT_KNOTS, help='Knots per cost-share axis')
+    @click.option('--income-knots', default=DEFAULT_INCOME_KNOTS, help='Income knots per bracket')
+    def distill_budget_table_command(samples, knots, income_knots):
+        """Distill the live budget models into a lookup table"""
+        table = budget_lookup.distill(budget_generator, samples, knots, income_knots)
+        click.echo(f'Distilled version {table.model_version}: {table.total_errors.size} cells x '
+                   f'{"x".join(map(str, table.grid_shape))} knots, {table.coverage(budget_lookup.max_error):.1%} within '
+                   f'{budget_lookup.max_error:.1%} of income')
+
+    return budget_lookup
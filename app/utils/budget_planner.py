@@ -6,6 +6,7 @@ Combines traditional budget planning with AI-powered recommendations
 from flask import current_app
 import uuid
 from .ml_budget_generator import budget_generator
+from .budget_lookup import budget_lookup
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,21 @@ class EnhancedBudgetPlanner:
             'Travel', 'Childcare', 'Pets', 'Other'
         ]
     
+    def _generate_ml_budget(self, user_id):
+        """
+        ML budget from the distilled lookup table when the user falls inside
+        its grid and error bound, otherwise from the full models
+        """
+        user_data = budget_generator._get_user_data(user_id)
+        if not user_data:
+            logger.error(f"No data found for user {user_id}")
+            return None
+        
+        predictions = budget_lookup.predict(budget_generator, user_data)
+        if predictions is not None:
+            return budget_generator._build_budget(user_id, user_data, predictions)
+        return budget_generator.generate_budgets_from_data({user_id: user_data}).get(user_id)
+    
     def create_smart_budget(self, user_id, budget_name="Smart Budget", use_ml=True):
         """
         Create a smart budget using ML if available, fallback to traditional methods
@@ -31,7 +47,7 @@ class EnhancedBudgetPlanner:
         try:
             if use_ml and budget_generator.model_trained:
                 logger.info(f"Creating ML-powered budget for user {user_id}")
-                ml_budget = budget_generator.generate_budget_for_user(user_id)
+                ml_budget = self._generate_ml_budget(user_id)
                 
                 if ml_budget:
                     # Save ML budget to database
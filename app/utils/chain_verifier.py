@@ -0,0 +1,222 @@
+"""
+Streaming, parallel verification of the FinGuard blockchain.
+Blocks are read through a server-side cursor in fixed-size chunks; linkage is
+checked in order against the previous chunk's boundary hash while hash
+recomputation fans out to joblib's loky worker processes. Runs can resume from any index and
+report progress while they execute.
+"""
+
+import os
+import threading
+import time
+import uuid
+import pymysql
+from flask import current_app
+from joblib import Parallel, delayed
+from .blockchain_utils import _expected_block_hash
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+MAX_TRACKED_JOBS = 20
+
+_CHAIN_SQL = """
+    SELECT b.`index`, b.timestamp, b.previous_hash, b.hash,
+           b.transaction_id, b.hash_version, b.merkle_root, b.tx_count,
+           bt.user_id, bt.amount, bt.current_balance, bt.method
+    FROM blockchain b
+    LEFT JOIN blockchain_transactions bt ON b.transaction_id = bt.id
+    WHERE b.`index` >= %s
+    ORDER BY b.`index` ASC
+"""
+
+
+def _chunk_hash_errors(rows):
+    """Worker: indexes of blocks whose stored hash does not match"""
+    bad = []
+    for row in rows:
+        expected_hash = _expected_block_hash(row)
+        if expected_hash is not None and expected_hash != row['hash']:
+            bad.append(row['index'])
+    return bad
+
+
+def _count_blocks(start_index):
+    connection = current_app.get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) AS total FROM blockchain WHERE `index` >= %s", (start_index,))
+            return cursor.fetchone()['total']
+    finally:
+        connection.close()
+
+
+def _default_workers():
+    return current_app.config.get('BLOCKCHAIN_VERIFY_WORKERS') or os.cpu_count() or 1
+
+
+def verify_chain_streaming(start_index=0, chunk_size=None, workers=None, progress=None):
+    """
+    Verify the chain from ``start_index`` onwards without loading it into memory.
+
+    Returns a dict with ``valid``, ``errors`` (first MAX_REPORTED_ERRORS messages,
+    ordered by block index), ``error_count``, ``verified_blocks``, ``last_index``
+    (highest index whose hash and linkage are both checked) and ``next_index``
+    (where a later run should resume). ``progress`` is called with that dict
+    after every completed chunk.
+    """
+    start_index = max(0, int(start_index or 0))
+    chunk_size = chunk_size or current_app.config.get('BLOCKCHAIN_VERIFY_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    workers = workers or _default_workers()
+
+    result = {
+        'valid': True,
+        'errors': [],
+        'error_count': 0,
+        'verified_blocks': 0,
+        'start_index': start_index,
+        'last_index': start_index - 1,
+        'next_index': start_index,
+    }
+    errors = []
+
+    def add_error(index, message):
+        result['error_count'] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append((index, message))
+
+    def collect(bad, last_index, count):
+        for index in bad:
+            add_error(index, f"Block {index} has invalid hash")
+        result['verified_blocks'] += count
+        result['last_index'] = last_index
+        result['next_index'] = last_index + 1
+        if progress:
+            progress(dict(result, errors=[message for _, message in sorted(errors)]))
+
+    def check_hashes(parallel, batch):
+        if parallel is None:
+            results = [_chunk_hash_errors(rows) for rows in batch]
+        else:
+            results = parallel(delayed(_chunk_hash_errors)(rows) for rows in batch)
+        for rows, bad in zip(batch, results):
+            collect(bad, rows[-1]['index'], len(rows))
+        batch.clear()
+
+    connection = current_app.get_db_connection()
+    # joblib's loky workers, not multiprocessing: spawned workers would re-run the
+    # web app's main module (run.py builds a whole app at import)
+    parallel = Parallel(n_jobs=workers) if workers > 1 else None
+    try:
+        boundary_hash = '0'
+        if start_index > 0:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT hash FROM blockchain WHERE `index` = %s LIMIT 1", (start_index - 1,))
+                boundary = cursor.fetchone()
+            if boundary is None:
+                raise ValueError(f"No block at index {start_index - 1} to resume from")
+            boundary_hash = boundary['hash']
+
+        batch = []
+        with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(_CHAIN_SQL, (start_index,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                # Linkage is sequential but cheap: each chunk only needs the
+                # previous chunk's last hash
+                for row in rows:
+                    if row['previous_hash'] != boundary_hash:
+                        if row['index'] == 0:
+                            add_error(0, "Genesis block has invalid previous hash")
+                        else:
+                            add_error(row['index'], f"Block {row['index']} has invalid previous hash reference")
+                    boundary_hash = row['hash']
+
+                batch.append(rows)
+                # Bound memory: hash at most two chunks per worker at a time
+                if len(batch) >= (2 * workers if parallel else 1):
+                    check_hashes(parallel, batch)
+
+        if batch:
+            check_hashes(parallel, batch)
+    finally:
+        connection.close()
+
+    result['errors'] = [message for _, message in sorted(errors)]
+    result['valid'] = result['error_count'] == 0
+    return result
+
+
+class VerificationJobs:
+    """Background verification runs whose progress can be polled by id"""
+
+    def __init__(self, max_tracked=MAX_TRACKED_JOBS):
+        self.max_tracked = max_tracked
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, app, start_index=0, chunk_size=None, workers=None):
+        job_id = str(uuid.uuid4())
+        job = {
+            'job_id': job_id,
+            'status': 'running',
+            'start_index': start_index,
+            'total_blocks': None,
+            'verified_blocks': 0,
+            'last_index': start_index - 1,
+            'next_index': start_index,
+            'error_count': 0,
+            'errors': [],
+            'valid': None,
+            'started_at': time.time(),
+            'finished_at': None,
+            'error': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            # Forget the oldest finished jobs beyond max_tracked
+            finished = [j for j in self._jobs.values() if j['status'] != 'running']
+            for old in sorted(finished, key=lambda j: j['started_at'])[:max(0, len(self._jobs) - self.max_tracked)]:
+                del self._jobs[old['job_id']]
+
+        def update(snapshot):
+            with self._lock:
+                job.update({key: snapshot[key] for key in
+                            ('verified_blocks', 'last_index', 'next_index', 'error_count', 'errors')})
+
+        def run():
+            with app.app_context():
+                try:
+                    total = _count_blocks(start_index)
+                    with self._lock:
+                        job['total_blocks'] = total
+                    result = verify_chain_streaming(start_index, chunk_size, workers, progress=update)
+                    with self._lock:
+                        job.update(result)
+                        job['status'] = 'completed'
+                except Exception as e:
+                    with self._lock:
+                        job['status'] = 'failed'
+                        job['error'] = str(e)
+                finally:
+                    with self._lock:
+                        job['finished_at'] = time.time()
+
+        threading.Thread(target=run, name=f'finguard-verify-{job_id[:8]}', daemon=True).start()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job, errors=list(job['errors']))
+        total = snapshot['total_blocks']
+        snapshot['percent'] = round(100.0 * snapshot['verified_blocks'] / total, 1) if total else None
+        return snapshot
+
+
+# Create global instance
+verification_jobs = VerificationJobs()
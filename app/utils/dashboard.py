@@ -1,41 +1,27 @@
 
 from flask import current_app
+from .rollup_utils import get_user_totals
 
 def get_user_dashboard_data(user_id):
-    """Get complete dashboard data using stored procedure"""
+    """Get complete dashboard data: totals from the daily rollup, balance and
+    risk score from the users row"""
     conn = current_app.get_db_connection()
     try:
+        totals = get_user_totals(user_id)
         with conn.cursor() as cursor:
-            cursor.callproc('GetUserDashboardData', [
-                user_id, None, None, None, None, None  # OUT parameters
-            ])
-            
-            # Fetch the OUT parameters
             cursor.execute("""
-                SELECT @_GetUserDashboardData_1 as current_balance,
-                       @_GetUserDashboardData_2 as total_sent,
-                       @_GetUserDashboardData_3 as total_received,
-                       @_GetUserDashboardData_4 as transaction_count,
-                       @_GetUserDashboardData_5 as risk_score
-            """)
-            result = cursor.fetchone()
-            
-            if result:
-                return {
-                    'current_balance': float(result['current_balance'] or 0),
-                    'total_sent': float(result['total_sent'] or 0),
-                    'total_received': float(result['total_received'] or 0),
-                    'transaction_count': int(result['transaction_count'] or 0),
-                    'risk_score': float(result['risk_score'] or 0)
-                }
-            else:
-                return {
-                    'current_balance': 0.0,
-                    'total_sent': 0.0,
-                    'total_received': 0.0,
-                    'transaction_count': 0,
-                    'risk_score': 0.0
-                }
+                SELECT balance AS current_balance, GetUserRiskScore(id) AS risk_score
+                FROM users WHERE id = %s
+            """, (user_id,))
+            result = cursor.fetchone() or {}
+        
+        return {
+            'current_balance': float(result.get('current_balance') or 0),
+            'total_sent': totals['total_sent'],
+            'total_received': totals['total_received'],
+            'transaction_count': totals['transaction_count'],
+            'risk_score': float(result.get('risk_score') or 0)
+        }
     except Exception as e:
         print(f"Error getting dashboard data: {e}")
         return {
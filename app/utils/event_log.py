@@ -0,0 +1,146 @@
+"""
+In-process event log for FinGuard.
+Request handlers enqueue messages without blocking; a background thread drains
+the bounded queue in batches and hands each batch to the configured sinks.
+"""
+
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def console_sink(messages):
+    """Default sink: mirror the old /log endpoint output on stdout"""
+    for message in messages:
+        print(f'[EVENT] {message}')
+
+
+def http_sink(url, timeout=2):
+    """Optional sink that forwards each batch to the /log endpoint"""
+    def _post(messages):
+        import requests
+        requests.post(url, json={'messages': messages}, timeout=timeout)
+    return _post
+
+
+class EventLog:
+    """Bounded, non-blocking event queue drained by a daemon thread"""
+
+    def __init__(self, maxsize=10000, batch_size=100, flush_interval=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sinks = [console_sink]
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stats = {
+            'emitted': 0,
+            'dropped': 0,
+            'delivered': 0,
+            'batches': 0,
+            'sink_errors': 0,
+        }
+
+    def configure(self, maxsize=None, batch_size=None, flush_interval=None, sinks=None):
+        with self._lock:
+            # The queue can only be resized before the first message is emitted
+            if maxsize is not None and self._worker is None:
+                self._queue = queue.Queue(maxsize=maxsize)
+            if batch_size is not None:
+                self.batch_size = batch_size
+            if flush_interval is not None:
+                self.flush_interval = flush_interval
+            if sinks is not None:
+                self.sinks = list(sinks)
+
+    def emit(self, message):
+        """Enqueue a message; never blocks, counts a drop when the queue is full"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._lock:
+            self._stats['emitted'] += 1
+        return True
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='finguard-event-log', daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, batch):
+        for sink in self.sinks:
+            try:
+                sink(batch)
+            except Exception as e:
+                with self._lock:
+                    self._stats['sink_errors'] += 1
+                logger.warning(f"Event log sink {getattr(sink, '__name__', sink)} failed: {e}")
+        with self._lock:
+            self._stats['delivered'] += len(batch)
+            self._stats['batches'] += 1
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._deliver(batch)
+
+    def flush(self, timeout=5.0):
+        """Wait until everything enqueued so far has been delivered"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            target = self._stats['emitted']
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._stats['delivered'] >= target:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        stats['capacity'] = self._queue.maxsize
+        return stats
+
+
+# Create global instance
+event_log = EventLog()
+
+
+def init_event_log(app):
+    """Configure the global event log from app config"""
+    sinks = [console_sink]
+    sink_url = app.config.get('EVENT_LOG_HTTP_SINK_URL')
+    if sink_url:
+        sinks.append(http_sink(sink_url))
+    event_log.configure(
+        maxsize=app.config.get('EVENT_LOG_QUEUE_SIZE', 10000),
+        batch_size=app.config.get('EVENT_LOG_BATCH_SIZE', 100),
+        sinks=sinks,
+    )
+    app.event_log = event_log
+    return event_log
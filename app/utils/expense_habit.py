@@ -1,6 +1,7 @@
 
 from flask import current_app
 import uuid
+from .feature_store import invalidate_user_features, refresh_user_features
 
 def get_expense_habit(user_id):
     conn = current_app.get_db_connection()
@@ -26,9 +27,11 @@ def upsert_expense_habit(user_id, data):
                 cursor.execute('''INSERT INTO user_expense_habit (id, user_id, timestamp, monthly_income, earning_member, dependents, living_situation, rent, transport_mode, transport_cost, eating_out_frequency, grocery_cost, utilities_cost, mobile_internet_cost, subscriptions, savings, investments, loans, loan_payment, financial_goal) VALUES (%s, %s, NOW(), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)''',
                     (str(uuid.uuid4()), user_id, data['monthly_income'], data['earning_member'], data['dependents'], data['living_situation'], data['rent'], data['transport_mode'], data['transport_cost'], data['eating_out_frequency'], data['grocery_cost'], data['utilities_cost'], data['mobile_internet_cost'], data['subscriptions'], data['savings'], data['investments'], data['loans'], data['loan_payment'], data['financial_goal']))
             
+            invalidate_user_features(cursor, user_id)
             conn.commit()
             cursor.execute('SELECT * FROM user_expense_habit WHERE user_id = %s', (user_id,))
             habit = cursor.fetchone()
-        return habit
     finally:
         conn.close()
+    refresh_user_features(user_id)
+    return habit
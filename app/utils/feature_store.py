@@ -0,0 +1,269 @@
+"""
+Per-user budget feature vectors persisted in ``user_budget_features``.
+
+Scoring a user from scratch means the expense habit / profile / address join
+(USER_DATA_QUERY), income parsing and label encoding. The store keeps the
+finished vector (FEATURE_COLUMNS order, little-endian float64 bytes) and the
+parsed income, tagged with a schema version: a fingerprint of FEATURE_COLUMNS
+and the model bundle's encoder classes.
+
+Rows tagged with another version (a new model version changed the encoders)
+count as missing. Like users without a row, they are recomputed from the raw
+tables and written back on the next read, so the table rebuilds itself as
+it is used; ``flask rebuild-budget-features`` rebuilds it in one pass.
+
+Saving an expense habit or profile deletes the user's row in the same
+transaction (invalidate_user_features) and recomputes it after the commit.
+"""
+
+import hashlib
+import json
+import threading
+import weakref
+import logging
+import numpy as np
+from flask import current_app
+from .ml_budget_generator import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Every user with an expense habit, with their stored row if it has this schema version
+FEATURE_READ_QUERY = """
+    SELECT ueh.user_id, f.features, f.monthly_income
+    FROM (SELECT DISTINCT user_id FROM user_expense_habit WHERE user_id IS NOT NULL) ueh
+    LEFT JOIN user_budget_features f ON f.user_id = ueh.user_id AND f.schema_version = %s
+"""
+
+FEATURE_UPSERT_SQL = """
+    INSERT INTO user_budget_features (user_id, schema_version, features, monthly_income, updated_at)
+    VALUES (%s, %s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        schema_version = VALUES(schema_version),
+        features = VALUES(features),
+        monthly_income = VALUES(monthly_income),
+        updated_at = VALUES(updated_at)
+"""
+
+# Write-back of vectors computed during a read: fills missing rows and replaces
+# rows of another schema version, but never a row already at this version. A
+# save's refresh may have written it after the read began, and the vector
+# computed here could predate that save. schema_version is assigned last
+# because MySQL applies the assignments in order.
+FEATURE_WRITE_BACK_SQL = """
+    INSERT INTO user_budget_features (user_id, schema_version, features, monthly_income, updated_at)
+    VALUES (%s, %s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        features = IF(schema_version = VALUES(schema_version), features, VALUES(features)),
+        monthly_income = IF(schema_version = VALUES(schema_version), monthly_income, VALUES(monthly_income)),
+        updated_at = IF(schema_version = VALUES(schema_version), updated_at, VALUES(updated_at)),
+        schema_version = VALUES(schema_version)
+"""
+
+_FEATURE_DTYPE = np.dtype('<f8')
+
+_schema_versions = weakref.WeakKeyDictionary()
+_schema_lock = threading.Lock()
+
+
+def feature_schema_version(bundle):
+    """16-hex fingerprint of FEATURE_COLUMNS and the bundle's encoder classes"""
+    with _schema_lock:
+        if bundle not in _schema_versions:
+            encoders = bundle.label_encoders
+            classes = {col: [str(label) for label in encoders[col].classes_] if col in encoders else None
+                       for col in CATEGORICAL_COLUMNS}
+            fingerprint = json.dumps([FEATURE_COLUMNS, classes], sort_keys=True).encode()
+            _schema_versions[bundle] = hashlib.sha256(fingerprint).hexdigest()[:16]
+        return _schema_versions[bundle]
+
+
+def invalidate_user_features(cursor, user_id):
+    """Drop a user's stored vector (no commit). Call it in the transaction that
+    changes their expense habit or profile so both commit together."""
+    cursor.execute('DELETE FROM user_budget_features WHERE user_id = %s', (user_id,))
+
+
+class BudgetFeatureStore:
+    """Bulk reads and write-back of stored feature vectors for a BudgetMLGenerator"""
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0}
+
+    def configure(self, chunk_size=None):
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counts[name] += delta
+
+    def metrics(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+        return counts
+
+    def _chunks(self, user_ids):
+        if user_ids is None:
+            return [None]
+        ids = list(dict.fromkeys(user_ids))
+        return [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)]
+
+    def get_many(self, generator, user_ids, bundle):
+        """
+        (user_ids, features, incomes) for the given users (None: everyone with
+        an expense habit) under ``bundle``'s encoders. Stored vectors are read
+        in one query per chunk; missing or stale ones are computed from the raw
+        tables and written back (without overwriting rows a concurrent refresh
+        stored meanwhile). Users without an expense habit are left out.
+        """
+        version = feature_schema_version(bundle)
+        found, blobs, incomes, missing = [], [], [], []
+        conn = current_app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                for chunk in self._chunks(user_ids):
+                    if chunk is None:
+                        cursor.execute(FEATURE_READ_QUERY, (version,))
+                    else:
+                        placeholders = ', '.join(['%s'] * len(chunk))
+                        cursor.execute(f"{FEATURE_READ_QUERY} WHERE ueh.user_id IN ({placeholders})",
+                                       [version] + chunk)
+                    for row in cursor.fetchall():
+                        if row['features'] is None:
+                            missing.append(row['user_id'])
+                        else:
+                            found.append(row['user_id'])
+                            blobs.append(bytes(row['features']))
+                            incomes.append(float(row['monthly_income']))
+        except Exception as e:
+            logger.error(f"Error reading stored budget features: {e}")
+            self._count(errors=1)
+            found = None
+        finally:
+            conn.close()
+        if found is None:
+            # Table not there yet or unreadable: score everyone from the raw tables
+            users = generator._get_users_data(user_ids)
+            return self._compute(generator, list(users), bundle, users)
+
+        features = np.frombuffer(b''.join(blobs), dtype=_FEATURE_DTYPE).reshape(len(blobs), len(FEATURE_COLUMNS))
+        incomes = np.array(incomes, dtype=float)
+        self._count(hits=len(found), misses=len(missing))
+        if missing:
+            computed_ids, computed, computed_incomes = self._compute(generator, missing, bundle)
+            self._write(version, computed_ids, computed, computed_incomes, overwrite=False)
+            found += computed_ids
+            features = np.vstack([features, computed])
+            incomes = np.concatenate([incomes, computed_incomes])
+        return found, features, incomes
+
+    def _compute(self, generator, user_ids, bundle, users=None):
+        """Feature vectors and incomes from USER_DATA_QUERY rows (fetched unless given)"""
+        users = generator._get_users_data(user_ids) if users is None else users
+        ids = [user_id for user_id in user_ids if user_id in users]
+        features = generator._prepare_feature_matrix([users[user_id] for user_id in ids], bundle)
+        features = features.reshape(len(ids), len(FEATURE_COLUMNS))
+        incomes = np.array([users[user_id]['monthly_income_numeric'] for user_id in ids], dtype=float)
+        return ids, features, incomes
+
+    def _write(self, version, user_ids, features, incomes, overwrite=True):
+        """Upsert vectors, one commit per chunk; failures are logged, not raised.
+        Without ``overwrite``, rows already at ``version`` are kept."""
+        if not user_ids:
+            return 0
+        rows = [(user_id, version, np.ascontiguousarray(vector, dtype=_FEATURE_DTYPE).tobytes(), float(income))
+                for user_id, vector, income in zip(user_ids, features, incomes)]
+        written = 0
+        conn = current_app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                for start in range(0, len(rows), self.chunk_size):
+                    cursor.executemany(FEATURE_UPSERT_SQL if overwrite else FEATURE_WRITE_BACK_SQL,
+                                       rows[start:start + self.chunk_size])
+                    conn.commit()
+                    written += len(rows[start:start + self.chunk_size])
+        except Exception as e:
+            logger.error(f"Error storing budget features for {len(rows)} users: {e}")
+            self._count(errors=1)
+            conn.rollback()
+        finally:
+            conn.close()
+        self._count(writes=written)
+        return written
+
+    def refresh(self, generator, user_id):
+        """Recompute one user's vector after their habit or profile changed; False without models"""
+        bundle = generator.bundle
+        if bundle is None:
+            return False
+        try:
+            ids, features, incomes = self._compute(generator, [user_id], bundle)
+        except Exception as e:
+            logger.error(f"Error computing budget features for user {user_id}: {e}")
+            self._count(errors=1)
+            return False
+        return bool(ids) and self._write(feature_schema_version(bundle), ids, features, incomes) == len(ids)
+
+    def rebuild(self, generator):
+        """Recompute every user's vector under the live encoders and drop rows of
+        other schema versions. Returns the number of vectors written."""
+        bundle = generator.bundle
+        if bundle is None:
+            raise ValueError('No trained models to build features for')
+        version = feature_schema_version(bundle)
+        conn = current_app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT DISTINCT user_id FROM user_expense_habit WHERE user_id IS NOT NULL')
+                user_ids = [row['user_id'] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        written = 0
+        for chunk in self._chunks(user_ids):
+            written += self._write(version, *self._compute(generator, chunk, bundle))
+            logger.info(f"Rebuilt budget features for {written}/{len(user_ids)} users")
+
+        conn = current_app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('DELETE FROM user_budget_features WHERE schema_version <> %s', (version,))
+            conn.commit()
+        finally:
+            conn.close()
+        return written
+
+
+# Create global instance
+budget_feature_store = BudgetFeatureStore()
+
+
+def refresh_user_features(user_id):
+    """Recompute a user's stored vector after a committed habit or profile change"""
+    from .ml_budget_generator import budget_generator
+    if budget_generator.feature_store is not None:
+        budget_feature_store.refresh(budget_generator, user_id)
+
+
+def init_feature_store(app):
+    """Attach the store to the global budget generator (unless BUDGET_FEATURE_STORE
+    is off) and register ``flask rebuild-budget-features``"""
+    import click
+    from .ml_budget_generator import budget_generator
+
+    budget_feature_store.configure(chunk_size=app.config.get('BUDGET_FEATURE_CHUNK_SIZE'))
+    if app.config.get('BUDGET_FEATURE_STORE', True):
+        budget_generator.feature_store = budget_feature_store
+    app.budget_feature_store = budget_feature_store
+
+    @app.cli.command('rebuild-budget-features')
+    def rebuild_budget_features_command():
+        """Recompute every user's stored budget feature vector"""
+        click.echo(f'Stored features for {budget_feature_store.rebuild(budget_generator)} users')
+
+    return budget_feature_store
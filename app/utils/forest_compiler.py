@@ -0,0 +1,182 @@
+"""
+Flattened NumPy evaluation of the budget forests.
+
+sklearn's RandomForestRegressor.predict validates its input, dispatches
+through joblib and walks each tree separately, which dominates the cost of
+scoring one user (18 categories x 100 trees). compile_bundle() copies every
+tree of a registry bundle into one set of contiguous arrays (feature,
+threshold, left/right child, leaf value). CompiledForests.predict then walks
+all trees for all rows together, one vectorized step per tree level.
+
+Results are identical to sklearn's, not just close. Features are scaled the
+same way StandardScaler does it and rounded to float32 as sklearn's trees
+do. Each category's tree outputs are summed in tree order and divided by
+the tree count, as RandomForestRegressor does.
+"""
+
+import threading
+import weakref
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+from .multi_output_budget import MULTI_OUTPUT_KEY, MultiOutputBudgetModel
+
+# Rows per evaluation block, as a budget of (trees x rows) traversal cells
+BLOCK_CELLS = 1 << 20
+
+# Batches up to this many rows are scored compiled. The flattened walk avoids
+# sklearn's fixed per-call and per-tree overhead but takes about twice as
+# long per row, so sklearn's C traversal wins on large batches
+# (see benchmarks/bench_forest_compiler.py).
+COMPILED_MAX_ROWS = 1000
+
+
+class CompiledForests:
+    """
+    Several forests, each with its own feature scaling, flattened into one
+    node table. predict() returns one (rows, outputs) array per forest.
+    """
+
+    def __init__(self, forests, scalers):
+        self.n_groups = len(forests)
+        self.n_features = forests[0].n_features_in_
+        self.n_outputs = forests[0].n_outputs_
+        self.means = np.array([scaler.mean_ for scaler in scalers], dtype=float)
+        self.scales = np.array([scaler.scale_ for scaler in scalers], dtype=float)
+        self.n_trees = np.array([len(forest.estimators_) for forest in forests], dtype=float)
+        self.trees_per_group = int(self.n_trees.max())
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+
+        def add(feature, threshold, left, right, value):
+            nonlocal offset
+            nodes = np.arange(offset, offset + len(feature))
+            leaf = left < 0
+            # Leaves point at themselves, so extra steps leave rows where they are
+            features.append(np.where(leaf, 0, feature))
+            thresholds.append(threshold)
+            lefts.append(np.where(leaf, nodes, left + offset))
+            rights.append(np.where(leaf, nodes, right + offset))
+            values.append(value)
+            roots.append(offset)
+            offset += len(feature)
+
+        depth = 0
+        for forest in forests:
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                add(tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                    tree.value.reshape(tree.node_count, -1))
+                depth = max(depth, tree.max_depth)
+            # Forests with fewer trees are padded with single-leaf trees worth 0
+            for _ in range(self.trees_per_group - len(forest.estimators_)):
+                add(np.zeros(1, dtype=int), np.zeros(1), np.full(1, -1), np.full(1, -1),
+                    np.zeros((1, self.n_outputs)))
+
+        self.feature = np.concatenate(features).astype(np.int32)
+        threshold = np.concatenate(thresholds)
+        # children[2 * node + went_right]
+        self.children = np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1).reshape(-1).astype(np.int32)
+        self.value = np.concatenate(values).astype(np.float64)
+        self.roots = np.array(roots, dtype=np.int32)
+        self.tree_group = np.repeat(np.arange(self.n_groups), self.trees_per_group)
+        self.depth = depth
+
+        # Features are float32, so x <= t for a float64 threshold t exactly when
+        # x <= the largest float32 not above t; comparing in float32 halves the reads
+        self.threshold = threshold.astype(np.float32)
+        rounded_up = self.threshold.astype(np.float64) > threshold
+        self.threshold[rounded_up] = np.nextafter(self.threshold[rounded_up], np.float32(-np.inf))
+
+    def predict(self, X):
+        """(groups, rows, outputs) predictions for the unscaled feature rows ``X``"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Expected rows of {self.n_features} features, got shape {X.shape}')
+        out = np.empty((self.n_groups, len(X), self.n_outputs))
+        block = max(1, BLOCK_CELLS // len(self.roots))
+        for start in range(0, len(X), block):
+            out[:, start:start + block] = self._predict_block(X[start:start + block])
+        return out
+
+    def _predict_block(self, X):
+        rows = len(X)
+        # Per-forest scaling, then float32 as sklearn's trees compare
+        scaled = ((X[None, :, :] - self.means[:, None, :]) / self.scales[:, None, :]).astype(np.float32)
+        flat = scaled.reshape(-1)
+        base = ((self.tree_group[:, None] * rows + np.arange(rows)[None, :]) * self.n_features).astype(np.int32)
+
+        node = np.repeat(self.roots[:, None], rows, axis=1)
+        for _ in range(self.depth):
+            went_right = flat[base + self.feature[node]] > self.threshold[node]
+            node = self.children[node * 2 + went_right]
+
+        leaf_values = self.value[node].reshape(self.n_groups, self.trees_per_group, rows, self.n_outputs)
+        total = np.zeros((self.n_groups, rows, self.n_outputs))
+        for tree in range(self.trees_per_group):
+            total += leaf_values[:, tree]
+        return total / self.n_trees[:, None, None]
+
+
+class CompiledBudgetPredictor:
+    """A bundle's forests compiled for scoring; same amounts as the sklearn path"""
+
+    def __init__(self, categories, forests, target_mean=None, target_scale=None):
+        self.categories = categories
+        self.forests = forests
+        self.target_mean = target_mean
+        self.target_scale = target_scale
+
+    def predict_categories(self, features):
+        """{category: predicted amounts} (before clipping at 0)"""
+        predicted = self.forests.predict(features)
+        if self.target_mean is not None:
+            # One multi-output forest on standardized targets
+            amounts = predicted[0] * self.target_scale + self.target_mean
+            return {category: amounts[:, i] for i, category in enumerate(self.categories)}
+        return {category: predicted[i, :, 0] for i, category in enumerate(self.categories)}
+
+
+def _is_forest(model):
+    return isinstance(model, RandomForestRegressor) and hasattr(model, 'estimators_')
+
+
+def compile_bundle(bundle, categories):
+    """
+    CompiledBudgetPredictor for a bundle's models in ``categories`` order, or
+    None when they are not all StandardScaler + RandomForestRegressor pairs
+    (or a forest MultiOutputBudgetModel)
+    """
+    multi_output = bundle.models.get(MULTI_OUTPUT_KEY)
+    if multi_output is not None:
+        if not (isinstance(multi_output, MultiOutputBudgetModel) and multi_output.estimator == 'forest'
+                and _is_forest(multi_output.models[0])):
+            return None
+        forests = CompiledForests([multi_output.models[0]], [multi_output.scaler])
+        return CompiledBudgetPredictor(list(multi_output.categories), forests,
+                                       multi_output.target_mean, multi_output.target_scale)
+
+    present = [category for category in categories if category in bundle.models]
+    if not present:
+        return None
+    for category in present:
+        scaler = bundle.scalers.get(category)
+        if not (_is_forest(bundle.models[category]) and bundle.models[category].n_outputs_ == 1
+                and isinstance(scaler, StandardScaler) and scaler.with_mean and scaler.with_std):
+            return None
+    forests = CompiledForests([bundle.models[category] for category in present],
+                              [bundle.scalers[category] for category in present])
+    return CompiledBudgetPredictor(present, forests)
+
+
+_compiled = weakref.WeakKeyDictionary()
+_compile_lock = threading.Lock()
+
+
+def compiled_predictor(bundle, categories):
+    """compile_bundle() result cached per loaded bundle (None if not compilable)"""
+    with _compile_lock:
+        if bundle not in _compiled:
+            _compiled[bundle] = compile_bundle(bundle, categories)
+        return _compiled[bundle]
@@ -0,0 +1,108 @@
+"""
+In-memory set of users on fraud_list.
+Loaded once on first use and kept in step with this process's own writes, so
+fraud checks on the transfer path are O(1) set lookups instead of a query per
+call. A periodic reload (FRAUD_CACHE_TTL seconds) picks up changes made by
+other processes or by transactions that were rolled back.
+"""
+
+import threading
+import time
+from flask import current_app
+
+DEFAULT_TTL = 60.0
+
+
+class FlaggedUsers:
+    """Cached set of reported_user_id values in fraud_list"""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._users = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Changes made while a reload is in flight, replayed over its result
+        self._journal = None
+
+    def configure(self, ttl=None):
+        if ttl is not None:
+            self.ttl = ttl
+
+    def _load(self):
+        conn = current_app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT DISTINCT reported_user_id FROM fraud_list WHERE reported_user_id IS NOT NULL')
+                return {row['reported_user_id'] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    def refresh(self):
+        """Reload the set from fraud_list and return it"""
+        with self._refresh_lock:
+            with self._lock:
+                self._journal = []
+            try:
+                users = self._load()
+            except Exception:
+                with self._lock:
+                    self._journal = None
+                raise
+            with self._lock:
+                for user_id, flagged in self._journal:
+                    if flagged:
+                        users.add(user_id)
+                    else:
+                        users.discard(user_id)
+                self._journal = None
+                self._users = users
+                self._loaded_at = time.monotonic()
+                return users
+
+    def _current(self):
+        users = self._users
+        if users is None or time.monotonic() - self._loaded_at > self.ttl:
+            users = self.refresh()
+        return users
+
+    def contains(self, user_id):
+        return user_id in self._current()
+
+    def __contains__(self, user_id):
+        return self.contains(user_id)
+
+    def _apply(self, user_ids, flagged):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.extend((user_id, flagged) for user_id in user_ids)
+            if self._users is None:
+                return
+            if flagged:
+                self._users.update(user_ids)
+            else:
+                self._users.difference_update(user_ids)
+
+    def add(self, user_ids):
+        """Record users just written to fraud_list"""
+        self._apply(list(user_ids), True)
+
+    def discard(self, user_ids):
+        """Record users just removed from fraud_list"""
+        self._apply(list(user_ids), False)
+
+    def invalidate(self):
+        """Force a reload on the next check"""
+        with self._lock:
+            self._users = None
+
+
+# Create global instance
+flagged_users = FlaggedUsers()
+
+
+def init_fraud_cache(app):
+    """Configure the global flagged-user set from app config"""
+    flagged_users.configure(ttl=app.config.get('FRAUD_CACHE_TTL', DEFAULT_TTL))
+    app.flagged_users = flagged_users
+    return flagged_users
@@ -1,6 +1,7 @@
 # Utility functions for fraud operations
 from flask import current_app
 import uuid
+from .fraud_cache import flagged_users
 
 def lookup_user_by_identifier(identifier):
     conn = current_app.get_db_connection()
@@ -30,6 +31,7 @@ def add_fraud_report(reporter_id, reported_user_id, reason):
             result = cursor.fetchone()
             
             if result and result['success']:
+                flagged_users.add([reported_user_id])
                 return True, None
             else:
                 return False, result['message'] if result else 'Unknown error'
@@ -0,0 +1,79 @@
+"""
+Merkle tree helpers for FinGuard's batched blocks.
+Leaves and inner nodes are hashed with distinct prefixes (as in RFC 6962) so a
+leaf can never be passed off as an inner node; an odd node at the end of a level
+is promoted unchanged rather than duplicated.
+"""
+
+import hashlib
+from typing import List, Tuple
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+# A proof step is (side, sibling_hash): side 'L' means the sibling sits on the left
+ProofStep = Tuple[str, str]
+
+
+def leaf_hash(data: bytes) -> str:
+    """Hash one serialized transaction into a leaf"""
+    return hashlib.sha256(LEAF_PREFIX + data).hexdigest()
+
+
+def node_hash(left: str, right: str) -> str:
+    """Hash two child hashes into their parent"""
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def build_tree(leaves: List[str]) -> Tuple[str, List[List[ProofStep]]]:
+    """Return (root, proofs) where proofs[i] is the inclusion proof of leaves[i]"""
+    if not leaves:
+        raise ValueError('Cannot build a Merkle tree without leaves')
+
+    proofs = [[] for _ in leaves]
+    # members[j] lists the original leaves underneath node j of the current level
+    members = [[i] for i in range(len(leaves))]
+    level = list(leaves)
+    while len(level) > 1:
+        next_level, next_members = [], []
+        for j in range(0, len(level) - 1, 2):
+            left, right = level[j], level[j + 1]
+            for i in members[j]:
+                proofs[i].append(('R', right))
+            for i in members[j + 1]:
+                proofs[i].append(('L', left))
+            next_level.append(node_hash(left, right))
+            next_members.append(members[j] + members[j + 1])
+        if len(level) % 2:
+            next_level.append(level[-1])
+            next_members.append(members[-1])
+        level, members = next_level, next_members
+    return level[0], proofs
+
+
+def merkle_root(leaves: List[str]) -> str:
+    return build_tree(leaves)[0]
+
+
+def verify_proof(leaf: str, proof: List[ProofStep], root: str) -> bool:
+    """Check a leaf against a root in O(log n) without the other leaves"""
+    current = leaf
+    for side, sibling in proof:
+        if side == 'L':
+            current = node_hash(sibling, current)
+        elif side == 'R':
+            current = node_hash(current, sibling)
+        else:
+            return False
+    return current == root
+
+
+def encode_proof(proof: List[ProofStep]) -> str:
+    """Compact text form for storage: 'L<hex>,R<hex>,...'"""
+    return ','.join(side + sibling for side, sibling in proof)
+
+
+def decode_proof(text: str) -> List[ProofStep]:
+    if not text:
+        return []
+    return [(step[0], step[1:]) for step in text.split(',')]
@@ -7,15 +7,22 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
+from joblib import Parallel, delayed
 import uuid
 from typing import Dict, List, Tuple, Optional
 import pymysql
 from flask import current_app
 import json
 import logging
+from .model_registry import ModelBundle, ModelRegistry, budget_model_registry
+from .multi_output_budget import MODEL_KINDS, MULTI_OUTPUT_KEY, fit_multi_output_model
+from .forest_compiler import COMPILED_MAX_ROWS, compiled_predictor
+from .training_loader import DEFAULT_CHUNK_SIZE as DEFAULT_TRAINING_CHUNK_SIZE, load_training_frame
+import calendar
+from datetime import date
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -43,52 +50,128 @@ EXPENSE_CATEGORIES = [
     'Other'
 ]
 
+# Expense habit joined with the profile fields the models use
+USER_DATA_QUERY = """
+    SELECT 
+        ueh.*,
+        u.age,
+        u.gender,
+        u.marital_status,
+        a.country,
+        a.division,
+        a.district
+    FROM user_expense_habit ueh
+    JOIN users u ON ueh.user_id = u.id
+    LEFT JOIN contact_info ci ON u.id = ci.user_id
+    LEFT JOIN addresses a ON ci.address_id = a.id
+"""
+
+NUMERIC_FIELDS = ['age', 'rent', 'transport_cost', 'grocery_cost',
+                  'utilities_cost', 'mobile_internet_cost', 'loan_payment', 'dependents']
+
+CATEGORICAL_COLUMNS = [
+    'gender', 'marital_status', 'living_situation', 
+    'transport_mode', 'eating_out_frequency', 'savings',
+    'country', 'division', 'district'
+]
+
+# Model inputs, in order; training and scoring must agree
+FEATURE_COLUMNS = [
+    'monthly_income_numeric', 'age', 'dependents', 'earning_member',
+    'total_fixed_expenses', 'total_variable_expenses', 'income_expense_ratio',
+    'expense_per_dependent', 'age_income_ratio'
+] + [f'{col}_encoded' for col in CATEGORICAL_COLUMNS]
+
+
+def fit_category_model(category: str, X: pd.DataFrame, y: pd.Series) -> Tuple:
+    """
+    Fit the scaler and forest for one category and score them on a held-out
+    split. Module-level so it can run in worker processes.
+    Returns (category, model, scaler, {'mae', 'r2'}).
+    """
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+    
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    
+    model = RandomForestRegressor(
+        n_estimators=100, 
+        random_state=42,
+        max_depth=10,
+        min_samples_split=5
+    )
+    model.fit(X_train_scaled, y_train)
+    
+    y_pred = model.predict(X_test_scaled)
+    return category, model, scaler, {
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred))
+    }
+
+def _fit_category_or_error(category: str, X: pd.DataFrame, y: pd.Series) -> Tuple:
+    """(category, fitted, None), or (category, None, error): one failing category doesn't stop the rest"""
+    try:
+        return category, fit_category_model(category, X, y), None
+    except Exception as e:
+        return category, None, str(e)
+
 class BudgetMLGenerator:
-    def __init__(self):
-        self.models = {}
-        self.scalers = {}
-        self.label_encoders = {}
-        self.model_trained = False
+    def __init__(self, registry: Optional[ModelRegistry] = None, compiled: bool = True, feature_store=None):
+        # Trained models come from the registry; each call works on one loaded version
+        self.registry = registry or budget_model_registry
+        # Score small batches with the flattened NumPy forests (same results, less overhead)
+        self.compiled = compiled
+        # Stored per-user feature vectors (feature_store.BudgetFeatureStore); None rebuilds
+        # them from the expense habit tables on every call
+        self.feature_store = feature_store
+    
+    @property
+    def bundle(self) -> Optional[ModelBundle]:
+        return self.registry.current()
+    
+    @property
+    def models(self) -> Dict:
+        bundle = self.bundle
+        return bundle.models if bundle else {}
+    
+    @property
+    def scalers(self) -> Dict:
+        bundle = self.bundle
+        return bundle.scalers if bundle else {}
+    
+    @property
+    def label_encoders(self) -> Dict:
+        bundle = self.bundle
+        return bundle.label_encoders if bundle else {}
+    
+    @property
+    def categories(self) -> List[str]:
+        """Categories the live models predict"""
+        models = self.models
+        if MULTI_OUTPUT_KEY in models:
+            return list(models[MULTI_OUTPUT_KEY].categories)
+        return list(models)
+    
+    @property
+    def model_trained(self) -> bool:
+        bundle = self.bundle
+        return bool(bundle and bundle.models)
         
-    def prepare_data(self) -> pd.DataFrame:
+    def prepare_data(self, label_encoders: Optional[Dict] = None) -> pd.DataFrame:
         """
-        Fetch and prepare data from user_expense_habit table
+        Stream the user_expense_habit join into a typed training frame (see
+        training_loader), fitting any encoder missing from ``label_encoders``
         """
         conn = current_app.get_db_connection()
         try:
-            query = """
-            SELECT 
-                ueh.*,
-                u.age,
-                u.gender,
-                u.marital_status,
-                a.country,
-                a.division,
-                a.district
-            FROM user_expense_habit ueh
-            JOIN users u ON ueh.user_id = u.id
-            LEFT JOIN contact_info ci ON u.id = ci.user_id
-            LEFT JOIN addresses a ON ci.address_id = a.id
-            WHERE ueh.monthly_income IS NOT NULL
-            """
-            
-            # Fetch data manually since pandas has issues with PyMySQL
-            with conn.cursor() as cursor:
-                cursor.execute(query)
-                rows = cursor.fetchall()
-                
-                if not rows:
-                    logger.warning("No data found in user_expense_habit table")
-                    return pd.DataFrame()
-                
-                # Get column names
-                columns = [desc[0] for desc in cursor.description]
-                
-                # Create DataFrame
-                df = pd.DataFrame(rows, columns=columns)
-            
-            # Data preprocessing
-            df = self._preprocess_data(df)
+            chunk_size = current_app.config.get('TRAINING_CHUNK_SIZE', DEFAULT_TRAINING_CHUNK_SIZE)
+            df = load_training_frame(conn, self._parse_income, {} if label_encoders is None else label_encoders,
+                                     chunk_size)
+            if df.empty:
+                logger.warning("No data found in user_expense_habit table")
             return df
             
         except Exception as e:
@@ -97,70 +180,6 @@ class BudgetMLGenerator:
         finally:
             conn.close()
     
-    def _preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Preprocess the raw data for ML training
-        """
-        # Handle missing values and convert data types
-        df = df.fillna({
-            'rent': 0,
-            'transport_cost': 0,
-            'grocery_cost': 0,
-            'utilities_cost': 0,
-            'mobile_internet_cost': 0,
-            'loan_payment': 0,
-            'dependents': 0,
-            'country': 'Unknown',
-            'division': 'Unknown',
-            'district': 'Unknown'
-        })
-        
-        # Convert numeric columns
-        numeric_columns = ['age', 'rent', 'transport_cost', 'grocery_cost', 'utilities_cost', 
-                          'mobile_internet_cost', 'loan_payment', 'dependents']
-        
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Fill any remaining NaN values in numeric columns
-        df['age'] = df['age'].fillna(df['age'].median() if df['age'].notna().any() else 30)
-        
-        # Convert monthly income to numeric
-        df['monthly_income_numeric'] = df['monthly_income'].apply(self._parse_income)
-        
-        # Create derived features
-        df['total_fixed_expenses'] = (
-            df['rent'] + df['utilities_cost'] + 
-            df['mobile_internet_cost'] + df['loan_payment']
-        )
-        
-        df['total_variable_expenses'] = (
-            df['transport_cost'] + df['grocery_cost']
-        )
-        
-        # Calculate income to expense ratio
-        df['income_expense_ratio'] = df['monthly_income_numeric'] / (
-            df['total_fixed_expenses'] + df['total_variable_expenses'] + 1
-        )
-        
-        # Encode categorical variables
-        categorical_columns = [
-            'gender', 'marital_status', 'living_situation', 
-            'transport_mode', 'eating_out_frequency', 'savings',
-            'country', 'division', 'district'
-        ]
-        
-        for col in categorical_columns:
-            if col in df.columns:
-                if col not in self.label_encoders:
-                    self.label_encoders[col] = LabelEncoder()
-                    df[f'{col}_encoded'] = self.label_encoders[col].fit_transform(df[col].astype(str))
-                else:
-                    df[f'{col}_encoded'] = self.label_encoders[col].transform(df[col].astype(str))
-        
-        return df
-    
     def _parse_income(self, income_str: str) -> float:
         """
         Parse income string to numeric value
@@ -190,78 +209,97 @@ class BudgetMLGenerator:
         except:
             return 30000  # Default median income
     
-    def train_models(self) -> bool:
+    def build_training_set(self, label_encoders: Dict) -> Tuple[pd.DataFrame, Dict[str, pd.Series]]:
         """
-        Train ML models for each expense category
+        Feature frame and one target series per trainable category, read from
+        the database; fits any encoder missing from ``label_encoders``
         """
-        df = self.prepare_data()
-        
+        df = self.prepare_data(label_encoders)
         if df.empty:
+            return df, {}
+        
+        # float32 throughout: the scalers keep it and the forests split on float32 anyway
+        X = df[FEATURE_COLUMNS].astype(np.float32)
+        # Incomes of 0 make the age/income feature undefined; scoring skips those users too
+        finite = np.isfinite(X.to_numpy()).all(axis=1)
+        if not finite.all():
+            df, X = df[finite], X[finite]
+        
+        category_mappings = self._create_category_mappings()
+        targets = {}
+        for category in EXPENSE_CATEGORIES:
+            y = self._create_target_for_category(df, category, category_mappings)
+            if len(y.unique()) >= 2:  # Skip if not enough variance
+                targets[category] = y
+        return X, targets
+    
+    def train_models(self, progress=None, workers: int = 1, kind: Optional[str] = None) -> Optional[Dict]:
+        """
+        Train ML models for each expense category and publish them as a new
+        registry version; predictions keep using the live version meanwhile.
+        ``kind`` is a MODEL_KINDS key (default: ML_BUDGET_MODEL_KIND): one
+        forest per category, or one multi-output model for all of them.
+        With ``workers`` > 1 the categories are fitted in that many processes.
+        ``progress(done, total, category)`` is called as each category finishes.
+        Returns {'version', 'metrics', 'models_trained', 'training_rows'},
+        or None when there was nothing to train on.
+        """
+        kind = kind or current_app.config.get('ML_BUDGET_MODEL_KIND', 'per_category')
+        if kind not in MODEL_KINDS:
+            raise ValueError(f'Unknown budget model kind: {kind}')
+        
+        label_encoders = {}
+        X, targets = self.build_training_set(label_encoders)
+        
+        if X.empty or not targets:
             logger.error("No data available for training")
-            return False
+            return None
         
-        # Feature columns
-        feature_columns = [
-            'monthly_income_numeric', 'age', 'dependents', 'earning_member',
-            'total_fixed_expenses', 'total_variable_expenses', 'income_expense_ratio'
-        ]
+        if MODEL_KINDS[kind]:
+            return self._train_multi_output(X, targets, label_encoders, kind, progress, workers)
         
-        # Add encoded categorical features
-        encoded_columns = [col for col in df.columns if col.endswith('_encoded')]
-        feature_columns.extend(encoded_columns)
+        models, scalers, metrics = {}, {}, {}
         
-        # Filter existing columns
-        available_features = [col for col in feature_columns if col in df.columns]
-        X = df[available_features]
+        def collect(category, model, scaler, scores):
+            logger.info(f"Model for {category}: MAE={scores['mae']:.2f}, R2={scores['r2']:.3f}")
+            models[category] = model
+            scalers[category] = scaler
+            metrics[category] = scores
         
-        # Train models for each category
-        category_mappings = self._create_category_mappings()
+        # joblib's loky workers, not multiprocessing: those would re-run the web app's main module
+        fits = Parallel(n_jobs=min(workers, len(targets)), return_as='generator_unordered')(
+            delayed(_fit_category_or_error)(category, X, y) for category, y in targets.items()
+        )
+        for done, (category, fitted, error) in enumerate(fits, 1):
+            if fitted:
+                collect(*fitted)
+            else:
+                logger.error(f"Error training model for {category}: {error}")
+            if progress:
+                progress(done, len(targets), category)
         
-        for category in EXPENSE_CATEGORIES:
-            try:
-                # Create target variable for this category
-                y = self._create_target_for_category(df, category, category_mappings)
-                
-                if len(y.unique()) < 2:  # Skip if not enough variance
-                    continue
-                
-                # Split data
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X, y, test_size=0.2, random_state=42
-                )
-                
-                # Scale features
-                scaler = StandardScaler()
-                X_train_scaled = scaler.fit_transform(X_train)
-                X_test_scaled = scaler.transform(X_test)
-                
-                # Train model
-                model = RandomForestRegressor(
-                    n_estimators=100, 
-                    random_state=42,
-                    max_depth=10,
-                    min_samples_split=5
-                )
-                model.fit(X_train_scaled, y_train)
-                
-                # Evaluate model
-                y_pred = model.predict(X_test_scaled)
-                mae = mean_absolute_error(y_test, y_pred)
-                r2 = r2_score(y_test, y_pred)
-                
-                logger.info(f"Model for {category}: MAE={mae:.2f}, R2={r2:.3f}")
-                
-                # Store model and scaler
-                self.models[category] = model
-                self.scalers[category] = scaler
-                
-            except Exception as e:
-                logger.error(f"Error training model for {category}: {e}")
-                continue
+        if not models:
+            logger.error("No category model could be trained")
+            return None
+        
+        meta = {'metrics': metrics, 'training_rows': len(X), 'model_kind': 'per_category'}
+        version = self._save_models(models, scalers, label_encoders, meta)
+        return dict(meta, version=version, models_trained=len(models))
+    
+    def _train_multi_output(self, X: pd.DataFrame, targets: Dict[str, pd.Series], label_encoders: Dict,
+                            kind: str, progress=None, workers: int = 1) -> Dict:
+        """
+        Fit one MultiOutputBudgetModel for every category and publish it
+        """
+        model, metrics = fit_multi_output_model(X, targets, MODEL_KINDS[kind], n_jobs=workers)
+        for category, scores in metrics.items():
+            logger.info(f"Model for {category}: MAE={scores['mae']:.2f}, R2={scores['r2']:.3f}")
+        if progress:
+            progress(1, 1, f'{len(targets)} categories')
         
-        self.model_trained = True
-        self._save_models()
-        return True
+        meta = {'metrics': metrics, 'training_rows': len(X), 'model_kind': kind}
+        version = self._save_models({MULTI_OUTPUT_KEY: model}, {}, label_encoders, meta)
+        return dict(meta, version=version, models_trained=len(model.categories))
     
     def _create_category_mappings(self) -> Dict[str, str]:
         """
@@ -315,204 +353,248 @@ class BudgetMLGenerator:
         """
         Generate a personalized budget for a specific user using trained ML models
         """
-        # Always try to load models to ensure we have the latest trained models
-        if not self.model_trained or not self.models:
-            logger.info("Loading trained ML models...")
-            self._load_models()
-        
-        if not self.model_trained or not self.models:
+        return self.generate_budgets_for_users([user_id]).get(user_id)
+    
+    def generate_budgets_for_users(self, user_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Generate budgets for many users at once: one read of their stored
+        feature vectors (or one query for their expense habits), one feature
+        matrix, and one scaler transform and forest prediction per category
+        over the whole batch. ``None`` means every user with an expense habit.
+        Returns {user_id: budget}; users without data are left out.
+        """
+        # One model version for the whole batch, even if a new one is published meanwhile
+        bundle = self.bundle
+        if not bundle or not bundle.models:
             logger.error("No trained models available! Please train models first.")
-            return None
+            return {}
         
-        logger.info(f"Using {len(self.models)} trained ML models for budget generation")
+        if self.feature_store is not None:
+            found, features, incomes = self.feature_store.get_many(self, user_ids, bundle)
+            users = {user_id: {'monthly_income_numeric': income} for user_id, income in zip(found, incomes.tolist())}
+        else:
+            users = self._get_users_data(user_ids)
+            found = list(users)
+            features = self._prepare_feature_matrix([users[user_id] for user_id in found], bundle)
+        for user_id in user_ids or []:
+            if user_id not in users:
+                logger.error(f"No data found for user {user_id}")
+        return self._score_budgets(found, features, users, bundle)
+    
+    def generate_budgets_from_data(self, users: Dict[str, Dict], bundle: Optional[ModelBundle] = None) -> Dict[str, Dict]:
+        """
+        Budgets for already fetched {user_id: USER_DATA_QUERY row}, scored in one batch
+        """
+        bundle = bundle or self.bundle
+        if not bundle or not bundle.models or not users:
+            return {}
         
-        user_data = self._get_user_data(user_id)
-        if not user_data:
-            logger.error(f"No data found for user {user_id}")
-            return None
+        user_ids = list(users)
+        features = self._prepare_feature_matrix([users[user_id] for user_id in user_ids], bundle)
+        return self._score_budgets(user_ids, features, users, bundle)
+    
+    def _score_budgets(self, user_ids: List[str], features: np.ndarray, users: Dict[str, Dict],
+                       bundle: ModelBundle) -> Dict[str, Dict]:
+        """
+        Budgets for ``user_ids`` from their feature rows; ``users`` supplies
+        each user's monthly_income_numeric
+        """
+        if not user_ids:
+            return {}
+        
+        # Incomes of 0 make the age/income feature undefined; those users get no budget
+        valid = np.isfinite(features).all(axis=1)
+        for user_id in [user_id for user_id, ok in zip(user_ids, valid) if not ok]:
+            logger.error(f"Could not build features for user {user_id}")
+        user_ids = [user_id for user_id, ok in zip(user_ids, valid) if ok]
+        predictions = self._predict_categories(features[valid], bundle)
+        
+        budgets = {}
+        for row_index, user_id in enumerate(user_ids):
+            row_predictions = {category: values[row_index] for category, values in predictions.items()}
+            budgets[user_id] = self._build_budget(user_id, users[user_id], row_predictions)
+        
+        logger.info(f"Generated {len(budgets)} budgets using {len(predictions)} trained ML models (version {bundle.version})")
+        return budgets
+    
+    def _predict_categories(self, features: np.ndarray, bundle: Optional[ModelBundle] = None) -> Dict[str, np.ndarray]:
+        """
+        Non-negative predicted amounts per category for every row of ``features``;
+        categories without a usable model are left out (they use the fallback)
+        """
+        bundle = bundle or self.bundle
+        predictions = {}
+        if bundle is None or len(features) == 0:
+            return predictions
+        
+        if self.compiled and len(features) <= COMPILED_MAX_ROWS:
+            try:
+                compiled = compiled_predictor(bundle, EXPENSE_CATEGORIES)
+                if compiled is not None:
+                    return {category: np.maximum(0, values)
+                            for category, values in compiled.predict_categories(features).items()}
+            except Exception as e:
+                logger.error(f"Compiled forest scoring failed, using sklearn: {e}")
         
-        # Prepare user features
-        user_features = self._prepare_user_features(user_data)
+        multi_output = bundle.models.get(MULTI_OUTPUT_KEY)
+        if multi_output is not None:
+            return {category: np.maximum(0, values)
+                    for category, values in multi_output.predict_categories(features).items()}
         
+        for category in EXPENSE_CATEGORIES:
+            if category not in bundle.models:
+                continue
+            try:
+                scaled = bundle.scalers[category].transform(features)
+                predictions[category] = np.maximum(0, bundle.models[category].predict(scaled))
+            except Exception as e:
+                logger.error(f"Error predicting for category {category}: {e}")
+        return predictions
+    
+    def _build_budget(self, user_id: str, user_data: Dict, predictions: Dict[str, float]) -> Dict:
+        """
+        Assemble one user's budget from per-category predictions, filling
+        categories without a prediction with percentage-based estimates
+        """
+        income = user_data.get('monthly_income_numeric', 0)
         budget = {
             'user_id': user_id,
             'categories': {},
             'total_budget': 0,
-            'monthly_income': user_data.get('monthly_income_numeric', 0)
+            'monthly_income': income
         }
         
-        # Generate predictions for each category using YOUR trained models
-        models_used = 0
-        fallback_used = 0
-        
         for category in EXPENSE_CATEGORIES:
-            if category in self.models:
-                try:
-                    model = self.models[category]
-                    scaler = self.scalers[category]
-                    
-                    logger.info(f"Using trained ML model for {category}")
-                    
-                    # Scale features using your trained scaler
-                    user_features_scaled = scaler.transform([user_features])
-                    
-                    # Predict using YOUR trained Random Forest model
-                    predicted_amount = model.predict(user_features_scaled)[0]
-                    predicted_amount = max(0, predicted_amount)  # Ensure non-negative
-                    
-                    budget['categories'][category] = {
-                        'amount': round(predicted_amount, 2),
-                        'items': self._generate_category_items(category, predicted_amount)
-                    }
-                    budget['total_budget'] += predicted_amount
-                    models_used += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error predicting for category {category}: {e}")
-                    # Fallback to percentage-based estimation
-                    fallback_amount = self._fallback_category_amount(
-                        user_data.get('monthly_income_numeric', 0), category
-                    )
-                    budget['categories'][category] = {
-                        'amount': fallback_amount,
-                        'items': self._generate_category_items(category, fallback_amount)
-                    }
-                    budget['total_budget'] += fallback_amount
-                    fallback_used += 1
+            if category in predictions:
+                amount = float(predictions[category])
+                budget['categories'][category] = {
+                    'amount': round(amount, 2),
+                    'items': self._generate_category_items(category, amount)
+                }
             else:
                 # Category not in trained models, use fallback
-                logger.warning(f"No trained model found for {category}, using fallback estimation")
-                fallback_amount = self._fallback_category_amount(
-                    user_data.get('monthly_income_numeric', 0), category
-                )
+                amount = self._fallback_category_amount(income, category)
                 budget['categories'][category] = {
-                    'amount': fallback_amount,
-                    'items': self._generate_category_items(category, fallback_amount)
+                    'amount': amount,
+                    'items': self._generate_category_items(category, amount)
                 }
-                budget['total_budget'] += fallback_amount
-                fallback_used += 1
-        
-        logger.info(f"Budget generation complete: {models_used} ML predictions, {fallback_used} fallback estimates")
+            budget['total_budget'] += amount
         
         # Adjust budget to ensure it doesn't exceed income
-        budget = self._adjust_budget_to_income(budget)
+        return self._adjust_budget_to_income(budget)
+    
+    def _normalize_user_data(self, result: Dict) -> Dict:
+        """
+        Parse the income string and coerce numeric and boolean fields of one
+        USER_DATA_QUERY row
+        """
+        result['monthly_income_numeric'] = self._parse_income(result.get('monthly_income'))
         
-        return budget
+        # Convert numeric fields with safer conversion
+        for field in NUMERIC_FIELDS:
+            if field in result and result[field] is not None:
+                try:
+                    result[field] = float(result[field])
+                except (ValueError, TypeError):
+                    logger.warning(f"Could not convert {field} to float for user {result.get('user_id')}")
+                    result[field] = 0.0
+            else:
+                result[field] = 0.0
+        
+        # Ensure boolean fields
+        if 'earning_member' in result:
+            result['earning_member'] = bool(result['earning_member'])
+        else:
+            result['earning_member'] = True
+        
+        return result
     
-    def _get_user_data(self, user_id: str) -> Optional[Dict]:
+    def _get_users_data(self, user_ids: Optional[List[str]] = None, chunk_size: int = 1000) -> Dict[str, Dict]:
         """
-        Get user data for budget generation
+        Get budget-generation data for many users: {user_id: row}. One query
+        per ``chunk_size`` ids, or a single query for everyone when ``user_ids``
+        is None.
         """
+        users = {}
         conn = current_app.get_db_connection()
         try:
-            query = """
-            SELECT 
-                ueh.*,
-                u.age,
-                u.gender,
-                u.marital_status,
-                a.country,
-                a.division,
-                a.district
-            FROM user_expense_habit ueh
-            JOIN users u ON ueh.user_id = u.id
-            LEFT JOIN contact_info ci ON u.id = ci.user_id
-            LEFT JOIN addresses a ON ci.address_id = a.id
-            WHERE ueh.user_id = %s
-            """
-            
             with conn.cursor() as cursor:
-                cursor.execute(query, (user_id,))
-                result = cursor.fetchone()
-                
-                if result:
-                    # Convert to dictionary if not already
-                    if isinstance(result, tuple):
-                        columns = [desc[0] for desc in cursor.description]
-                        result = dict(zip(columns, result))
-                    
-                    logger.info(f"Retrieved user data for user_id: {user_id}")
-                    
-                    # Preprocess single user data
-                    result['monthly_income_numeric'] = self._parse_income(result.get('monthly_income'))
-                    
-                    # Convert numeric fields with safer conversion
-                    numeric_fields = ['age', 'rent', 'transport_cost', 'grocery_cost', 
-                                    'utilities_cost', 'mobile_internet_cost', 'loan_payment', 'dependents']
-                    for field in numeric_fields:
-                        if field in result and result[field] is not None:
-                            try:
-                                result[field] = float(result[field])
-                            except (ValueError, TypeError):
-                                logger.warning(f"Could not convert {field} to float for user {user_id}")
-                                result[field] = 0.0
-                        else:
-                            result[field] = 0.0
-                    
-                    # Ensure boolean fields
-                    if 'earning_member' in result:
-                        result['earning_member'] = bool(result['earning_member'])
-                    else:
-                        result['earning_member'] = True
-                    
-                    return result
-                    
+                if user_ids is None:
+                    chunks = [None]
                 else:
-                    logger.error(f"No data found for user_id: {user_id}")
-                    return None
-                
+                    ids = list(dict.fromkeys(user_ids))
+                    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+                for chunk in chunks:
+                    if chunk is None:
+                        cursor.execute(USER_DATA_QUERY)
+                    else:
+                        placeholders = ', '.join(['%s'] * len(chunk))
+                        cursor.execute(f"{USER_DATA_QUERY} WHERE ueh.user_id IN ({placeholders})", chunk)
+                    for result in cursor.fetchall():
+                        # Keep the first habit row per user, as a single-user lookup would
+                        if result['user_id'] not in users:
+                            users[result['user_id']] = self._normalize_user_data(dict(result))
+            return users
         except Exception as e:
-            logger.error(f"Error getting user data for user_id {user_id}: {e}")
-            return None
+            logger.error(f"Error getting user data for {len(user_ids) if user_ids is not None else 'all'} users: {e}")
+            return users
         finally:
             conn.close()
     
-    def _prepare_user_features(self, user_data: Dict) -> List[float]:
+    def _get_user_data(self, user_id: str) -> Optional[Dict]:
         """
-        Prepare feature vector for a single user
+        Get user data for budget generation
+        """
+        return self._get_users_data([user_id]).get(user_id)
+    
+    def _encode_categorical(self, label_encoders: Dict, col: str, values: List) -> np.ndarray:
+        """
+        LabelEncoder codes for a column of values; unknown values (and columns
+        without an encoder) encode as 0
         """
-        features = []
+        encoder = label_encoders.get(col)
+        if encoder is None:
+            return np.zeros(len(values))
+        codes = {label: code for code, label in enumerate(encoder.classes_)}
+        return np.array([codes.get(value, 0) for value in values], dtype=float)
+    
+    def _prepare_feature_matrix(self, users: List[Dict], bundle: Optional[ModelBundle] = None) -> np.ndarray:
+        """
+        Feature matrix (one row per user) in the column order the models were
+        trained on
+        """
+        def column(field, default):
+            return np.array([user.get(field, default) for user in users], dtype=float)
         
-        # Numeric features
-        features.extend([
-            user_data.get('monthly_income_numeric', 0),
-            user_data.get('age', 30),
-            user_data.get('dependents', 0),
-            1 if user_data.get('earning_member') else 0,
-        ])
+        income = column('monthly_income_numeric', 0)
+        age = column('age', 30)
+        dependents = column('dependents', 0)
+        earning = np.array([1 if user.get('earning_member') else 0 for user in users], dtype=float)
         
         # Calculate derived features
-        total_fixed = (
-            user_data.get('rent', 0) + user_data.get('utilities_cost', 0) +
-            user_data.get('mobile_internet_cost', 0) + user_data.get('loan_payment', 0)
-        )
-        total_variable = user_data.get('transport_cost', 0) + user_data.get('grocery_cost', 0)
-        income_expense_ratio = user_data.get('monthly_income_numeric', 0) / (total_fixed + total_variable + 1)
-        expense_per_dependent = total_fixed / (user_data.get('dependents', 0) + 1)
-        age_income_ratio = user_data.get('age', 30) / (user_data.get('monthly_income_numeric', 30000) / 1000)
+        total_fixed = column('rent', 0) + column('utilities_cost', 0) + column('mobile_internet_cost', 0) + column('loan_payment', 0)
+        total_variable = column('transport_cost', 0) + column('grocery_cost', 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            income_expense_ratio = income / (total_fixed + total_variable + 1)
+            expense_per_dependent = total_fixed / (dependents + 1)
+            age_income_ratio = age / (income / 1000)
         
-        features.extend([total_fixed, total_variable, income_expense_ratio, 
-                        expense_per_dependent, age_income_ratio])
+        columns = [income, age, dependents, earning, total_fixed, total_variable,
+                   income_expense_ratio, expense_per_dependent, age_income_ratio]
         
         # Encoded categorical features
-        categorical_columns = [
-            'gender', 'marital_status', 'living_situation', 
-            'transport_mode', 'eating_out_frequency', 'savings',
-            'country', 'division', 'district'
-        ]
-        
-        for col in categorical_columns:
-            if col in self.label_encoders:
-                try:
-                    value = str(user_data.get(col, 'Unknown'))
-                    encoded_value = self.label_encoders[col].transform([value])[0]
-                    features.append(encoded_value)
-                except:
-                    features.append(0)  # Default value for unknown categories
-            else:
-                features.append(0)
+        bundle = bundle or self.bundle
+        label_encoders = bundle.label_encoders if bundle else {}
+        for col in CATEGORICAL_COLUMNS:
+            columns.append(self._encode_categorical(label_encoders, col, [str(user.get(col, 'Unknown')) for user in users]))
         
-        return features
+        return np.column_stack(columns)
+    
+    def _prepare_user_features(self, user_data: Dict) -> List[float]:
+        """
+        Prepare feature vector for a single user
+        """
+        return self._prepare_feature_matrix([user_data])[0].tolist()
     
     def _generate_category_items(self, category: str, total_amount: float) -> List[Dict]:
         """
@@ -618,100 +700,111 @@ class BudgetMLGenerator:
         """
         Save generated budget to database
         """
+        return self.save_budgets_to_database([budget]) == 1
+    
+    def save_budgets_to_database(self, budgets: List[Dict], chunk_size: int = 500) -> int:
+        """
+        Save generated budgets with multi-row inserts, committing every
+        ``chunk_size`` budgets. Returns the number of budgets saved.
+        """
+        start_date = date.today()
+        end_date = _add_month(start_date)
+        saved = 0
         conn = current_app.get_db_connection()
         try:
             with conn.cursor() as cursor:
-                # Create main budget record
-                budget_id = str(uuid.uuid4())
-                
-                cursor.execute("""
-                    INSERT INTO budgets (id, user_id, name, currency, amount, start_date, end_date)
-                    VALUES (%s, %s, %s, %s, %s, CURDATE(), DATE_ADD(CURDATE(), INTERVAL 1 MONTH))
-                """, (
-                    budget_id,
-                    budget['user_id'],
-                    'AI Generated Budget',
-                    'USD',  # Default currency
-                    budget['total_budget']
-                ))
-                
-                # Create category records
-                for category_name, category_data in budget['categories'].items():
-                    category_id = str(uuid.uuid4())
+                for offset in range(0, len(budgets), chunk_size):
+                    budget_rows, category_rows, item_rows = [], [], []
+                    for budget in budgets[offset:offset + chunk_size]:
+                        # Create main budget record
+                        budget_id = str(uuid.uuid4())
+                        budget_rows.append((budget_id, budget['user_id'], 'AI Generated Budget', 'USD',
+                                            budget['total_budget'], start_date, end_date))
+                        # Create category and item records
+                        for category_name, category_data in budget['categories'].items():
+                            category_id = str(uuid.uuid4())
+                            category_rows.append((category_id, budget_id, category_name, category_data['amount']))
+                            for item in category_data['items']:
+                                item_rows.append((str(uuid.uuid4()), category_id, item['name'], item['amount'],
+                                                  'AI Generated Item'))
                     
-                    cursor.execute("""
+                    cursor.executemany("""
+                        INSERT INTO budgets (id, user_id, name, currency, amount, start_date, end_date)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, budget_rows)
+                    cursor.executemany("""
                         INSERT INTO budget_expense_categories (id, budget_id, category_name, amount)
                         VALUES (%s, %s, %s, %s)
-                    """, (
-                        category_id,
-                        budget_id,
-                        category_name,
-                        category_data['amount']
-                    ))
-                    
-                    # Create item records
-                    for item in category_data['items']:
-                        item_id = str(uuid.uuid4())
-                        
-                        cursor.execute("""
+                    """, category_rows)
+                    if item_rows:
+                        cursor.executemany("""
                             INSERT INTO budget_expense_items (id, category_id, name, amount, details)
                             VALUES (%s, %s, %s, %s, %s)
-                        """, (
-                            item_id,
-                            category_id,
-                            item['name'],
-                            item['amount'],
-                            'AI Generated Item'
-                        ))
-                
-                conn.commit()
-                logger.info(f"Budget saved successfully for user {budget['user_id']}")
-                return True
+                        """, item_rows)
+                    conn.commit()
+                    saved += len(budget_rows)
+                logger.info(f"Saved {saved} budgets")
+                return saved
                 
         except Exception as e:
-            logger.error(f"Error saving budget to database: {e}")
+            logger.error(f"Error saving budgets to database: {e}")
             conn.rollback()
-            return False
+            return saved
         finally:
             conn.close()
     
-    def _save_models(self):
+    def regenerate_all_budgets(self, chunk_size: int = 1000) -> int:
         """
-        Save trained models to disk
+        Generate and save a fresh budget for every user with an expense habit,
+        ``chunk_size`` users at a time. Returns the number of budgets saved.
         """
+        conn = current_app.get_db_connection()
         try:
-            joblib.dump(self.models, 'models/budget_models.pkl')
-            joblib.dump(self.scalers, 'models/budget_scalers.pkl')
-            joblib.dump(self.label_encoders, 'models/budget_encoders.pkl')
-            logger.info("Models saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving models: {e}")
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT DISTINCT user_id FROM user_expense_habit WHERE user_id IS NOT NULL')
+                user_ids = [row['user_id'] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        
+        saved = 0
+        for offset in range(0, len(user_ids), chunk_size):
+            budgets = self.generate_budgets_for_users(user_ids[offset:offset + chunk_size])
+            saved += self.save_budgets_to_database(list(budgets.values()))
+            logger.info(f"Regenerated budgets for {min(offset + chunk_size, len(user_ids))}/{len(user_ids)} users")
+        return saved
+    
+    def _save_models(self, models: Dict, scalers: Dict, label_encoders: Dict, meta: Optional[Dict] = None):
+        """
+        Publish trained models as a new registry version; returns its name
+        """
+        version = self.registry.publish(models, scalers, label_encoders, meta)
+        logger.info(f"Models saved successfully as version {version}")
+        return version
     
     def _load_models(self):
         """
-        Load trained models from disk
+        Check the registry for a newly published version now
         """
-        try:
-            logger.info("Loading trained ML models from disk...")
-            
-            self.models = joblib.load('models/budget_models.pkl')
-            self.scalers = joblib.load('models/budget_scalers.pkl')
-            self.label_encoders = joblib.load('models/budget_encoders.pkl')
-            
-            self.model_trained = True
-            
-            logger.info(f"✅ Successfully loaded {len(self.models)} trained models:")
-            for category in self.models.keys():
-                model = self.models[category]
-                logger.info(f"   - {category}: {type(model).__name__} with {model.n_estimators} estimators")
-                
-        except FileNotFoundError as e:
-            logger.error(f"❌ Model files not found: {e}")
-            logger.error("Please train the models first using the training script!")
-            self.model_trained = False
-        except Exception as e:
-            logger.error(f"❌ Error loading models: {e}")
-            self.model_trained = False
+        bundle = self.registry.refresh(force=True)
+        if bundle is None:
+            logger.error("❌ No trained models found. Please train the models first using the training script!")
+        return bundle
+
+def _add_month(day: date) -> date:
+    """Same day next month, clipped to its last day (as MySQL's DATE_ADD does)"""
+    year, month = (day.year + 1, 1) if day.month == 12 else (day.year, day.month + 1)
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
 
 # Create global instance
 budget_generator = BudgetMLGenerator()
+
+
+def init_ml_budget_commands(app):
+    """Register ``flask regenerate-budgets`` for the nightly budget refresh"""
+    import click
+
+    @app.cli.command('regenerate-budgets')
+    @click.option('--chunk-size', default=1000, help='Users scored and saved per batch')
+    def regenerate_budgets_command(chunk_size):
+        """Generate and save an AI budget for every user with an expense habit"""
+        click.echo(f'Saved {budget_generator.regenerate_all_budgets(chunk_size)} budgets')
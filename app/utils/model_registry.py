@@ -0,0 +1,199 @@
+"""
+Versioned on-disk registry for trained ML model bundles.
+
+Each published bundle lives in its own directory, ``<ML_MODEL_DIR>/<family>/<version>/``,
+and ``<family>/CURRENT`` names the live version. Publishing writes the new
+directory first and then replaces CURRENT atomically, so readers never see a
+half-written bundle. A process loads a bundle at most once per version: it
+re-checks CURRENT (or the mtime of the legacy flat ``budget_models.pkl``
+files) every ML_MODEL_CHECK_INTERVAL seconds and swaps in a new bundle
+without blocking callers that still hold the old one.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime, timezone
+import joblib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'models'))
+DEFAULT_CHECK_INTERVAL = 5.0
+DEFAULT_KEEP_VERSIONS = 3
+LEGACY_VERSION = 'legacy'
+
+# Bundle part -> file name, shared with the flat layout the training script used to write
+BUNDLE_FILES = {
+    'models': 'budget_models.pkl',
+    'scalers': 'budget_scalers.pkl',
+    'label_encoders': 'budget_encoders.pkl',
+}
+
+
+class ModelBundle:
+    """One loaded version: per-category models and scalers plus the label encoders"""
+
+    def __init__(self, version, models, scalers, label_encoders, meta=None):
+        self.version = version
+        self.models = models
+        self.scalers = scalers
+        self.label_encoders = label_encoders
+        self.meta = meta or {}
+        self.loaded_at = time.time()
+
+
+class ModelRegistry:
+    """Loads and publishes versioned bundles for one model family"""
+
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, family='budget', mmap=False,
+                 check_interval=DEFAULT_CHECK_INTERVAL, keep_versions=DEFAULT_KEEP_VERSIONS):
+        self.family = family
+        self.mmap = mmap
+        self.check_interval = check_interval
+        self.keep_versions = keep_versions
+        self._set_dir(model_dir)
+        self._bundle = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._load_lock = threading.Lock()
+
+    def _set_dir(self, model_dir):
+        self.model_dir = model_dir
+        self.family_dir = os.path.join(model_dir, self.family)
+        self.current_file = os.path.join(self.family_dir, 'CURRENT')
+
+    def configure(self, model_dir=None, mmap=None, check_interval=None, keep_versions=None):
+        if model_dir is not None and model_dir != self.model_dir:
+            self._set_dir(model_dir)
+            self._checked_at = 0.0
+            self._stamp = None
+        if mmap is not None:
+            self.mmap = mmap
+        if check_interval is not None:
+            self.check_interval = check_interval
+        if keep_versions is not None:
+            self.keep_versions = keep_versions
+
+    def _read_current_version(self):
+        try:
+            with open(self.current_file) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _locate(self):
+        """(stamp, version, directory) of what should be live, or None when nothing is published"""
+        version = self._read_current_version()
+        if version:
+            return ('version', version), version, os.path.join(self.family_dir, version)
+        legacy = os.path.join(self.model_dir, BUNDLE_FILES['models'])
+        try:
+            return ('mtime', os.stat(legacy).st_mtime_ns), LEGACY_VERSION, self.model_dir
+        except FileNotFoundError:
+            return None
+
+    def _load(self, version, directory):
+        mmap_mode = 'r' if self.mmap else None
+        parts = {part: joblib.load(os.path.join(directory, name), mmap_mode=mmap_mode)
+                 for part, name in BUNDLE_FILES.items()}
+        meta = {}
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        logger.info(f"Loaded {self.family} models version {version} ({len(parts['models'])} models)")
+        return ModelBundle(version, parts['models'], parts['scalers'], parts['label_encoders'], meta)
+
+    def refresh(self, force=False):
+        """Swap in the published version if it changed since the last check; returns the live bundle"""
+        if not force and self._bundle is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._bundle
+        # Only one thread loads; the rest keep serving the bundle they have
+        if not self._load_lock.acquire(blocking=self._bundle is None or force):
+            return self._bundle
+        try:
+            self._checked_at = time.monotonic()
+            located = self._locate()
+            if located is None:
+                return self._bundle
+            stamp, version, directory = located
+            if stamp != self._stamp or self._bundle is None:
+                try:
+                    self._bundle = self._load(version, directory)
+                    self._stamp = stamp
+                except Exception as e:
+                    logger.error(f"Error loading {self.family} models version {version}: {e}")
+            return self._bundle
+        finally:
+            self._load_lock.release()
+
+    def current(self):
+        """The live bundle (None if nothing has been published)"""
+        return self.refresh()
+
+    def publish(self, models, scalers, label_encoders, meta=None):
+        """
+        Write a new version and make it current for every process; also
+        installs it in this one. Returns the version name.
+        """
+        # Names sort in publish order
+        version = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f') + '-' + uuid.uuid4().hex[:6]
+        os.makedirs(self.family_dir, exist_ok=True)
+        staging = os.path.join(self.family_dir, f'.staging-{version}')
+        os.makedirs(staging)
+        try:
+            for part, value in (('models', models), ('scalers', scalers), ('label_encoders', label_encoders)):
+                joblib.dump(value, os.path.join(staging, BUNDLE_FILES[part]))
+            meta = dict(meta or {}, version=version, family=self.family, published_at=time.time())
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=2, default=str)
+            os.rename(staging, os.path.join(self.family_dir, version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        pointer = os.path.join(self.family_dir, f'.CURRENT-{version}')
+        with open(pointer, 'w') as f:
+            f.write(version)
+        os.replace(pointer, self.current_file)
+
+        with self._load_lock:
+            self._bundle = ModelBundle(version, models, scalers, label_encoders, meta)
+            self._stamp = ('version', version)
+            self._checked_at = time.monotonic()
+        self._prune(keep=version)
+        logger.info(f"Published {self.family} models version {version}")
+        return version
+
+    def versions(self):
+        """Published versions, oldest first"""
+        if not os.path.isdir(self.family_dir):
+            return []
+        return sorted(name for name in os.listdir(self.family_dir)
+                      if not name.startswith('.') and os.path.isdir(os.path.join(self.family_dir, name)))
+
+    def _prune(self, keep):
+        old = [version for version in self.versions() if version != keep]
+        for version in old[:max(0, len(old) - self.keep_versions + 1)]:
+            shutil.rmtree(os.path.join(self.family_dir, version), ignore_errors=True)
+
+
+# Create global instance
+budget_model_registry = ModelRegistry()
+
+
+def init_model_registry(app):
+    """Configure the global budget model registry from app config"""
+    budget_model_registry.configure(
+        model_dir=app.config.get('ML_MODEL_DIR') or DEFAULT_MODEL_DIR,
+        mmap=app.config.get('ML_MODEL_MMAP', False),
+        check_interval=app.config.get('ML_MODEL_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL),
+        keep_versions=app.config.get('ML_MODEL_KEEP_VERSIONS', DEFAULT_KEEP_VERSIONS),
+    )
+    app.budget_model_registry = budget_model_registry
+    return budget_model_registry
@@ -0,0 +1,115 @@
+"""
+One budget model for every expense category at once.
+
+The per-category layout fits a StandardScaler and a RandomForestRegressor for
+each category, so scoring runs one transform and one forest per category.
+A MultiOutputBudgetModel scales the features once and predicts all
+categories together, with either:
+- 'forest':   one multi-output RandomForestRegressor, or
+- 'boosting': one HistGradientBoostingRegressor per category, all on the
+              same scaled features.
+Targets are standardized before fitting so categories with large amounts
+(Housing) don't dominate the forest's splits.
+
+It is published through the model registry like the per-category models,
+as ``models = {MULTI_OUTPUT_KEY: model}`` with no per-category scalers.
+"""
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+# Key of the single model in a multi-output bundle's models dict
+MULTI_OUTPUT_KEY = '__all__'
+
+# Values for ML_BUDGET_MODEL_KIND: kind -> MultiOutputBudgetModel estimator (None: per-category)
+MODEL_KINDS = {
+    'per_category': None,
+    'multi_forest': 'forest',
+    'multi_boosting': 'boosting',
+}
+
+
+class MultiOutputBudgetModel:
+    """Shared scaler plus one model predicting every category"""
+
+    def __init__(self, categories, estimator='forest', n_estimators=100, random_state=42, n_jobs=None):
+        if estimator not in ('forest', 'boosting'):
+            raise ValueError(f'Unknown estimator: {estimator}')
+        self.categories = list(categories)
+        self.estimator = estimator
+        self.n_estimators = n_estimators
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.scaler = None
+        self.models = []
+        self.target_mean = None
+        self.target_scale = None
+
+    def fit(self, X, Y):
+        """Fit on features ``X`` and targets ``Y`` (one column per category, in order)"""
+        Y = np.asarray(Y, dtype=float)
+        self.scaler = StandardScaler()
+        X_scaled = self.scaler.fit_transform(X)
+        self.target_mean = Y.mean(axis=0)
+        scale = Y.std(axis=0)
+        self.target_scale = np.where(scale > 0, scale, 1.0)
+        Y_scaled = (Y - self.target_mean) / self.target_scale
+
+        if self.estimator == 'forest':
+            model = RandomForestRegressor(
+                n_estimators=self.n_estimators,
+                random_state=self.random_state,
+                max_depth=10,
+                min_samples_split=5,
+                n_jobs=self.n_jobs
+            )
+            self.models = [model.fit(X_scaled, Y_scaled)]
+        else:
+            self.models = [
+                HistGradientBoostingRegressor(max_iter=self.n_estimators, random_state=self.random_state)
+                .fit(X_scaled, Y_scaled[:, i])
+                for i in range(len(self.categories))
+            ]
+        return self
+
+    def predict(self, X):
+        """Predicted amounts, shape (rows, categories)"""
+        X_scaled = self.scaler.transform(X)
+        if self.estimator == 'forest':
+            Y_scaled = self.models[0].predict(X_scaled).reshape(len(X_scaled), -1)
+        else:
+            Y_scaled = np.column_stack([model.predict(X_scaled) for model in self.models])
+        return Y_scaled * self.target_scale + self.target_mean
+
+    def predict_categories(self, X):
+        """{category: predicted amounts}"""
+        Y = self.predict(X)
+        return {category: Y[:, i] for i, category in enumerate(self.categories)}
+
+    def score(self, X, Y):
+        """{category: {'mae', 'r2'}} against targets ``Y``"""
+        Y = np.asarray(Y, dtype=float)
+        predicted = self.predict(X)
+        return {
+            category: {
+                'mae': float(mean_absolute_error(Y[:, i], predicted[:, i])),
+                'r2': float(r2_score(Y[:, i], predicted[:, i]))
+            }
+            for i, category in enumerate(self.categories)
+        }
+
+
+def fit_multi_output_model(X, targets, estimator='forest', n_estimators=100, n_jobs=None):
+    """
+    Fit a MultiOutputBudgetModel on ``targets`` ({category: series}) and score
+    it on a held-out split (the same split the per-category models use).
+    Returns (model, {category: {'mae', 'r2'}}).
+    """
+    categories = list(targets)
+    Y = np.column_stack([np.asarray(targets[category], dtype=float) for category in categories])
+    X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, random_state=42)
+    model = MultiOutputBudgetModel(categories, estimator, n_estimators, n_jobs=n_jobs).fit(X_train, Y_train)
+    return model, model.score(X_test, Y_test)
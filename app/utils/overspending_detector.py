@@ -1,9 +1,10 @@
 
 import re
 import os
-from datetime import datetime
 from flask import current_app
 import pymysql
+from .rollup_utils import rollup_cutoff
+from .spend_counters import spend_counters
 
 # Expense category options matching the frontend
 EXPENSE_CATEGORIES = [
@@ -134,6 +135,9 @@ CATEGORY_KEYWORDS = {
     ]
 }
 
+# Lower-cased category names, so a note that just names a category keeps it
+_CATEGORY_BY_NAME = {category.lower(): category for category in EXPENSE_CATEGORIES}
+
 def get_mysql_config():
     """Get MySQL configuration from environment variables"""
     config = {
@@ -146,35 +150,120 @@ def get_mysql_config():
     }
     return config
 
+def _build_keyword_index(category_keywords):
+    """
+    Index every keyword by its first word, so a description is scored in one
+    pass over its words: {first word: [(keyword, weight, category positions)]}.
+    A keyword listed under several categories is matched once and scores each.
+    """
+    categories = list(category_keywords)
+    keywords = {}
+    for position, category in enumerate(categories):
+        for keyword in category_keywords[category]:
+            keywords.setdefault(keyword.lower(), []).append(position)
+    index = {}
+    for keyword, positions in keywords.items():
+        first_word = _WORD.match(keyword).group()
+        # Longer, more specific keywords weigh more
+        index.setdefault(first_word, []).append((keyword, len(keyword.split()), tuple(positions)))
+    return categories, index
+
+_WORD = re.compile(r'\w+')
+_WORD_CHAR = re.compile(r'\w')
+_CATEGORY_ORDER, _KEYWORD_INDEX = _build_keyword_index(CATEGORY_KEYWORDS)
+
 def categorize_expense(description):
-    
+    """
+    Category for an expense description: a category's own name, otherwise the
+    category whose keywords (whole words, case-insensitive) score highest.
+    Ties go to the category listed first in CATEGORY_KEYWORDS; no match is 'Other'.
+    """
     if not description or not isinstance(description, str):
         return 'Other'
     
     # Convert to lowercase for case-insensitive matching
     description_lower = description.lower()
-    
-    # Score each category based on keyword matches
-    category_scores = {}
-    
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        score = 0
-        for keyword in keywords:
-            # Check for exact word match (using word boundaries)
-            if re.search(r'\b' + re.escape(keyword.lower()) + r'\b', description_lower):
-                # Give higher score for longer, more specific keywords
-                score += len(keyword.split())
-        
-        if score > 0:
-            category_scores[category] = score
+    if description_lower.strip() in _CATEGORY_BY_NAME:
+        return _CATEGORY_BY_NAME[description_lower.strip()]
+    
+    scores = [0] * len(_CATEGORY_ORDER)
+    matched = set()
+    for word in _WORD.finditer(description_lower):
+        candidates = _KEYWORD_INDEX.get(word.group())
+        if not candidates:
+            continue
+        start = word.start()
+        for keyword, weight, positions in candidates:
+            if keyword in matched:
+                continue
+            end = start + len(keyword)
+            # Single-word keywords equal the word; longer ones must continue
+            # from it and end on a word boundary
+            if end != word.end() and not (description_lower.startswith(keyword, start)
+                                          and not _WORD_CHAR.match(description_lower, end)):
+                continue
+            matched.add(keyword)
+            for position in positions:
+                scores[position] += weight
     
     # Return the category with the highest score
-    if category_scores:
-        best_category = max(category_scores, key=category_scores.get)
-        return best_category
+    best = max(scores)
+    if best > 0:
+        return _CATEGORY_ORDER[scores.index(best)]
     
     return 'Other'
 
+def categorize_expenses(descriptions):
+    """categorize_expense over a list of descriptions, classifying each distinct one once"""
+    categories = {}
+    result = []
+    for description in descriptions:
+        key = description if isinstance(description, str) else None
+        category = categories.get(key)
+        if category is None:
+            category = categories[key] = categorize_expense(description)
+        result.append(category)
+    return result
+
+
+def backfill_transaction_categories(batch_size=500):
+    """
+    Fill transactions.category for rows written before the column existed.
+    Rows are categorized once per distinct note and updated a batch of notes
+    at a time. Returns the number of rows updated.
+    """
+    updated = 0
+    connection = current_app.get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute('SELECT DISTINCT note FROM transactions WHERE category IS NULL LIMIT %s', (batch_size,))
+                notes = [row['note'] for row in cursor.fetchall()]
+                if not notes:
+                    break
+                for note, category in zip(notes, categorize_expenses(notes)):
+                    updated += cursor.execute(
+                        'UPDATE transactions SET category = %s WHERE category IS NULL AND note <=> %s',
+                        (category, note)
+                    )
+                connection.commit()
+                print(f"Categorized {updated} transactions so far")
+        return updated
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def init_category_commands(app):
+    """Register ``flask backfill-categories`` for filling transactions.category"""
+    import click
+
+    @app.cli.command('backfill-categories')
+    def backfill_categories_command():
+        """Categorize transactions that have no category yet"""
+        click.echo(f'Categorized {backfill_transaction_categories()} transactions')
+
 
 def get_category_budget(user_id, category_name):
     if not user_id or not category_name:
@@ -276,6 +365,10 @@ def get_all_category_budgets(user_id):
     
     return budgets
 
+def month_start():
+    """Start of the current month in DB_TIMEZONE, where month-to-date spend begins"""
+    return rollup_cutoff().replace(day=1)
+
 def get_expense_till_now(user_id, category_name):
     """
     Returns the total expense for a given user and category for the current month.
@@ -286,21 +379,15 @@ def get_expense_till_now(user_id, category_name):
     try:
         connection = current_app.get_db_connection()
         with connection.cursor() as cursor:
-            # Get the first day of the current month
-            first_day = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            # Query to sum expenses for the current month, matching category in note
+            # Sent transactions this month in the category (idx_sender_category)
             query = """
-            SELECT COALESCE(SUM(amount), 0)
-            FROM transactions t
-            WHERE t.sender_id IS NOT NULL
-              AND t.sender_id = %s
-
-              AND t.note LIKE %s
-              AND t.timestamp >= %s
+            SELECT COALESCE(SUM(amount), 0) AS spent
+            FROM transactions
+            WHERE sender_id = %s AND category = %s AND timestamp >= %s
             """
-            cursor.execute(query, (user_id, category_name + '%', first_day))
+            cursor.execute(query, (user_id, category_name, month_start()))
             result = cursor.fetchone()
-            return float(result[0]) if result and result[0] is not None else 0.0
+            return float(result['spent']) if result and result['spent'] is not None else 0.0
     except Exception as e:
         print(f"Error retrieving expenses for user {user_id}, category {category_name}: {e}")
         return 0.0
@@ -308,30 +395,142 @@ def get_expense_till_now(user_id, category_name):
         if 'connection' in locals():
             connection.close()
 
-def detect_overspending(user_id, expense_description, expense_amount):
-    # Categorize the expense
-    category = categorize_expense(expense_description)
-    
-    # Get budget for the category
-    budget = get_category_budget(user_id, category)-get_expense_till_now(user_id, category)
-    
-    # Calculate overspending
-    is_overspending = expense_amount > budget if budget > 0 else False
-    overspending_amount = max(0, expense_amount - budget) if budget > 0 else 0
-    percentage_over = (overspending_amount / budget * 100) if budget > 0 else 0
-    
+_BUDGET_SQL = """
+    SELECT c.category_name AS category, i.amount AS budget_amount, 0 AS spent
+    FROM budgets b
+    JOIN budget_expense_categories c ON b.id = c.budget_id
+    JOIN budget_expense_items i ON c.id = i.category_id
+    WHERE b.user_id = %s AND c.category_name IN ({placeholders})
+"""
+
+_SPENT_SQL = """
+    SELECT category, 0 AS budget_amount, amount AS spent
+    FROM transactions
+    WHERE sender_id = %s AND category IN ({placeholders}) AND timestamp >= %s
+"""
+
+def get_category_budget_status(user_id, categories):
+    """
+    Budget and month-to-date spend for each of ``categories`` in one query:
+    {category: {'budget': float, 'spent': float}}. Spend comes from
+    spend_counters where warm; the rest is summed in the same query and used
+    to warm them. Unknown categories and lookup errors read as no budget and
+    no spend.
+    """
+    categories = list(dict.fromkeys(categories))
+    status = {category: {'budget': 0.0, 'spent': 0.0} for category in categories}
+    known = [category for category in categories if category in EXPENSE_CATEGORIES]
+    if not user_id or not known:
+        return status
+
+    first_day = month_start()
+    month = first_day.strftime('%Y-%m')
+    counted = spend_counters.get_many(user_id, known, month)
+    missing = [category for category in known if category not in counted]
+    try:
+        connection = current_app.get_db_connection()
+        with connection.cursor() as cursor:
+            query = _BUDGET_SQL.format(placeholders=', '.join(['%s'] * len(known)))
+            params = [user_id] + known
+            if missing:
+                query += ' UNION ALL ' + _SPENT_SQL.format(placeholders=', '.join(['%s'] * len(missing)))
+                params += [user_id] + missing + [first_day]
+            cursor.execute(f"""
+                SELECT category, SUM(budget_amount) AS budget_amount, SUM(spent) AS spent
+                FROM ({query}) t
+                GROUP BY category
+            """, params)
+            rows = {row['category']: row for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error retrieving budget status for user {user_id}: {e}")
+        return status
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
+    spent = {category: float((rows.get(category) or {}).get('spent') or 0) for category in missing}
+    spend_counters.warm(user_id, spent, month)
+    spent.update(counted)
+    for category in known:
+        status[category] = {
+            'budget': float((rows.get(category) or {}).get('budget_amount') or 0),
+            'spent': spent[category]
+        }
+    return status
+
+def _overspending_result(category, category_budget, remaining, expense_amount):
+    """Compare one expense with what is left of its category's monthly budget"""
+    if category_budget <= 0:
+        is_overspending, overspending_amount, percentage_over = False, 0, 0
+    elif remaining > 0:
+        is_overspending = expense_amount > remaining
+        overspending_amount = max(0, expense_amount - remaining)
+        percentage_over = overspending_amount / remaining * 100
+    else:
+        # The budget is already used up: all of the expense is over it
+        is_overspending = expense_amount > 0
+        overspending_amount = max(0, expense_amount)
+        percentage_over = overspending_amount / category_budget * 100
+
     return {
         'category': category,
-        'budget': budget,
+        'budget': remaining,
         'expense_amount': expense_amount,
         'is_overspending': is_overspending,
         'overspending_amount': overspending_amount,
         'percentage_over': round(percentage_over, 2),
         'message': f"Expense categorized as '{category}'. " + 
                   (f"Over budget by ${overspending_amount:.2f} ({percentage_over:.1f}%)" if is_overspending 
-                   else f"Within budget (${budget - expense_amount:.2f} remaining)" if budget > 0
+                   else f"Within budget (${remaining - expense_amount:.2f} remaining)" if category_budget > 0
                    else "No budget set for this category")
     }
 
+def detect_overspending(user_id, expense_description, expense_amount):
+    # Categorize the expense
+    category = categorize_expense(expense_description)
+    
+    # Budget left for the category this month, in one round trip
+    status = get_category_budget_status(user_id, [category])[category]
+    return _overspending_result(category, status['budget'], status['budget'] - status['spent'], expense_amount)
+
+def detect_overspending_batch(user_id, expenses):
+    """
+    Check a basket of pending expenses, given as (description, amount) pairs,
+    with one budget query. Items are applied in order, so each one is judged
+    against what the earlier items in its category left over. Returns per-item
+    results plus per-category and overall totals for the basket.
+    """
+    expenses = [(description, float(amount)) for description, amount in expenses]
+    categories = categorize_expenses([description for description, _ in expenses])
+    status = get_category_budget_status(user_id, categories)
 
+    remaining = {category: info['budget'] - info['spent'] for category, info in status.items()}
+    basket = {category: 0.0 for category in status}
+    items = []
+    for category, (_, amount) in zip(categories, expenses):
+        result = _overspending_result(category, status[category]['budget'], remaining[category], amount)
+        basket[category] += amount
+        remaining[category] -= amount
+        result['cumulative_amount'] = basket[category]
+        items.append(result)
 
+    summary = {}
+    for category, info in status.items():
+        left = info['budget'] - info['spent']
+        over = max(0.0, basket[category] - max(left, 0.0)) if info['budget'] > 0 else 0.0
+        summary[category] = {
+            'budget': info['budget'],
+            'spent': info['spent'],
+            'basket_amount': basket[category],
+            'remaining': left - basket[category],
+            'is_overspending': over > 0,
+            'overspending_amount': over
+        }
+    total_over = sum(info['overspending_amount'] for info in summary.values())
+    return {
+        'items': items,
+        'categories': summary,
+        'total_amount': sum(amount for _, amount in expenses),
+        'is_overspending': total_over > 0,
+        'overspending_amount': total_over
+    }
@@ -1,5 +1,6 @@
 # Utility functions for user profile fetch/update
 from flask import current_app
+from .feature_store import invalidate_user_features, refresh_user_features
 
 def get_user_and_contact(user_id):
     conn = current_app.get_db_connection()
@@ -21,6 +22,7 @@ def update_user_and_contact(user_id, user_data, contact_data):
                 (user_data['first_name'], user_data['last_name'], user_data['dob'], user_data['gender'], user_data['marital_status'], user_data['blood_group'], user_id))
             cursor.execute('UPDATE contact_info SET email=%s, phone=%s WHERE user_id=%s', 
                 (contact_data['email'], contact_data['phone'], user_id))
+            invalidate_user_features(cursor, user_id)
             
             conn.commit()
             
@@ -28,6 +30,7 @@ def update_user_and_contact(user_id, user_data, contact_data):
             user = cursor.fetchone()
             cursor.execute('SELECT * FROM contact_info WHERE user_id=%s', (user_id,))
             contact = cursor.fetchone()
-        return user, contact
     finally:
         conn.close()
+    refresh_user_features(user_id)
+    return user, contact
@@ -0,0 +1,191 @@
+# Utility functions for time-bucketed transaction reports
+from flask import current_app
+import calendar
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .rollup_utils import rollup_cutoff
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+MAX_BUCKETS = 400
+DEFAULT_BUCKETS = {'day': 30, 'week': 12, 'month': 12, 'quarter': 8, 'year': 4}
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+class ReportError(ValueError):
+    """Invalid report parameters"""
+
+def get_timezone(name=None):
+    """ZoneInfo for ``name`` (default: the timezone transactions are stored in).
+    None means server local time; astimezone() applies its DST rules per instant."""
+    name = name or current_app.config.get('DB_TIMEZONE')
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ReportError(f'Unknown timezone: {name}')
+
+def _add_months(moment, months):
+    month_index = moment.month - 1 + months
+    return moment.replace(year=moment.year + month_index // 12, month=month_index % 12 + 1, day=1)
+
+def bucket_start(moment, granularity):
+    """Start of the bucket containing ``moment``"""
+    moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return moment
+    if granularity == 'week':
+        return moment - timedelta(days=moment.weekday())
+    if granularity == 'month':
+        return moment.replace(day=1)
+    if granularity == 'quarter':
+        return moment.replace(month=(moment.month - 1) // 3 * 3 + 1, day=1)
+    if granularity == 'year':
+        return moment.replace(month=1, day=1)
+    raise ReportError(f'Unknown granularity: {granularity}')
+
+def next_bucket(moment, granularity):
+    if granularity == 'day':
+        return moment + timedelta(days=1)
+    if granularity == 'week':
+        return moment + timedelta(days=7)
+    if granularity == 'month':
+        return _add_months(moment, 1)
+    if granularity == 'quarter':
+        return _add_months(moment, 3)
+    return _add_months(moment, 12)
+
+def bucket_label(moment, granularity):
+    if granularity == 'month':
+        return moment.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return f'{moment.year}-Q{(moment.month - 1) // 3 + 1}'
+    if granularity == 'year':
+        return str(moment.year)
+    return moment.strftime('%Y-%m-%d')
+
+def bucket_boundaries(start, end, granularity):
+    """Aligned bucket starts covering [start, end), followed by the final end"""
+    if granularity not in GRANULARITIES:
+        raise ReportError(f'Unknown granularity: {granularity}')
+    if end <= start:
+        raise ReportError('Report end must be after its start')
+    boundaries = [bucket_start(start, granularity)]
+    while boundaries[-1] < end:
+        boundaries.append(next_bucket(boundaries[-1], granularity))
+        if len(boundaries) > MAX_BUCKETS + 1:
+            raise ReportError(f'Too many buckets (max {MAX_BUCKETS})')
+    return boundaries
+
+def _to_db_time(moment, tz, stored_tz):
+    # Timestamps are stored as naive DATETIMEs in the database's timezone. A naive
+    # moment (tz None) is read as server local time, and astimezone(None) converts
+    # to it, each with the DST offset in force at that instant.
+    return moment.replace(tzinfo=tz).astimezone(stored_tz).replace(tzinfo=None)
+
+def _rollup_split(edges):
+    """Where the rollup hands over to raw rows: complete days before today can
+    be read from user_daily_rollup when every bucket edge up to there falls on
+    a stored-timezone midnight"""
+    split = max(edges[0], min(edges[-1], rollup_cutoff()))
+    if any(edge.time() != time.min for edge in edges if edge <= split):
+        return edges[0]
+    return split
+
+def bucketed_totals(user_id, boundaries, tz=None):
+    """
+    Received and spent per bucket, where bucket i is [boundaries[i], boundaries[i+1])
+    in ``tz``. One query grouped by bucket: whole past days come from
+    user_daily_rollup, the rest from range scans over (receiver_id, timestamp)
+    and (sender_id, timestamp). Empty buckets are zero-filled.
+    """
+    stored_tz = get_timezone()
+    tz = tz or stored_tz
+    edges = [_to_db_time(moment, tz, stored_tz) for moment in boundaries]
+    split = _rollup_split(edges)
+    buckets = len(edges) - 1
+    cases = ' '.join(['WHEN t.timestamp < %s THEN {}'.format(i) for i in range(buckets - 1)])
+    bucket_sql = f'CASE {cases} ELSE {buckets - 1} END' if cases else '0'
+    received = [0.0] * buckets
+    spent = [0.0] * buckets
+
+    conn = current_app.get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT {bucket_sql} AS bucket,
+                       SUM(t.received) AS received, SUM(t.spent) AS spent
+                FROM (
+                    SELECT day AS timestamp,
+                           CASE WHEN direction = 'received' THEN total_amount ELSE 0 END AS received,
+                           CASE WHEN direction = 'sent' THEN total_amount ELSE 0 END AS spent
+                    FROM user_daily_rollup
+                    WHERE user_id = %s AND day >= %s AND day < %s
+                    UNION ALL
+                    SELECT timestamp, amount AS received, 0 AS spent FROM transactions
+                    WHERE receiver_id = %s AND timestamp >= %s AND timestamp < %s
+                    UNION ALL
+                    SELECT timestamp, 0 AS received, amount AS spent FROM transactions
+                    WHERE sender_id = %s AND timestamp >= %s AND timestamp < %s
+                ) t
+                GROUP BY bucket
+            ''', edges[1:-1] + [user_id, edges[0].date(), split.date(),
+                                 user_id, split, edges[-1], user_id, split, edges[-1]])
+            for row in cursor.fetchall():
+                received[row['bucket']] = float(row['received'] or 0)
+                spent[row['bucket']] = float(row['spent'] or 0)
+    finally:
+        conn.close()
+    return received, spent
+
+def _to_report_time(moment, tz):
+    # Bucket edges are naive wall-clock times in ``tz``; offset-bearing inputs are converted first
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(tz).replace(tzinfo=None)
+
+def range_report(user_id, granularity, start=None, end=None, tz_name=None):
+    """Report for an arbitrary range; defaults to the last few buckets up to now.
+    Naive ``start``/``end`` are read in the report timezone, aware ones converted to it."""
+    tz = get_timezone(tz_name)
+    now = datetime.now(tz).replace(tzinfo=None)
+    start, end = _to_report_time(start, tz), _to_report_time(end, tz)
+    end = end or next_bucket(bucket_start(now, granularity), granularity)
+    if start is None:
+        start = end
+        for _ in range(DEFAULT_BUCKETS.get(granularity, 12)):
+            start = bucket_start(start - timedelta(days=1), granularity)
+    boundaries = bucket_boundaries(start, end, granularity)
+    received, spent = bucketed_totals(user_id, boundaries, tz)
+    return {
+        'labels': [bucket_label(moment, granularity) for moment in boundaries[:-1]],
+        'received': received,
+        'spent': spent,
+        'granularity': granularity,
+        'start': boundaries[0].isoformat(),
+        'end': boundaries[-1].isoformat(),
+        'timezone': str(tz) if tz is not None else 'local'
+    }
+
+def period_report(user_id, period, tz_name=None):
+    """The dashboard's fixed periods: 'yearly' (last four years), 'weekly'
+    (7-day weeks of the current month) and 'monthly' (this calendar year)"""
+    tz = get_timezone(tz_name)
+    now = datetime.now(tz).replace(tzinfo=None)
+    if period == 'yearly':
+        boundaries = [datetime(year, 1, 1) for year in range(now.year - 3, now.year + 2)]
+        labels = [str(moment.year) for moment in boundaries[:-1]]
+    elif period == 'weekly':
+        month_start = datetime(now.year, now.month, 1)
+        month_end = month_start + timedelta(days=calendar.monthrange(now.year, now.month)[1])
+        boundaries = [month_start + timedelta(days=7 * week) for week in range(5)
+                      if month_start + timedelta(days=7 * week) < month_end] + [month_end]
+        labels = [f'Week {i + 1}' for i in range(len(boundaries) - 1)]
+    else:
+        boundaries = [datetime(now.year, month, 1) for month in range(1, 13)] + [datetime(now.year + 1, 1, 1)]
+        labels = list(MONTH_LABELS)
+
+    received, spent = bucketed_totals(user_id, boundaries, tz)
+    report = {'labels': labels, 'received': received, 'spent': spent}
+    if period not in ('yearly', 'weekly'):
+        report['year'] = now.year
+    return report
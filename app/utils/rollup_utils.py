@@ -0,0 +1,199 @@
+# Per-user daily transaction rollup, maintained as transactions are written
+from flask import current_app
+import math
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Rows are grouped per user, day (in DB_TIMEZONE, the timezone timestamps are
+# stored in), direction, type and payment method; NULL type/method become ''
+_ROLLUP_UPSERT_SQL = """
+    INSERT INTO user_daily_rollup
+    (user_id, day, direction, type, payment_method, tx_count, total_amount, sum_squares,
+     business_hours_count, small_count, medium_count, large_count, last_timestamp)
+    SELECT t.user_id, DATE(t.timestamp), t.direction, COALESCE(t.type, ''), COALESCE(t.payment_method, ''),
+           COUNT(*), SUM(t.amount), SUM(t.amount * t.amount),
+           SUM(HOUR(t.timestamp) BETWEEN 9 AND 17), SUM(t.amount < 100),
+           SUM(t.amount BETWEEN 100 AND 1000), SUM(t.amount > 1000), MAX(t.timestamp)
+    FROM (
+        SELECT sender_id AS user_id, 'sent' AS direction, timestamp, type, payment_method, amount
+        FROM transactions WHERE {where} AND sender_id IS NOT NULL
+        UNION ALL
+        SELECT receiver_id AS user_id, 'received' AS direction, timestamp, type, payment_method, amount
+        FROM transactions WHERE {where} AND receiver_id IS NOT NULL
+    ) t
+    GROUP BY t.user_id, DATE(t.timestamp), t.direction, COALESCE(t.type, ''), COALESCE(t.payment_method, '')
+    ON DUPLICATE KEY UPDATE
+        tx_count = user_daily_rollup.tx_count + VALUES(tx_count),
+        total_amount = user_daily_rollup.total_amount + VALUES(total_amount),
+        sum_squares = user_daily_rollup.sum_squares + VALUES(sum_squares),
+        business_hours_count = user_daily_rollup.business_hours_count + VALUES(business_hours_count),
+        small_count = user_daily_rollup.small_count + VALUES(small_count),
+        medium_count = user_daily_rollup.medium_count + VALUES(medium_count),
+        large_count = user_daily_rollup.large_count + VALUES(large_count),
+        last_timestamp = GREATEST(user_daily_rollup.last_timestamp, VALUES(last_timestamp))
+"""
+
+def rollup_cutoff():
+    """Start of the current day in DB_TIMEZONE. Rollup rows before it are
+    complete; readers scan raw transactions from here on."""
+    name = current_app.config.get('DB_TIMEZONE')
+    now = datetime.now(ZoneInfo(name)).replace(tzinfo=None) if name else datetime.now()
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def record_transaction_rollup(cursor, transaction_id):
+    """Add one just-inserted transaction to the rollup (no commit). Call it
+    in the same DB transaction as the insert so both commit together."""
+    cursor.execute(_ROLLUP_UPSERT_SQL.format(where='id = %s'), (transaction_id, transaction_id))
+
+def rebuild_user_daily_rollup(start_day=None, end_day=None, chunk_days=31):
+    """
+    Recompute the rollup from raw transactions for [start_day, end_day)
+    (defaults: the first transaction's day through today), one committed
+    chunk of ``chunk_days`` at a time. Returns the number of days rebuilt.
+    """
+    conn = current_app.get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            if start_day is None:
+                cursor.execute('SELECT MIN(timestamp) AS first FROM transactions')
+                first = cursor.fetchone()['first']
+                if first is None:
+                    return 0
+                start_day = first.date()
+            end_day = end_day or rollup_cutoff().date() + timedelta(days=1)
+
+            day = start_day
+            while day < end_day:
+                chunk_end = min(day + timedelta(days=chunk_days), end_day)
+                lo, hi = datetime.combine(day, datetime.min.time()), datetime.combine(chunk_end, datetime.min.time())
+                cursor.execute('DELETE FROM user_daily_rollup WHERE day >= %s AND day < %s', (day, chunk_end))
+                cursor.execute(_ROLLUP_UPSERT_SQL.format(where='timestamp >= %s AND timestamp < %s'),
+                               (lo, hi, lo, hi))
+                conn.commit()
+                print(f"Rebuilt user_daily_rollup for {day} .. {chunk_end - timedelta(days=1)}")
+                day = chunk_end
+        return (end_day - start_day).days
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _user_rows_sql(columns):
+    """Rollup rows before the cutoff plus today's raw transactions, in one shape"""
+    rollup, sent, received = zip(*columns)
+    return f"""
+        SELECT {', '.join(rollup)} FROM user_daily_rollup WHERE user_id = %s AND day < %s
+        UNION ALL
+        SELECT {', '.join(sent)} FROM transactions WHERE sender_id = %s AND timestamp >= %s
+        UNION ALL
+        SELECT {', '.join(received)} FROM transactions WHERE receiver_id = %s AND timestamp >= %s
+    """
+
+_TOTALS_COLUMNS = [
+    ('direction', "'sent' AS direction", "'received' AS direction"),
+    ('tx_count', '1 AS tx_count', '1 AS tx_count'),
+    ('total_amount', 'amount AS total_amount', 'amount AS total_amount'),
+    ('last_timestamp', 'timestamp AS last_timestamp', 'timestamp AS last_timestamp'),
+]
+
+def get_user_totals(user_id):
+    """Sent/received totals, count, average and last transaction for a user"""
+    cutoff = rollup_cutoff()
+    conn = current_app.get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT direction, SUM(tx_count) AS tx_count, SUM(total_amount) AS total_amount,
+                       MAX(last_timestamp) AS last_timestamp
+                FROM ({_user_rows_sql(_TOTALS_COLUMNS)}) t
+                GROUP BY direction
+            """, (user_id, cutoff.date(), user_id, cutoff, user_id, cutoff))
+            rows = {row['direction']: row for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+    sent, received = rows.get('sent') or {}, rows.get('received') or {}
+    count = int(sent.get('tx_count') or 0) + int(received.get('tx_count') or 0)
+    total_sent = float(sent.get('total_amount') or 0)
+    total_received = float(received.get('total_amount') or 0)
+    last = [row['last_timestamp'] for row in (sent, received) if row.get('last_timestamp')]
+    return {
+        'total_sent': total_sent,
+        'total_received': total_received,
+        'transaction_count': count,
+        'avg_transaction': (total_sent + total_received) / count if count else 0.0,
+        'last_transaction_date': max(last) if last else None
+    }
+
+_PATTERN_COLUMNS = [
+    ('day', 'DATE(timestamp) AS day', 'DATE(timestamp) AS day'),
+    ('payment_method', "COALESCE(payment_method, '') AS payment_method", "COALESCE(payment_method, '') AS payment_method"),
+    ('tx_count', '1 AS tx_count', '1 AS tx_count'),
+    ('total_amount', 'amount AS total_amount', 'amount AS total_amount'),
+    ('sum_squares', 'amount * amount AS sum_squares', 'amount * amount AS sum_squares'),
+    ('business_hours_count', 'HOUR(timestamp) BETWEEN 9 AND 17 AS business_hours_count',
+     'HOUR(timestamp) BETWEEN 9 AND 17 AS business_hours_count'),
+    ('small_count', 'amount < 100 AS small_count', 'amount < 100 AS small_count'),
+    ('medium_count', 'amount BETWEEN 100 AND 1000 AS medium_count', 'amount BETWEEN 100 AND 1000 AS medium_count'),
+    ('large_count', 'amount > 1000 AS large_count', 'amount > 1000 AS large_count'),
+]
+
+def get_user_pattern_stats(user_id):
+    """
+    Additive transaction-pattern statistics for a user from the rollup (plus
+    today's raw rows). Recent-activity windows are whole calendar days: the
+    last 7 and 30 days including today.
+    """
+    cutoff = rollup_cutoff()
+    today = cutoff.date()
+    conn = current_app.get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT SUM(tx_count) AS total_transactions,
+                       SUM(total_amount) AS total_amount,
+                       SUM(sum_squares) AS sum_squares,
+                       SUM(business_hours_count) AS business_hours_txs,
+                       SUM(CASE WHEN DAYOFWEEK(day) IN (1, 7) THEN tx_count ELSE 0 END) AS weekend_txs,
+                       SUM(small_count) AS small_txs,
+                       SUM(medium_count) AS medium_txs,
+                       SUM(large_count) AS large_txs,
+                       SUM(CASE WHEN day >= %s THEN tx_count ELSE 0 END) AS recent_week_txs,
+                       SUM(CASE WHEN day >= %s THEN tx_count ELSE 0 END) AS recent_month_txs,
+                       COUNT(DISTINCT NULLIF(payment_method, '')) AS unique_payment_methods
+                FROM ({_user_rows_sql(_PATTERN_COLUMNS)}) t
+            """, (today - timedelta(days=6), today - timedelta(days=29),
+                  user_id, today, user_id, cutoff, user_id, cutoff))
+            row = cursor.fetchone() or {}
+    finally:
+        conn.close()
+
+    count = int(row.get('total_transactions') or 0)
+    mean = float(row.get('total_amount') or 0) / count if count else None
+    variance = float(row.get('sum_squares') or 0) / count - mean * mean if count else None
+    stats = {key: int(row.get(key) or 0) for key in (
+        'business_hours_txs', 'weekend_txs', 'small_txs', 'medium_txs', 'large_txs',
+        'recent_week_txs', 'recent_month_txs', 'unique_payment_methods'
+    )}
+    stats.update({
+        'total_transactions': count,
+        'avg_amount': mean,
+        'amount_stddev': math.sqrt(max(variance, 0.0)) if count else None
+    })
+    return stats
+
+def init_rollup_commands(app):
+    """Register ``flask rebuild-rollup`` for backfilling the rollup"""
+    import click
+
+    @app.cli.command('rebuild-rollup')
+    @click.option('--start', 'start_day', default=None, help='First day to rebuild (YYYY-MM-DD)')
+    @click.option('--end', 'end_day', default=None, help='Day to stop before (YYYY-MM-DD)')
+    def rebuild_rollup_command(start_day, end_day):
+        """Recompute user_daily_rollup from the transactions table"""
+        days = rebuild_user_daily_rollup(
+            date.fromisoformat(start_day) if start_day else None,
+            date.fromisoformat(end_day) if end_day else None
+        )
+        click.echo(f'Rebuilt {days} days of user_daily_rollup')
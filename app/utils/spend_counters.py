@@ -0,0 +1,240 @@
+"""
+Month-to-date spend counters per (user, category, month) for overspending checks.
+A counter is warmed from SQL the first time it is read and then incremented
+as transfers commit, so a check reads it instead of re-summing the month's
+transactions. Keys carry the month, so a new month starts from fresh counters
+while last month's age out. Counters also expire after SPEND_COUNTER_TTL
+seconds, which bounds drift from writes this process did not see (other
+processes with the local backend, or a transfer that raced a warm-up).
+
+Backends: 'local' (in-process LRU dict) or 'redis' (any Redis-compatible
+server at SPEND_COUNTER_REDIS_URL, shared by every process; needs the redis
+package).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from .rollup_utils import rollup_cutoff
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 100000
+
+
+def current_month():
+    """Month key ('YYYY-MM') of now in DB_TIMEZONE"""
+    return rollup_cutoff().strftime('%Y-%m')
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+class LocalCounterStore:
+    """In-process LRU of integer counters with per-entry expiry"""
+
+    name = 'local'
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set_if_absent(self, key, value, ttl):
+        with self._lock:
+            if self._live(key) is None:
+                self._entries[key] = (value, time.monotonic() + ttl)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def incr_if_present(self, key, amount):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._entries[key] = (entry[0] + amount, entry[1])
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+# Only count onto counters that already hold a warmed total
+_INCR_IF_PRESENT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+class RedisCounterStore:
+    """Counters in a Redis-compatible server, shared between processes"""
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='spend:'):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._incr = self._client.register_script(_INCR_IF_PRESENT)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return int(value) if value is not None else None
+
+    def set_if_absent(self, key, value, ttl):
+        self._client.set(self.prefix + key, value, nx=True, ex=max(1, int(ttl)))
+
+    def incr_if_present(self, key, amount):
+        return self._incr(keys=[self.prefix + key], args=[amount]) is not None
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + '*'):
+            self._client.delete(key)
+
+    def size(self):
+        return None
+
+
+class MonthlySpendCounters:
+    """Month-to-date spend per (user, category), held in cents"""
+
+    def __init__(self, store=None, ttl=DEFAULT_TTL):
+        self.store = store or LocalCounterStore()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._warms = 0
+        self._increments = 0
+        self._invalidations = 0
+        self._errors = 0
+
+    def configure(self, store=None, ttl=None):
+        if store is not None:
+            self.store = store
+        if ttl is not None:
+            self.ttl = ttl
+
+    @staticmethod
+    def _key(user_id, category, month):
+        return f'{user_id}:{category}:{month}'
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, '_' + name, getattr(self, '_' + name) + delta)
+
+    def get_many(self, user_id, categories, month=None):
+        """{category: spent} for the categories with a live counter; the rest
+        must be read from SQL and passed to warm()"""
+        month = month or current_month()
+        found = {}
+        try:
+            for category in categories:
+                cents = self.store.get(self._key(user_id, category, month))
+                if cents is not None:
+                    found[category] = cents / 100
+        except Exception as e:
+            print(f"Spend counter lookup failed: {e}")
+            self._count(errors=1)
+            found = {}
+        self._count(hits=len(found), misses=len(categories) - len(found))
+        return found
+
+    def warm(self, user_id, spent, month=None):
+        """Seed counters with month-to-date totals read from SQL"""
+        month = month or current_month()
+        try:
+            for category, amount in spent.items():
+                self.store.set_if_absent(self._key(user_id, category, month), to_cents(amount), self.ttl)
+            self._count(warms=len(spent))
+        except Exception as e:
+            print(f"Spend counter warm-up failed: {e}")
+            self._count(errors=1)
+
+    def add(self, user_id, category, amount, month=None):
+        """Record a committed expense; counters not yet warmed are left to SQL"""
+        if not user_id or not category:
+            return
+        try:
+            if self.store.incr_if_present(self._key(user_id, category, month or current_month()), to_cents(amount)):
+                self._count(increments=1)
+        except Exception as e:
+            print(f"Spend counter increment failed: {e}")
+            self._count(errors=1)
+
+    def invalidate(self, user_id, categories, month=None):
+        """Drop counters so the next check re-reads them from SQL"""
+        month = month or current_month()
+        try:
+            for category in categories:
+                if category:
+                    self.store.delete(self._key(user_id, category, month))
+            self._count(invalidations=1)
+        except Exception as e:
+            print(f"Spend counter invalidation failed: {e}")
+            self._count(errors=1)
+
+    def clear(self):
+        self.store.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': self.store.name,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'warms': self._warms,
+                'increments': self._increments,
+                'invalidations': self._invalidations,
+                'errors': self._errors,
+                'entries': self.store.size()
+            }
+
+
+# Create global instance
+spend_counters = MonthlySpendCounters()
+
+
+def init_spend_counters(app):
+    """Configure the global spend counters from app config"""
+    backend = app.config.get('SPEND_COUNTER_BACKEND', 'local')
+    if backend == 'redis':
+        store = RedisCounterStore(app.config['SPEND_COUNTER_REDIS_URL'])
+    else:
+        store = LocalCounterStore(app.config.get('SPEND_COUNTER_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    spend_counters.configure(store=store, ttl=app.config.get('SPEND_COUNTER_TTL', DEFAULT_TTL))
+    app.spend_counters = spend_counters
+    return spend_counters
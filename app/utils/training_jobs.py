@@ -0,0 +1,255 @@
+"""
+Background training jobs for registry model families.
+
+Submitting a job returns its id at once; a thread loads the training data in
+an app context and fits the models (in ML_TRAINING_WORKERS processes for the
+budget family), and the registry publishes the result only if the job
+succeeds. One job per family runs at a time, across processes: a lock file
+in the family directory names the running job and is touched as it makes
+progress; a lock untouched for ML_TRAINING_TIMEOUT seconds is treated as
+left behind by a crashed process.
+Job state is written to ``<family>/jobs/<job_id>.json`` so any web process
+can answer status polls.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import logging
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 3600.0
+DEFAULT_KEEP_JOBS = 20
+FINISHED = ('succeeded', 'failed')
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class TrainingJobConflict(RuntimeError):
+    """A training job for the family is already running"""
+
+    def __init__(self, job):
+        super().__init__(f"Training job {job['job_id']} is already running")
+        self.job = job
+
+
+class TrainingJobManager:
+    """Runs training jobs and tracks their state"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, keep_jobs=DEFAULT_KEEP_JOBS, workers=1):
+        self.timeout = timeout
+        self.keep_jobs = keep_jobs
+        self.workers = workers
+        self._jobs = {}  # job_id -> state, for jobs run by this process
+        self._lock = threading.Lock()
+
+    def configure(self, timeout=None, keep_jobs=None, workers=None):
+        if timeout is not None:
+            self.timeout = timeout
+        if keep_jobs is not None:
+            self.keep_jobs = keep_jobs
+        if workers is not None:
+            self.workers = workers
+
+    @staticmethod
+    def _jobs_dir(registry):
+        return os.path.join(registry.family_dir, 'jobs')
+
+    @staticmethod
+    def _lock_file(registry):
+        return os.path.join(registry.family_dir, '.training.lock')
+
+    def _write(self, registry, state):
+        jobs_dir = self._jobs_dir(registry)
+        os.makedirs(jobs_dir, exist_ok=True)
+        path = os.path.join(jobs_dir, f"{state['job_id']}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f, default=str)
+        os.replace(path + '.tmp', path)
+
+    def _read(self, registry, job_id):
+        try:
+            with open(os.path.join(self._jobs_dir(registry), f'{job_id}.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _acquire(self, registry, job_id):
+        """Take the family lock for ``job_id``; returns the running job's state if it is held"""
+        os.makedirs(registry.family_dir, exist_ok=True)
+        path = self._lock_file(registry)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(path) as f:
+                        holder = f.read().strip()
+                    age = time.time() - os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+                running = self.get(registry, holder) if _JOB_ID.match(holder) else None
+                if running is None and _JOB_ID.match(holder):
+                    # Locked but not yet written by the submitting process
+                    running = {'job_id': holder, 'family': registry.family, 'status': 'queued'}
+                if running and running['status'] not in FINISHED and age < self.timeout:
+                    return running
+                logger.warning(f"Removing stale {registry.family} training lock held by {holder or 'unknown job'}")
+                self._release(registry, holder)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(job_id)
+            return None
+        raise RuntimeError(f'Could not take the {registry.family} training lock')
+
+    def _release(self, registry, job_id):
+        path = self._lock_file(registry)
+        try:
+            with open(path) as f:
+                if f.read().strip() != job_id:
+                    return
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def submit(self, registry, run, app=None):
+        """
+        Start ``run(progress)`` in the background as a job for the registry's
+        family and return the job state. ``run`` returns a summary dict
+        (version, metrics, ...) or None on failure, and calls
+        ``progress(done, total, message)`` as it goes.
+        Raises TrainingJobConflict if a job for the family is running.
+        """
+        app = app or current_app._get_current_object()
+        job_id = uuid.uuid4().hex
+        running = self._acquire(registry, job_id)
+        if running:
+            raise TrainingJobConflict(running)
+
+        state = {
+            'job_id': job_id,
+            'family': registry.family,
+            'status': 'queued',
+            'progress': 0.0,
+            'message': 'Queued',
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'version': None,
+            'metrics': {},
+            'error': None
+        }
+        try:
+            self._update(registry, state)
+            thread = threading.Thread(target=self._run, args=(app, registry, state, run),
+                                      name=f'train-{registry.family}-{job_id[:8]}', daemon=True)
+            thread.start()
+        except Exception:
+            self._release(registry, job_id)
+            raise
+        return dict(state)
+
+    def _update(self, registry, state, **changes):
+        with self._lock:
+            state.update(changes)
+            self._jobs[state['job_id']] = state
+            snapshot = dict(state)
+        try:
+            self._write(registry, snapshot)
+        except OSError as e:
+            logger.error(f"Could not write training job state {state['job_id']}: {e}")
+        # Keeps the lock fresh while the job makes progress
+        try:
+            os.utime(self._lock_file(registry))
+        except OSError:
+            pass
+
+    def _run(self, app, registry, state, run):
+        def progress(done, total, message=''):
+            self._update(registry, state, progress=round(done / total, 3) if total else 0.0,
+                         message=f'Trained {message} ({done}/{total})' if message else f'{done}/{total}')
+
+        self._update(registry, state, status='running', started_at=time.time(), message='Loading training data')
+        try:
+            with app.app_context():
+                summary = run(progress)
+            if summary:
+                self._update(registry, state, status='succeeded', progress=1.0,
+                             message=f"Published version {summary.get('version')}",
+                             version=summary.get('version'), metrics=summary.get('metrics', {}),
+                             models_trained=summary.get('models_trained'),
+                             training_rows=summary.get('training_rows'))
+            else:
+                self._update(registry, state, status='failed',
+                             message='Not enough data to train models', error='no training data')
+        except Exception as e:
+            logger.error(f"Training job {state['job_id']} failed: {e}")
+            self._update(registry, state, status='failed', message='Training failed', error=str(e))
+        finally:
+            self._update(registry, state, finished_at=time.time())
+            self._release(registry, state['job_id'])
+            self._prune(registry)
+
+    def get(self, registry, job_id):
+        """State of a job, from this process or the shared job files; None if unknown"""
+        if not _JOB_ID.match(job_id or ''):
+            return None
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is not None:
+                return dict(state)
+        return self._read(registry, job_id)
+
+    def active(self, registry):
+        """State of the family's running job, or None"""
+        try:
+            with open(self._lock_file(registry)) as f:
+                holder = f.read().strip()
+        except FileNotFoundError:
+            return None
+        state = self.get(registry, holder)
+        return state if state and state['status'] not in FINISHED else None
+
+    def _prune(self, registry):
+        jobs_dir = self._jobs_dir(registry)
+        try:
+            paths = [os.path.join(jobs_dir, name) for name in os.listdir(jobs_dir) if name.endswith('.json')]
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:max(0, len(paths) - self.keep_jobs)]:
+                os.remove(path)
+        except OSError:
+            pass
+        with self._lock:
+            finished = [job_id for job_id, state in self._jobs.items() if state['status'] in FINISHED]
+            for job_id in finished[:max(0, len(finished) - self.keep_jobs)]:
+                del self._jobs[job_id]
+
+
+# Create global instance
+training_jobs = TrainingJobManager()
+
+
+def submit_budget_training():
+    """Start a background training job for the budget models"""
+    from .ml_budget_generator import budget_generator
+
+    workers = training_jobs.workers
+    return training_jobs.submit(
+        budget_generator.registry,
+        lambda progress: budget_generator.train_models(progress=progress, workers=workers)
+    )
+
+
+def init_training_jobs(app):
+    """Configure the global training job manager from app config"""
+    training_jobs.configure(
+        timeout=app.config.get('ML_TRAINING_TIMEOUT', DEFAULT_TIMEOUT),
+        keep_jobs=app.config.get('ML_TRAINING_KEEP_JOBS', DEFAULT_KEEP_JOBS),
+        workers=app.config.get('ML_TRAINING_WORKERS', 1),
+    )
+    app.training_jobs = training_jobs
+    return training_jobs
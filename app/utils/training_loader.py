@@ -0,0 +1,178 @@
+"""
+Streaming, typed loader for the budget model training set.
+
+prepare_data used to fetchall() the expense habit join into dicts, build an
+object-dtype DataFrame and convert it column by column. load_training_frame
+reads the join through a server-side cursor (pymysql SSCursor) instead, in
+chunks of TRAINING_CHUNK_SIZE rows. Each chunk is converted straight into
+preallocated typed columns:
+- float32 for amounts, age and dependents;
+- int8 for earning_member;
+- integer codes for the string fields, one code table per column shared
+  across chunks, so incomes are parsed once per distinct value.
+
+Fills, derived features and label encoding then run vectorized over the
+whole columns. Memory is bounded by those arrays (about 100 bytes per row)
+rather than by Python row objects. The frame keeps prepare_data's column
+names, with the string fields as pandas categoricals.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+import pymysql
+from sklearn.preprocessing import LabelEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+AMOUNT_COLUMNS = ['rent', 'transport_cost', 'grocery_cost', 'utilities_cost', 'mobile_internet_cost', 'loan_payment']
+FLOAT_COLUMNS = AMOUNT_COLUMNS + ['age', 'dependents', 'earning_member']
+STRING_COLUMNS = ['monthly_income', 'gender', 'marital_status', 'living_situation', 'transport_mode',
+                  'eating_out_frequency', 'savings', 'country', 'division', 'district']
+
+# Label for NULL string fields: 'Unknown' for the address fields, as prepare_data
+# filled them; the others were encoded as str(None)
+MISSING_LABELS = {'country': 'Unknown', 'division': 'Unknown', 'district': 'Unknown', 'monthly_income': None}
+
+TRAINING_FROM = """
+    FROM user_expense_habit ueh
+    JOIN users u ON ueh.user_id = u.id
+    LEFT JOIN contact_info ci ON u.id = ci.user_id
+    LEFT JOIN addresses a ON ci.address_id = a.id
+    WHERE ueh.monthly_income IS NOT NULL
+"""
+
+# Only the columns training uses, in the order the loader reads them
+TRAINING_COLUMNS = [
+    'rent', 'transport_cost', 'grocery_cost', 'utilities_cost', 'mobile_internet_cost', 'loan_payment',
+    'age', 'dependents', 'earning_member', 'monthly_income', 'gender', 'marital_status', 'living_situation',
+    'transport_mode', 'eating_out_frequency', 'savings', 'country', 'division', 'district'
+]
+_TABLE_ALIASES = {'age': 'u', 'gender': 'u', 'marital_status': 'u', 'country': 'a', 'division': 'a', 'district': 'a'}
+TRAINING_QUERY = (
+    'SELECT ' + ', '.join(f"{_TABLE_ALIASES.get(col, 'ueh')}.{col}" for col in TRAINING_COLUMNS) + TRAINING_FROM
+)
+TRAINING_COUNT_QUERY = 'SELECT COUNT(*) AS row_count' + TRAINING_FROM
+
+
+class _CodeTable:
+    """Integer codes for one string column, shared across chunks"""
+
+    def __init__(self, missing):
+        self.missing = missing
+        self.labels = []
+        self._index = {}
+
+    def _code(self, label):
+        code = self._index.get(label)
+        if code is None:
+            code = self._index[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        mapping = [self._code(str(value)) for value in uniques]
+        if (codes < 0).any():
+            mapping.append(self._code(self.missing))
+        # NULLs are -1 and pick the missing label appended last
+        return np.asarray(mapping, dtype=np.int32)[codes]
+
+
+class TypedColumns:
+    """Preallocated typed columns filled chunk by chunk"""
+
+    def __init__(self, capacity=0):
+        self.size = 0
+        self.floats = {col: np.empty(capacity, dtype=np.float32) for col in FLOAT_COLUMNS}
+        self.codes = {col: np.empty(capacity, dtype=np.int32) for col in STRING_COLUMNS}
+        self.tables = {col: _CodeTable(MISSING_LABELS.get(col, 'None')) for col in STRING_COLUMNS}
+
+    def _reserve(self, count):
+        capacity = len(self.floats[FLOAT_COLUMNS[0]])
+        if self.size + count <= capacity:
+            return
+        # More rows than counted (inserted meanwhile): grow geometrically
+        capacity = max(2 * capacity, self.size + count)
+        for arrays in (self.floats, self.codes):
+            for col, array in arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                arrays[col] = grown
+
+    def append(self, rows):
+        """Add a chunk of row tuples in TRAINING_COLUMNS order"""
+        if not rows:
+            return
+        self._reserve(len(rows))
+        start, end = self.size, self.size + len(rows)
+        for col, values in zip(TRAINING_COLUMNS, zip(*rows)):
+            if col in self.floats:
+                self.floats[col][start:end] = pd.to_numeric(
+                    pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float32)
+            else:
+                self.codes[col][start:end] = self.tables[col].encode(values)
+        self.size = end
+
+    def frame(self, parse_income, label_encoders):
+        """
+        Training frame with fills, derived features and ``{col}_encoded``
+        columns; fits any encoder missing from ``label_encoders``
+        """
+        n = self.size
+        columns = {}
+        for col in AMOUNT_COLUMNS + ['dependents']:
+            columns[col] = np.nan_to_num(self.floats[col][:n], nan=0.0)
+        age = self.floats['age'][:n]
+        columns['age'] = np.where(np.isnan(age), np.nanmedian(age) if (~np.isnan(age)).any() else 30, age)
+        columns['earning_member'] = np.nan_to_num(self.floats['earning_member'][:n], nan=0.0).astype(np.int8)
+
+        incomes = np.array([parse_income(label) for label in self.tables['monthly_income'].labels], dtype=np.float32)
+        income = incomes[self.codes['monthly_income'][:n]]
+        columns['monthly_income_numeric'] = income
+
+        fixed = columns['rent'] + columns['utilities_cost'] + columns['mobile_internet_cost'] + columns['loan_payment']
+        variable = columns['transport_cost'] + columns['grocery_cost']
+        columns['total_fixed_expenses'] = fixed
+        columns['total_variable_expenses'] = variable
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['income_expense_ratio'] = income / (fixed + variable + 1)
+            columns['expense_per_dependent'] = fixed / (columns['dependents'] + 1)
+            columns['age_income_ratio'] = columns['age'] / (income / 1000)
+
+        for col in STRING_COLUMNS[1:]:
+            table, codes = self.tables[col], self.codes[col][:n]
+            labels = np.array(table.labels, dtype=object)
+            columns[col] = pd.Categorical.from_codes(codes, categories=pd.Index(labels, dtype=object))
+            if col not in label_encoders:
+                label_encoders[col] = LabelEncoder().fit(labels.astype(str))
+            encoded = label_encoders[col].transform(labels.astype(str))
+            dtype = np.min_scalar_type(max(len(label_encoders[col].classes_) - 1, 0))
+            columns[f'{col}_encoded'] = encoded.astype(dtype)[codes]
+        return pd.DataFrame(columns, copy=False)
+
+
+def load_training_frame(conn, parse_income, label_encoders, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream the training join from ``conn`` into a typed DataFrame (empty when
+    there are no rows); fits any encoder missing from ``label_encoders``
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(TRAINING_COUNT_QUERY)
+        capacity = int(cursor.fetchone()['row_count'])
+
+    columns = TypedColumns(capacity)
+    with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(TRAINING_QUERY)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            columns.append(rows)
+            logger.info(f"Loaded {columns.size}/{capacity} training rows")
+
+    if columns.size == 0:
+        return pd.DataFrame()
+    return columns.frame(parse_income, label_encoders)
@@ -2,7 +2,13 @@
 from flask import current_app
 import uuid
 from decimal import Decimal
-from .blockchain_utils import process_transaction_with_blockchain, get_user_blockchain_summary
+from .blockchain_utils import get_user_blockchain_summary
+from .event_log import event_log
+from .fraud_cache import flagged_users
+from .rollup_utils import record_transaction_rollup
+from .overspending_detector import categorize_expense
+from .spend_counters import spend_counters
+from .transfer_engine import execute_transfer, RECIPIENT_NOT_FOUND, SENDER_NOT_FOUND
 
 def get_user_by_id(user_id):
     conn = current_app.get_db_connection()
@@ -16,119 +22,65 @@ def get_user_by_id(user_id):
 
 def send_money(sender_id, recipient_id, amount, payment_method, note, location, tx_type):
     print(f"send_money called: sender_id={sender_id}, recipient_id={recipient_id}, amount={amount}, payment_method={payment_method}, note={note}, location={location}, type={tx_type}")
-    conn = current_app.get_db_connection()
+    if recipient_id == sender_id:
+        print("Cannot send money to yourself.")
+        return False, 'Cannot send money to yourself.', get_user_by_id(sender_id)
     try:
-        with conn.cursor() as cursor:
-            cursor.execute('SELECT * FROM users WHERE id = %s', (sender_id,))
-            sender = cursor.fetchone()
-            cursor.execute('SELECT * FROM users WHERE id = %s', (recipient_id,))
-            recipient = cursor.fetchone()
-            
-            print(f"Sender: {sender['id'] if sender else None}, Recipient: {recipient['id'] if recipient else None}")
-            
-            if not recipient:
-                print("Recipient not found.")
-                return False, 'Recipient not found.', sender
-            if recipient['id'] == sender['id']:
-                print("Cannot send money to yourself.")
-                return False, 'Cannot send money to yourself.', sender
-                
-            try:
-                # Convert amount to Decimal for consistent calculations
-                amount_val = Decimal(str(amount))
-            except Exception as e:
-                print(f"Invalid amount: {amount}")
-                return False, 'Invalid amount.', sender
-                
-            if sender['balance'] < amount_val:
-                print("Insufficient balance.")
-                return False, 'Insufficient balance.', sender
-            if not payment_method:
-                print("Missing payment_method")
-                return False, 'Payment method is required.', sender
-            if not tx_type:
-                print("Missing transaction type")
-                return False, 'Transaction type is required.', sender
-                
-            # Print all params before insert
-            tx_id = str(uuid.uuid4())
-            print(f"INSERT PARAMS: id={tx_id}, amount={amount_val}, payment_method={payment_method}, sender_id={sender['id']}, receiver_id={recipient['id']}, note={note}, type={tx_type}, location={location}")
-            
-            # Calculate new balances using Decimal arithmetic
-            new_sender_balance = sender['balance'] - amount_val
-            new_recipient_balance = recipient['balance'] + amount_val
-            
-            # Validate sender transaction with blockchain
-            sender_blockchain_valid, sender_message = process_transaction_with_blockchain(
-                sender['id'], 
-                -amount_val,  # Negative amount for sender
-                new_sender_balance,
-                f"send_money_{payment_method}",
-                {
+        # Convert amount to Decimal for consistent calculations
+        amount_val = Decimal(str(amount))
+    except Exception as e:
+        print(f"Invalid amount: {amount}")
+        return False, 'Invalid amount.', get_user_by_id(sender_id)
+    if not payment_method:
+        print("Missing payment_method")
+        return False, 'Payment method is required.', get_user_by_id(sender_id)
+    if not tx_type:
+        print("Missing transaction type")
+        return False, 'Transaction type is required.', get_user_by_id(sender_id)
+    
+    tx_id = str(uuid.uuid4())
+    try:
+        # Balances, ledger entries and the transaction row commit together under row locks
+        ok, message, result = execute_transfer(
+            sender_id, recipient_id, amount_val, payment_method, note, location, tx_type,
+            ledger={
+                'debit_method': f"send_money_{payment_method}",
+                'debit_details': {
                     'transaction_id': tx_id,
-                    'recipient_id': recipient['id'],
+                    'recipient_id': recipient_id,
                     'note': note,
                     'location': location,
                     'type': tx_type
-                }
-            )
-            
-            if not sender_blockchain_valid:
-                print(f"Sender blockchain validation failed: {sender_message}")
-                return False, f'Transaction blocked: {sender_message}', sender
-            
-            # Validate recipient transaction with blockchain
-            recipient_blockchain_valid, recipient_message = process_transaction_with_blockchain(
-                recipient['id'],
-                amount_val,   # Positive amount for recipient
-                new_recipient_balance,
-                f"receive_money_{payment_method}",
-                {
+                },
+                'credit_method': f"receive_money_{payment_method}",
+                'credit_details': {
                     'transaction_id': tx_id,
-                    'sender_id': sender['id'],
+                    'sender_id': sender_id,
                     'note': note,
                     'location': location,
                     'type': tx_type
                 }
-            )
-            
-            if not recipient_blockchain_valid:
-                print(f"Recipient blockchain validation failed: {recipient_message}")
-                return False, f'Transaction blocked: {recipient_message}', sender
-            
-            # Update user balances using Decimal values
-            cursor.execute('UPDATE users SET balance = balance - %s WHERE id = %s', (amount_val, sender['id']))
-            cursor.execute('UPDATE users SET balance = balance + %s WHERE id = %s', (amount_val, recipient['id']))
-            
-            # Record transaction in main transactions table
-            sql = '''INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location) VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s)'''
-            params = (tx_id, amount_val, payment_method, sender['id'], recipient['id'], note, tx_type, location)
-            print(f"SQL: {sql}\nPARAMS: {params}")
-            cursor.execute(sql, params)
-            
-            conn.commit()
-            
-            cursor.execute('SELECT * FROM users WHERE id = %s', (sender['id'],))
-            sender = cursor.fetchone()
-            
-            log_message = f"Transaction successful: id={tx_id}, amount={amount_val}, payment_method={payment_method}, sender_id={sender['id']}, receiver_id={recipient['id']}, note={note}, type={tx_type}, location={location}"
-            print(log_message)
-            
-            # Log to browser console via /log endpoint
-            try:
-                import requests
-                requests.post('http://localhost:5000/log', json={"message": log_message})
-            except Exception as e:
-                print(f"Failed to log to browser console: {e}")
-                
-            return True, f'Successfully sent {amount} to {recipient["first_name"]}.', sender
-            
+            },
+            transaction_id=tx_id
+        )
     except Exception as e:
-        conn.rollback()
         print(f"Exception in send_money: {e}")
         return False, 'Failed to send money: ' + str(e), None
-    finally:
-        conn.close()
+    
+    if not ok:
+        print(message)
+        return False, message, result['debit_user']
+    
+    sender = result['debit_user']
+    recipient = result['credit_user']
+    
+    log_message = f"Transaction successful: id={tx_id}, amount={amount_val}, payment_method={payment_method}, sender_id={sender['id']}, receiver_id={recipient['id']}, note={note}, type={tx_type}, location={location}"
+    print(log_message)
+    
+    # Hand off to the background event log; never blocks the transfer
+    event_log.emit(log_message)
+    
+    return True, f'Successfully sent {amount} to {recipient["first_name"]}.', sender
 
 def lookup_user_by_identifier(identifier):
     conn = current_app.get_db_connection()
@@ -145,148 +97,68 @@ def lookup_user_by_identifier(identifier):
         conn.close()
 
 def is_user_flagged_fraud(user_id):
-    conn = current_app.get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute('SELECT 1 FROM fraud_list WHERE reported_user_id = %s', (user_id,))
-            fraud = cursor.fetchone()
-        return bool(fraud)
-    finally:
-        conn.close()
+    return flagged_users.contains(user_id)
 
 def agent_add_money(agent_id, user_id, amount):
-    conn = current_app.get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            # Convert amount to Decimal for consistent calculations
-            amount_val = Decimal(str(amount))
-            
-            # Get current balances
-            cursor.execute('SELECT balance FROM users WHERE id = %s', (agent_id,))
-            agent = cursor.fetchone()
-            cursor.execute('SELECT balance FROM users WHERE id = %s', (user_id,))
-            user = cursor.fetchone()
-            
-            if not agent or not user:
-                return (None, "Agent or user not found")
-            
-            # Calculate new balances
-            new_agent_balance = agent['balance'] - amount_val
-            new_user_balance = user['balance'] + amount_val
-            
-            # Validate agent transaction with blockchain
-            agent_blockchain_valid, agent_message = process_transaction_with_blockchain(
-                agent_id,
-                -amount_val,  # Negative amount for agent
-                new_agent_balance,
-                "agent_add_money",
-                {
+        # Convert amount to Decimal for consistent calculations
+        amount_val = Decimal(str(amount))
+        ok, message, _ = execute_transfer(
+            agent_id, user_id, amount_val, 'agent_add', f'Agent {agent_id} added money', None, 'Deposit',
+            ledger={
+                'debit_method': "agent_add_money",
+                'debit_details': {
                     'recipient_id': user_id,
                     'note': f'Agent {agent_id} added money',
                     'type': 'agent_service'
-                }
-            )
-            
-            if not agent_blockchain_valid:
-                return (None, f'Agent transaction blocked: {agent_message}')
-            
-            # Validate user transaction with blockchain
-            user_blockchain_valid, user_message = process_transaction_with_blockchain(
-                user_id,
-                amount_val,   # Positive amount for user
-                new_user_balance,
-                "agent_receive_money",
-                {
+                },
+                'credit_method': "agent_receive_money",
+                'credit_details': {
                     'agent_id': agent_id,
                     'note': f'Received money from agent {agent_id}',
                     'type': 'agent_service'
                 }
-            )
-            
-            if not user_blockchain_valid:
-                return (None, f'User transaction blocked: {user_message}')
-            
-            # Update balances
-            cursor.execute('UPDATE users SET balance = balance - %s WHERE id = %s', (amount_val, agent_id))
-            cursor.execute('UPDATE users SET balance = balance + %s WHERE id = %s', (amount_val, user_id))
-            
-            # Record transaction
-            cursor.execute('''INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location) VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s)''',
-                (str(uuid.uuid4()), amount_val, 'agent_add', agent_id, user_id, f'Agent {agent_id} added money', 'Deposit', None))
-        conn.commit()
+            },
+            check_balance=False
+        )
+        if not ok:
+            if message in (RECIPIENT_NOT_FOUND, SENDER_NOT_FOUND):
+                return (None, "Agent or user not found")
+            return (None, message)
         return (f"Added {amount_val} to user (ID: {user_id})", None)
     except Exception as e:
-        conn.rollback()
         return (None, f"Failed to add money: {str(e)}")
-    finally:
-        conn.close()
 
 def agent_cash_out(agent_id, user_id, amount):
-    conn = current_app.get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            # Convert amount to Decimal for consistent calculations
-            amount_val = Decimal(str(amount))
-            
-            # Get current balances
-            cursor.execute('SELECT balance FROM users WHERE id = %s', (agent_id,))
-            agent = cursor.fetchone()
-            cursor.execute('SELECT balance FROM users WHERE id = %s', (user_id,))
-            user = cursor.fetchone()
-            
-            if not agent or not user:
-                return (None, "Agent or user not found")
-            
-            # Calculate new balances
-            new_agent_balance = agent['balance'] + amount_val
-            new_user_balance = user['balance'] - amount_val
-            
-            # Validate user transaction with blockchain
-            user_blockchain_valid, user_message = process_transaction_with_blockchain(
-                user_id,
-                -amount_val,  # Negative amount for user
-                new_user_balance,
-                "agent_cash_out",
-                {
+        # Convert amount to Decimal for consistent calculations
+        amount_val = Decimal(str(amount))
+        ok, message, _ = execute_transfer(
+            user_id, agent_id, amount_val, 'agent_cashout', f'Agent {agent_id} cashed out', None, 'Withdrawal',
+            ledger={
+                'debit_method': "agent_cash_out",
+                'debit_details': {
                     'agent_id': agent_id,
                     'note': f'Cashed out to agent {agent_id}',
                     'type': 'agent_service'
-                }
-            )
-            
-            if not user_blockchain_valid:
-                return (None, f'User transaction blocked: {user_message}')
-            
-            # Validate agent transaction with blockchain
-            agent_blockchain_valid, agent_message = process_transaction_with_blockchain(
-                agent_id,
-                amount_val,   # Positive amount for agent
-                new_agent_balance,
-                "agent_receive_cashout",
-                {
+                },
+                'credit_method': "agent_receive_cashout",
+                'credit_details': {
                     'user_id': user_id,
                     'note': f'Received cashout from user {user_id}',
                     'type': 'agent_service'
                 }
-            )
-            
-            if not agent_blockchain_valid:
-                return (None, f'Agent transaction blocked: {agent_message}')
-            
-            # Update balances
-            cursor.execute('UPDATE users SET balance = balance - %s WHERE id = %s', (amount_val, user_id))
-            cursor.execute('UPDATE users SET balance = balance + %s WHERE id = %s', (amount_val, agent_id))
-            
-            # Record transaction
-            cursor.execute('''INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location) VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s)''',
-                (str(uuid.uuid4()), amount_val, 'agent_cashout', user_id, agent_id, f'Agent {agent_id} cashed out', 'Withdrawal', None))
-        conn.commit()
+            },
+            check_balance=False
+        )
+        if not ok:
+            if message in (RECIPIENT_NOT_FOUND, SENDER_NOT_FOUND):
+                return (None, "Agent or user not found")
+            return (None, message)
         return (f"Cashed out {amount_val} from user (ID: {user_id})", None)
     except Exception as e:
-        conn.rollback()
         return (None, f"Failed to cash out: {str(e)}")
-    finally:
-        conn.close()
+
 def get_all_transactions(user_id):
     conn = current_app.get_db_connection()
     try:
@@ -309,7 +181,7 @@ def rollback_transaction(transaction_id, reason, admin_user_id=None):
         with conn.cursor() as cursor:
             # Get the original transaction
             cursor.execute('''
-                SELECT id, sender_id, receiver_id, amount, timestamp
+                SELECT id, sender_id, receiver_id, amount, timestamp, category
                 FROM transactions 
                 WHERE id = %s
             ''', (transaction_id,))
@@ -336,11 +208,14 @@ def rollback_transaction(transaction_id, reason, admin_user_id=None):
             
             # Create rollback transaction record
             rollback_id = str(uuid.uuid4())
+            rollback_note = f'ROLLBACK of {transaction_id}: {reason}'
+            rollback_category = categorize_expense(rollback_note)
             cursor.execute('''
-                INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location)
-                VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s)
+                INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location, category)
+                VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s)
             ''', (rollback_id, transaction['amount'], 'rollback', transaction['receiver_id'], transaction['sender_id'], 
-                  f'ROLLBACK of {transaction_id}: {reason}', 'Refund', None))
+                  rollback_note, 'Refund', None, rollback_category))
+            record_transaction_rollup(cursor, rollback_id)
             
             # Log the rollback only if admin_user_id is provided and exists
             if admin_user_id:
@@ -357,6 +232,10 @@ def rollback_transaction(transaction_id, reason, admin_user_id=None):
                     print(f"Failed to log rollback action: {log_error}")
             
             conn.commit()
+            # Month-to-date spend of both parties is re-read from SQL on the next check
+            spend_counters.invalidate(transaction['receiver_id'], [rollback_category])
+            spend_counters.invalidate(transaction['sender_id'], [transaction['category']],
+                                      transaction['timestamp'].strftime('%Y-%m'))
             return True, f"Transaction {transaction_id} successfully rolled back"
             
     except Exception as e:
@@ -0,0 +1,131 @@
+# Row-locked, single-transaction money movement between two users
+from flask import current_app
+import random
+import time
+import uuid
+from decimal import Decimal
+from app.db_pool import is_retryable_error
+from .blockchain_utils import process_transaction_with_blockchain
+from .block_appender import block_appender
+from .fraud_cache import flagged_users
+from .rollup_utils import record_transaction_rollup
+from .overspending_detector import categorize_expense
+from .spend_counters import spend_counters
+
+MAX_TRANSFER_ATTEMPTS = 3
+
+RECIPIENT_NOT_FOUND = 'Recipient not found.'
+SENDER_NOT_FOUND = 'Sender not found.'
+INSUFFICIENT_BALANCE = 'Insufficient balance.'
+
+
+class TransferRejected(Exception):
+    """A business rule rejected the transfer; nothing was written"""
+
+
+def _lock_users(cursor, user_ids):
+    """Lock user rows with FOR UPDATE in ascending id order so concurrent
+    transfers between the same pair always queue instead of deadlocking."""
+    locked = {}
+    for user_id in sorted(set(user_ids)):
+        cursor.execute('SELECT * FROM users WHERE id = %s FOR UPDATE', (user_id,))
+        row = cursor.fetchone()
+        if row:
+            locked[user_id] = row
+    return locked
+
+
+def _apply_transfer(cursor, debit_id, credit_id, amount, payment_method, note, location,
+                    tx_type, ledger, check_balance, tx_id, category, flagged):
+    users = _lock_users(cursor, (debit_id, credit_id))
+    debit_user = users.get(debit_id)
+    credit_user = users.get(credit_id)
+
+    if not credit_user:
+        raise TransferRejected(RECIPIENT_NOT_FOUND)
+    if not debit_user:
+        raise TransferRejected(SENDER_NOT_FOUND)
+    if check_balance and debit_user['balance'] < amount:
+        raise TransferRejected(INSUFFICIENT_BALANCE)
+
+    new_debit_balance = debit_user['balance'] - amount
+    new_credit_balance = credit_user['balance'] + amount
+
+    # Ledger entries join this transaction: they commit or roll back with the balances
+    for user_id, delta, new_balance, method, details in (
+        (debit_id, -amount, new_debit_balance, ledger['debit_method'], ledger['debit_details']),
+        (credit_id, amount, new_credit_balance, ledger['credit_method'], ledger['credit_details']),
+    ):
+        valid, message = process_transaction_with_blockchain(
+            user_id, delta, new_balance, method, details, cursor=cursor, flagged=flagged
+        )
+        if not valid:
+            raise TransferRejected(f'Transaction blocked: {message}')
+
+    cursor.execute('UPDATE users SET balance = balance - %s WHERE id = %s', (amount, debit_id))
+    cursor.execute('UPDATE users SET balance = balance + %s WHERE id = %s', (amount, credit_id))
+    cursor.execute('''INSERT INTO transactions (id, amount, payment_method, timestamp, sender_id, receiver_id, note, type, location, category) VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s)''',
+        (tx_id, amount, payment_method, debit_id, credit_id, note, tx_type, location, category))
+    record_transaction_rollup(cursor, tx_id)
+
+    debit_user = dict(debit_user, balance=new_debit_balance)
+    credit_user = dict(credit_user, balance=new_credit_balance)
+    return debit_user, credit_user
+
+
+def execute_transfer(debit_id, credit_id, amount, payment_method, note, location, tx_type,
+                     ledger, check_balance=True, transaction_id=None,
+                     max_attempts=MAX_TRANSFER_ATTEMPTS):
+    """
+    Move ``amount`` from ``debit_id`` to ``credit_id`` in one DB transaction.
+
+    Both user rows are locked in deterministic order, then the ledger entries,
+    balance updates and the ``transactions`` row are written and committed once.
+    The ledger entries are chained into blocks afterwards by the block appender.
+    Deadlocks and lock-wait timeouts are retried with jittered backoff.
+
+    ``ledger`` holds ``debit_method``/``credit_method`` and
+    ``debit_details``/``credit_details`` for the two blockchain entries.
+
+    Returns (success, message, result) where result carries ``transaction_id``
+    and the post-transfer ``debit_user``/``credit_user`` rows (the pre-transfer
+    rows on rejection, when they could be read).
+    """
+    amount = Decimal(str(amount))
+    tx_id = transaction_id or str(uuid.uuid4())
+    category = categorize_expense(note)
+    conn = current_app.get_db_connection()
+    try:
+        for attempt in range(1, max_attempts + 1):
+            # Fraud flags written in this attempt reach the cache only once it commits
+            flagged = []
+            try:
+                with conn.cursor() as cursor:
+                    debit_user, credit_user = _apply_transfer(
+                        cursor, debit_id, credit_id, amount, payment_method, note,
+                        location, tx_type, ledger, check_balance, tx_id, category, flagged
+                    )
+                conn.commit()
+                flagged_users.add(flagged)
+                block_appender.notify()
+                spend_counters.add(debit_id, category, amount)
+                return True, 'Transfer completed', {
+                    'transaction_id': tx_id,
+                    'debit_user': debit_user,
+                    'credit_user': credit_user,
+                    'attempts': attempt
+                }
+            except TransferRejected as e:
+                conn.rollback()
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT * FROM users WHERE id = %s', (debit_id,))
+                    debit_user = cursor.fetchone()
+                return False, str(e), {'transaction_id': None, 'debit_user': debit_user, 'credit_user': None}
+            except Exception as e:
+                conn.rollback()
+                if not is_retryable_error(e) or attempt == max_attempts:
+                    raise
+                print(f"Transfer {tx_id} hit lock conflict (attempt {attempt}): {e}; retrying")
+                time.sleep(random.uniform(0, 0.02 * 2 ** attempt))
+    finally:
+        conn.close()
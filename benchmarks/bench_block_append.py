@@ -0,0 +1,150 @@
+"""
+Benchmark block appends under concurrent ledger writers.
+
+N writer threads record ledger entries through process_transaction_with_blockchain
+(each for its own throwaway user) while the block appender chains them. Reports
+appends/sec for each appender batch size and checks that the new part of the
+chain is strictly linear: contiguous indexes, no duplicates, and every block's
+previous_hash matching its predecessor.
+
+Usage:
+    python benchmarks/bench_block_append.py [--writers 1 4 16] [--entries 200] [--batch-sizes 1 500]
+
+Requires a reachable MySQL configured through the usual MYSQL_* variables. The
+throwaway users and their ledger rows are deleted afterwards.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.utils.block_appender import block_appender
+from app.utils.blockchain_utils import process_transaction_with_blockchain
+
+
+def query_one(app, sql, args=()):
+    with app.app_context():
+        conn = app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, args)
+                return cursor.fetchone()
+        finally:
+            conn.close()
+
+
+def create_users(app, count):
+    user_ids = [str(uuid.uuid4()) for _ in range(count)]
+    with app.app_context():
+        conn = app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.executemany('INSERT INTO users (id, first_name, last_name, balance, joining_date) '
+                                   'VALUES (%s, %s, %s, 0, CURDATE())',
+                                   [(user_id, 'Bench', 'Appender') for user_id in user_ids])
+            conn.commit()
+        finally:
+            conn.close()
+    return user_ids
+
+
+def delete_users(app, user_ids):
+    with app.app_context():
+        conn = app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(user_ids))
+                cursor.execute(f'DELETE FROM users WHERE id IN ({placeholders})', tuple(user_ids))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def check_linear(app, after_index):
+    stats = query_one(app, '''
+        SELECT COUNT(*) AS blocks, COUNT(DISTINCT `index`) AS distinct_indexes,
+               MIN(`index`) AS lo, MAX(`index`) AS hi
+        FROM blockchain WHERE `index` > %s''', (after_index,))
+    broken = query_one(app, '''
+        SELECT COUNT(*) AS n FROM blockchain b
+        JOIN blockchain p ON p.`index` = b.`index` - 1
+        WHERE b.`index` > %s AND b.previous_hash <> p.hash''', (after_index,))['n']
+    contiguous = (stats['blocks'] == stats['distinct_indexes']
+                  and (not stats['blocks'] or stats['hi'] - stats['lo'] + 1 == stats['blocks']))
+    return contiguous and broken == 0, stats, broken
+
+
+def run(app, writers, entries, batch_size):
+    block_appender.configure(batch_size=batch_size)
+    user_ids = create_users(app, writers)
+    tip = query_one(app, 'SELECT last_index FROM blockchain_tip WHERE id = 1')
+    start_index = tip['last_index'] if tip else -1
+    before = block_appender.metrics()
+
+    def writer(user_id):
+        balance = Decimal('0.00')
+        for _ in range(entries):
+            balance += 1
+            with app.app_context():
+                process_transaction_with_blockchain(user_id, Decimal('1.00'), balance, 'bench', {})
+
+    threads = [threading.Thread(target=writer, args=(user_id,)) for user_id in user_ids]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    written = time.perf_counter() - started
+
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    while query_one(app, f'SELECT COUNT(*) AS n FROM blockchain_transactions '
+                         f'WHERE block_index IS NULL AND user_id IN ({placeholders})', tuple(user_ids))['n']:
+        block_appender.notify()
+        time.sleep(0.05)
+    chained = time.perf_counter() - started
+
+    after = block_appender.metrics()
+    appended = after['appended'] - before['appended']
+    batches = after['batches'] - before['batches']
+    busy = after['busy_time'] - before['busy_time']
+    linear, stats, broken = check_linear(app, start_index)
+    delete_users(app, user_ids)
+
+    total = writers * entries
+    print(f"writers={writers:<3} batch={batch_size:<4} entries={total:<6} "
+          f"write={written:6.2f}s chained={chained:6.2f}s "
+          f"{total / chained:8.1f} appends/s (appender {appended / busy if busy else 0:8.1f}/s busy, "
+          f"avg batch {appended / batches if batches else 0:.1f}) "
+          f"linear={'yes' if linear else 'NO'}")
+    if not linear:
+        print(f"  chain stats: {stats}, broken links: {broken}")
+    return linear
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Block appends/sec under concurrent writers')
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--entries', type=int, default=200, help='Ledger entries per writer')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 500],
+                        help='Appender batch sizes to compare (1 = one block per commit)')
+    args = parser.parse_args()
+
+    app = create_app()
+    ok = True
+    for batch_size in args.batch_sizes:
+        for writers in args.writers:
+            ok = run(app, writers, args.entries, batch_size) and ok
+    if not ok:
+        print('FAIL: chain forked')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Microbenchmark block hashing: JSON encodings vs. the canonical binary encoding.
+
+Hashes the same synthetic blocks and ledger entries with each encoding and
+reports hashes/sec:
+- ledger-json:   per-entry Block hash (hash_version 1)
+- header-json:   Merkle batch header (hash_version 2)
+- header-binary: Merkle batch header (hash_version 3)
+- leaf-json:     Merkle leaf of a ledger entry (hash_version 2)
+- leaf-binary:   Merkle leaf of a ledger entry (hash_version 3)
+
+Usage:
+    python benchmarks/bench_block_hashing.py [--blocks 1000000]
+
+Needs no database.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.blockchain_utils import (
+    BINARY_MERKLE_HASH_VERSION, MERKLE_HASH_VERSION, Block, MerkleBlock,
+    _entry_leaf_hash, _ledger_block_data
+)
+
+# Synthetic rows are drawn from a fixed pool so generating them stays out of the timings
+POOL_SIZE = 4096
+
+
+def synthetic_pool(seed=11):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    pool = []
+    for i in range(POOL_SIZE):
+        pool.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'user_id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'amount': Decimal(rng.randint(-500000, 500000)).scaleb(-2),
+            'balance': Decimal(rng.randint(0, 10 ** 9)).scaleb(-2),
+            'method': rng.choice(['transfer', 'deposit', 'withdrawal', 'payment']),
+            'timestamp': start + timedelta(seconds=i * 37),
+            'hash': hashlib.sha256(str(i).encode()).hexdigest(),
+        })
+    return pool
+
+
+def ledger_json(i, row):
+    return Block(i, row['timestamp'], _ledger_block_data(row['user_id'], row['amount'], row['balance'],
+                                                         row['method'], row['timestamp']),
+                 row['hash'], row['id']).hash
+
+
+def header_json(i, row):
+    return MerkleBlock(i, row['timestamp'], row['hash'], 500, row['hash'], MERKLE_HASH_VERSION).hash
+
+
+def header_binary(i, row):
+    return MerkleBlock(i, row['timestamp'], row['hash'], 500, row['hash'], BINARY_MERKLE_HASH_VERSION).hash
+
+
+def leaf_json(i, row):
+    return _entry_leaf_hash(row['id'], row['user_id'], row['amount'], row['balance'], row['method'],
+                            row['timestamp'], MERKLE_HASH_VERSION)
+
+
+def leaf_binary(i, row):
+    return _entry_leaf_hash(row['id'], row['user_id'], row['amount'], row['balance'], row['method'],
+                            row['timestamp'], BINARY_MERKLE_HASH_VERSION)
+
+
+CASES = [
+    ('ledger-json', ledger_json),
+    ('header-json', header_json),
+    ('header-binary', header_binary),
+    ('leaf-json', leaf_json),
+    ('leaf-binary', leaf_binary),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Block hashes/sec per encoding')
+    parser.add_argument('--blocks', type=int, default=1000000)
+    args = parser.parse_args()
+
+    pool = synthetic_pool()
+    mask = POOL_SIZE - 1
+    print(f"{'encoding':<14} {'blocks':>9} {'seconds':>9} {'hashes/sec':>12}")
+    rates = {}
+    for name, fn in CASES:
+        start = time.perf_counter()
+        for i in range(args.blocks):
+            fn(i, pool[i & mask])
+        elapsed = time.perf_counter() - start
+        rates[name] = args.blocks / elapsed
+        print(f"{name:<14} {args.blocks:>9} {elapsed:>9.2f} {rates[name]:>12,.0f}")
+    print(f"header speedup {rates['header-binary'] / rates['header-json']:.2f}x, "
+          f"leaf speedup {rates['leaf-binary'] / rates['leaf-json']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
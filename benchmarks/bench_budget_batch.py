@@ -0,0 +1,101 @@
+"""
+Benchmark AI budget scoring: one user at a time vs. one batch.
+
+Trains the budget models on synthetic data (streamlined_train_budget_models),
+turns synthetic records into expense-habit rows, and scores them:
+- per-user:  a feature vector and a scaler transform + forest predict per
+             category for each user (the old generate_budget_for_user path)
+- batch:     one feature matrix and one transform + predict per category
+             (BudgetMLGenerator.generate_budgets_for_users)
+
+Checks both give the same amounts and reports users/sec.
+
+Usage:
+    python benchmarks/bench_budget_batch.py [--users 500] [--train-records 3000] [--trees 100]
+
+Needs no database.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.ml_budget_generator import EXPENSE_CATEGORIES, BudgetMLGenerator
+from app.utils.model_registry import ModelRegistry
+from streamlined_train_budget_models import StreamlinedBudgetMLTrainer
+
+# The scalers were fitted on DataFrames; scoring passes plain arrays
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def trained_generator(records, trees):
+    trainer = StreamlinedBudgetMLTrainer()
+    df = trainer.preprocess_data(trainer.generate_synthetic_data(num_records=records))
+    targets = trainer.create_target_variables(df)
+    trainer.train_models(df, targets, n_estimators=trees)
+
+    registry = ModelRegistry(tempfile.mkdtemp(prefix='budget-models-'))
+    registry.publish(trainer.models, trainer.scalers, trainer.label_encoders)
+    return BudgetMLGenerator(registry)
+
+
+def habit_rows(count, seed=3):
+    df = StreamlinedBudgetMLTrainer().generate_synthetic_data(num_records=count, seed=seed)
+    rows = []
+    for record in df.to_dict('records'):
+        record['earning_member'] = bool(record['earning_member'])
+        rows.append(record)
+    return rows
+
+
+def per_user(generator, rows):
+    results = []
+    for row in rows:
+        features = generator._prepare_user_features(row)
+        amounts = {}
+        for category in EXPENSE_CATEGORIES:
+            if category in generator.models:
+                scaled = generator.scalers[category].transform([features])
+                amounts[category] = max(0, generator.models[category].predict(scaled)[0])
+        results.append(amounts)
+    return results
+
+
+def batch(generator, rows):
+    predictions = generator._predict_categories(generator._prepare_feature_matrix(rows))
+    return [{category: values[i] for category, values in predictions.items()} for i in range(len(rows))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-user vs batch budget scoring')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--train-records', type=int, default=3000)
+    parser.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    generator = trained_generator(args.train_records, args.trees)
+    rows = habit_rows(args.users)
+
+    start = time.perf_counter()
+    expected = per_user(generator, rows)
+    per_user_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = batch(generator, rows)
+    batch_elapsed = time.perf_counter() - start
+
+    worst = max(abs(a[c] - e[c]) for a, e in zip(actual, expected) for c in e)
+    print(f"max difference between paths: {worst:.6f}")
+    print(f"{'path':<10} {'users':>7} {'seconds':>9} {'users/sec':>11}")
+    for name, elapsed in (('per-user', per_user_elapsed), ('batch', batch_elapsed)):
+        print(f"{name:<10} {len(rows):>7} {elapsed:>9.2f} {len(rows) / elapsed:>11,.0f}")
+    print(f"speedup {per_user_elapsed / batch_elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark the distilled budget lookup table (app.utils.budget_lookup)
+against the forests it was distilled from.
+
+Trains per-category models on synthetic records, then distills them using a
+synthetic habit population in place of the user_expense_habit table.
+Held-out synthetic users are then predicted both ways. Synthetic incomes
+come in six fixed values. Unless --bracket-incomes is given, the training
+records, the population and the held-out users get incomes spread
+uniformly across each value's range, with costs scaled along, as free-text
+incomes would be. Reports:
+- distillation time, table size and the share of cells within the error bound;
+- the lookup hit rate;
+- per-user latency of a lookup vs. a one-row forest prediction;
+- the total-budget error of hits relative to income (observed vs. the bound).
+
+Usage:
+    python benchmarks/bench_budget_lookup.py [--train-records 10000] [--population 5000] [--users 2000] [--samples 8] [--bracket-incomes]
+
+Needs no database.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.budget_lookup import DEFAULT_INCOME_KNOTS, DEFAULT_MAX_ERROR, SHARE_FIELDS, distill_budget_table
+from app.utils.ml_budget_generator import BudgetMLGenerator
+from app.utils.model_registry import ModelRegistry
+from streamlined_train_budget_models import StreamlinedBudgetMLTrainer
+
+# Training logs every category; the scalers were fitted on DataFrames and scoring passes arrays
+logging.disable(logging.INFO)
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+# Income range behind each synthetic income value
+BRACKET_RANGES = {15000: (10000, 20000), 30000: (20000, 40000), 50000: (40000, 60000),
+                  70000: (60000, 80000), 90000: (80000, 100000), 120000: (100000, 150000)}
+
+
+def synthetic_records(count, seed, continuous):
+    df = StreamlinedBudgetMLTrainer().generate_synthetic_data(num_records=count, seed=seed)
+    if continuous:
+        rng = np.random.default_rng(seed)
+        bounds = np.array([BRACKET_RANGES[int(income)] for income in df['monthly_income_numeric']])
+        income = rng.uniform(bounds[:, 0], bounds[:, 1])
+        scale = income / df['monthly_income_numeric']
+        for field in [field for fields in SHARE_FIELDS for field in fields]:
+            df[field] *= scale
+        df['monthly_income_numeric'] = income
+    return df
+
+
+def trained_generator(records, trees, continuous):
+    trainer = StreamlinedBudgetMLTrainer()
+    np.random.seed(5)
+    df = trainer.preprocess_data(synthetic_records(records, 5, continuous))
+    trainer.train_models(df, trainer.create_target_variables(df), n_estimators=trees)
+    registry = ModelRegistry(tempfile.mkdtemp(prefix='budget-models-'))
+    registry.publish(trainer.models, trainer.scalers, trainer.label_encoders)
+    return BudgetMLGenerator(registry)
+
+
+def habit_rows(count, seed, continuous):
+    rows = []
+    for record in synthetic_records(count, seed, continuous).to_dict('records'):
+        record['earning_member'] = bool(record['earning_member'])
+        rows.append(record)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distilled lookup table vs forest budget predictions')
+    parser.add_argument('--train-records', type=int, default=10000)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--population', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=8)
+    parser.add_argument('--knots', type=int, default=5)
+    parser.add_argument('--income-knots', type=int, default=DEFAULT_INCOME_KNOTS)
+    parser.add_argument('--bracket-incomes', action='store_true', help='Keep the six fixed synthetic incomes')
+    parser.add_argument('--max-error', type=float, default=DEFAULT_MAX_ERROR)
+    args = parser.parse_args()
+
+    continuous = not args.bracket_incomes
+    generator = trained_generator(args.train_records, args.trees, continuous)
+    start = time.perf_counter()
+    table = distill_budget_table(generator, habit_rows(args.population, seed=3, continuous=continuous),
+                                 samples=args.samples, knots=args.knots, income_knots=args.income_knots)
+    print(f"distilled {table.total_errors.size} cells x {'x'.join(map(str, table.grid_shape))} knots in "
+          f"{time.perf_counter() - start:.1f}s, {table.values.nbytes / 1e6:.2f} MB, "
+          f"{table.coverage(args.max_error):.1%} of cells within {args.max_error:.1%} of income")
+
+    users = habit_rows(args.users, seed=4, continuous=continuous)
+    hits, lookup_times, forest_times, errors = 0, [], [], []
+    for user in users:
+        start = time.perf_counter()
+        distilled = table.predict(user, args.max_error)
+        lookup_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        forest = generator._predict_categories(generator._prepare_feature_matrix([user]))
+        forest_times.append(time.perf_counter() - start)
+
+        if distilled is not None:
+            hits += 1
+            total = sum(float(values[0]) for values in forest.values())
+            errors.append(abs(sum(distilled.values()) - total) / user['monthly_income_numeric'])
+
+    lookup_us = np.median(lookup_times) * 1e6
+    forest_us = np.median(forest_times) * 1e6
+    print(f"hit rate: {hits / len(users):.1%} of {len(users)} users")
+    print(f"latency per user: lookup {lookup_us:.1f} us, forest {forest_us:.1f} us ({forest_us / lookup_us:.0f}x)")
+    if errors:
+        errors = np.array(errors)
+        print(f"total budget error of hits / income: median {np.median(errors):.2%}, "
+              f"p95 {np.percentile(errors, 95):.2%}, within bound {np.mean(errors <= args.max_error):.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark expense categorization: per-keyword regex search vs. the indexed
+single-pass classifier in app.utils.overspending_detector.
+
+Generates synthetic expense notes, checks both classifiers agree on a
+sample, then reports:
+- per-call latency of the old per-keyword classifier (on --legacy-notes notes)
+- per-call latency of categorize_expense
+- throughput of categorize_expenses over --notes notes
+
+Usage:
+    python benchmarks/bench_categorize.py [--notes 1000000] [--legacy-notes 20000]
+
+Needs no database.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.overspending_detector import (
+    CATEGORY_KEYWORDS, EXPENSE_CATEGORIES, categorize_expense, categorize_expenses
+)
+
+FILLER = ['paid', 'for', 'the', 'monthly', 'weekly', 'at', 'with', 'friends', 'new', 'bill',
+          'order', 'online', 'cash', 'split', 'quick', 'refund', 'downtown', 'sat', 'fee']
+
+
+def legacy_categorize_expense(description):
+    """The classifier before indexing: one regex search per keyword per call"""
+    if not description or not isinstance(description, str):
+        return 'Other'
+    description_lower = description.lower()
+    category_scores = {}
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        score = 0
+        for keyword in keywords:
+            if re.search(r'\b' + re.escape(keyword.lower()) + r'\b', description_lower):
+                score += len(keyword.split())
+        if score > 0:
+            category_scores[category] = score
+    if category_scores:
+        return max(category_scores, key=category_scores.get)
+    return 'Other'
+
+
+def synthetic_notes(count, seed=7):
+    rng = random.Random(seed)
+    keywords = [keyword for words in CATEGORY_KEYWORDS.values() for keyword in words]
+    notes = []
+    for _ in range(count):
+        words = rng.sample(FILLER, rng.randint(1, 4))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+        note = ' '.join(words)
+        notes.append(note.title() if rng.random() < 0.3 else note)
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Expense categorization latency and throughput')
+    parser.add_argument('--notes', type=int, default=1000000)
+    parser.add_argument('--legacy-notes', type=int, default=20000)
+    args = parser.parse_args()
+
+    notes = synthetic_notes(args.notes)
+    # Bare category names are left out: they now map to themselves by design
+    sample = [note for note in notes[:args.legacy_notes] if note not in EXPENSE_CATEGORIES] + ['', None]
+    mismatches = [note for note in sample if legacy_categorize_expense(note) != categorize_expense(note)]
+    print(f"agreement on {len(sample)} notes: {len(sample) - len(mismatches)}/{len(sample)}")
+    for note in mismatches[:5]:
+        print(f"  mismatch: {note!r}: {legacy_categorize_expense(note)} vs {categorize_expense(note)}")
+
+    legacy = notes[:args.legacy_notes]
+    start = time.perf_counter()
+    for note in legacy:
+        legacy_categorize_expense(note)
+    legacy_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for note in legacy:
+        categorize_expense(note)
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    categorize_expenses(notes)
+    batch_elapsed = time.perf_counter() - start
+
+    print(f"{'classifier':<20} {'notes':>9} {'seconds':>9} {'us/note':>9} {'notes/sec':>12}")
+    for name, count, elapsed in (('legacy per-keyword', len(legacy), legacy_elapsed),
+                                 ('categorize_expense', len(legacy), single_elapsed),
+                                 ('categorize_expenses', len(notes), batch_elapsed)):
+        print(f"{name:<20} {count:>9} {elapsed:>9.2f} {elapsed / count * 1e6:>9.1f} {count / elapsed:>12,.0f}")
+    print(f"per-call speedup {legacy_elapsed / single_elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark transfer latency as a user's blockchain history grows.
+
+Creates two throwaway users, grows the sender's ledger to each requested size
+with synthetic (valid) blocks, and times send_money, which verifies only the
+blocks appended since the sender's checkpoint. The cost of a full from-genesis
+verification of the same history is printed alongside for comparison.
+
+Usage:
+    python benchmarks/bench_chain_verification.py [--sizes 10 100 1000 10000 100000] [--transfers 20]
+
+Requires a reachable MySQL configured through the usual MYSQL_* variables. The
+throwaway users and their ledger rows are deleted afterwards unless --keep is given.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.utils.block_appender import block_appender
+from app.utils.blockchain_utils import _verify_user_chain
+from app.utils.transaction_utils import send_money
+
+START_BALANCE = Decimal('1000000.00')
+SEED_CHUNK = 5000
+
+
+def create_user(cursor, label):
+    user_id = str(uuid.uuid4())
+    cursor.execute('INSERT INTO users (id, first_name, last_name, balance, joining_date) '
+                   'VALUES (%s, %s, %s, %s, CURDATE())',
+                   (user_id, 'Bench', label, START_BALANCE))
+    return user_id
+
+
+def count_blocks(cursor, user_id):
+    cursor.execute('SELECT COUNT(*) AS n FROM blockchain_transactions WHERE user_id = %s', (user_id,))
+    return cursor.fetchone()['n']
+
+
+def seed_history(conn, user_id, count):
+    """Record ``count`` valid +1/-1 ledger entries that leave the balance
+    unchanged, then chain them through the block appender"""
+    count -= count % 2
+    if count <= 0:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT balance FROM users WHERE id = %s', (user_id,))
+        balance = Decimal(str(cursor.fetchone()['balance']))
+        timestamp = datetime.now().replace(microsecond=0)
+
+        entries = []
+        for i in range(count):
+            amount = Decimal('1.00') if i % 2 == 0 else Decimal('-1.00')
+            entry_balance = balance + 1 if i % 2 == 0 else balance
+            entries.append((str(uuid.uuid4()), user_id, amount, entry_balance, 'bench', timestamp))
+            if len(entries) >= SEED_CHUNK or i == count - 1:
+                cursor.executemany('INSERT INTO blockchain_transactions '
+                                   '(id, user_id, amount, current_balance, method, timestamp) '
+                                   'VALUES (%s, %s, %s, %s, %s, %s)', entries)
+                conn.commit()
+                entries = []
+    block_appender.append_pending()
+
+
+def timed_transfer(app, sender, recipient):
+    start = time.perf_counter()
+    with app.app_context():
+        ok, message, _ = send_money(sender, recipient, 1, 'bench', 'chain-verification bench', None, 'Transfer')
+    elapsed = (time.perf_counter() - start) * 1000
+    if not ok:
+        raise RuntimeError(f'transfer failed: {message}')
+    return elapsed
+
+
+def full_verify_ms(conn, user_id):
+    with conn.cursor() as cursor:
+        start = time.perf_counter()
+        errors, _, _ = _verify_user_chain(cursor, user_id)
+        elapsed = (time.perf_counter() - start) * 1000
+    if errors:
+        raise RuntimeError(f'history failed verification: {errors[0]}')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transfer latency vs. ledger history size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--transfers', type=int, default=20, help='Timed transfers per size')
+    parser.add_argument('--keep', action='store_true', help='Keep the throwaway users and ledger rows')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        conn = app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sender = create_user(cursor, 'Sender')
+                recipient = create_user(cursor, 'Recipient')
+            conn.commit()
+
+            print(f"{'blocks':>8} {'catch-up':>10} {'p50':>9} {'p95':>9} {'full verify':>12}")
+            for size in sorted(args.sizes):
+                with conn.cursor() as cursor:
+                    existing = count_blocks(cursor, sender)
+                seed_history(conn, sender, size - existing)
+
+                # First transfer verifies the freshly seeded blocks and moves the checkpoint
+                catch_up = timed_transfer(app, sender, recipient)
+                timings = sorted(timed_transfer(app, sender, recipient) for _ in range(args.transfers))
+                p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+
+                with conn.cursor() as cursor:
+                    blocks = count_blocks(cursor, sender)
+                full = full_verify_ms(conn, sender)
+                print(f"{blocks:>8} {catch_up:>8.2f}ms {statistics.median(timings):>7.2f}ms "
+                      f"{p95:>7.2f}ms {full:>10.2f}ms")
+        finally:
+            if not args.keep and 'sender' in locals():
+                with conn.cursor() as cursor:
+                    cursor.execute('DELETE FROM users WHERE id IN (%s, %s)', (sender, recipient))
+                conn.commit()
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
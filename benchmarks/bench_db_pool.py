@@ -0,0 +1,69 @@
+"""
+Benchmark /dashboard latency with and without the MySQL connection pool.
+
+Usage:
+    python benchmarks/bench_db_pool.py --user-id <USER_ID> [--requests 200]
+
+Requires a reachable MySQL configured through the usual MYSQL_* variables.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+
+
+def run(app, user_id, num_requests):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    # Warm-up request so template compilation is not measured
+    client.get('/dashboard')
+
+    timings = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        response = client.get('/dashboard')
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'/dashboard returned {response.status_code}')
+    return timings
+
+
+def summarize(label, timings):
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{label:<10} mean={statistics.mean(timings):8.2f}ms  "
+          f"p50={statistics.median(timings):8.2f}ms  p95={p95:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--user-id', required=True, help='User to render the dashboard for')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+    pooled = run(app, args.user_id, args.requests)
+    metrics = app.db_pool.metrics() if app.db_pool else {}
+
+    app.db_pool.close_all() if app.db_pool else None
+    app.db_pool = None  # get_db_connection() falls back to a fresh connect per call
+    unpooled = run(app, args.user_id, args.requests)
+
+    summarize('no pool', unpooled)
+    summarize('pooled', pooled)
+    if metrics:
+        print(f"pool: checkouts={metrics['checkouts']} creations={metrics['creations']} "
+              f"wait_avg={metrics['wait_time_avg'] * 1000:.3f}ms "
+              f"wait_max={metrics['wait_time_max'] * 1000:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark budget scoring with sklearn's forests vs. the flattened NumPy
+evaluator in app.utils.forest_compiler.
+
+Trains a budget model kind on synthetic records, then for each batch size
+scores the same rows with sklearn (BudgetMLGenerator(compiled=False)), with
+the compiled forests, and with the generator's default (compiled only up to
+COMPILED_MAX_ROWS rows). Checks that sklearn and compiled amounts are
+identical (exit status 1 if not) and reports the latency per call.
+
+Usage:
+    python benchmarks/bench_forest_compiler.py [--batch-sizes 1 100 100000] [--trees 100] [--kind per_category]
+
+Needs no database.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.forest_compiler import COMPILED_MAX_ROWS, compile_bundle
+from app.utils.ml_budget_generator import EXPENSE_CATEGORIES, FEATURE_COLUMNS, BudgetMLGenerator
+from app.utils.model_registry import ModelRegistry
+from streamlined_train_budget_models import StreamlinedBudgetMLTrainer
+
+# Training logs every category; the scalers were fitted on DataFrames and scoring passes arrays
+logging.disable(logging.INFO)
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def trained_registry(kind, records, trees):
+    trainer = StreamlinedBudgetMLTrainer()
+    np.random.seed(5)
+    df = trainer.preprocess_data(trainer.generate_synthetic_data(records, seed=5))
+    trainer.train_models(df, trainer.create_target_variables(df), n_estimators=trees, kind=kind)
+    registry = ModelRegistry(tempfile.mkdtemp(prefix='budget-models-'))
+    registry.publish(trainer.models, trainer.scalers, trainer.label_encoders)
+    return registry, trainer
+
+
+def feature_rows(trainer, count):
+    df = trainer.preprocess_data(trainer.generate_synthetic_data(min(count, 200000), seed=6))
+    df['earning_member'] = df['earning_member'].astype(int)
+    return np.resize(df[FEATURE_COLUMNS].to_numpy(dtype=float), (count, len(FEATURE_COLUMNS)))
+
+
+def timed(predict, rows, min_seconds=1.0):
+    """(predictions, seconds per call) over enough repeats to fill min_seconds"""
+    calls, start = 0, time.perf_counter()
+    while True:
+        predictions = predict(rows)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return predictions, elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='sklearn vs compiled forest scoring latency')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 100000])
+    parser.add_argument('--train-records', type=int, default=10000)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--kind', choices=['per_category', 'multi_forest'], default='per_category')
+    args = parser.parse_args()
+
+    registry, trainer = trained_registry(args.kind, args.train_records, args.trees)
+    sklearn_path = BudgetMLGenerator(registry, compiled=False)
+    default_path = BudgetMLGenerator(registry)
+
+    start = time.perf_counter()
+    compiled = compile_bundle(registry.current(), EXPENSE_CATEGORIES)
+    forests = compiled.forests
+    print(f"compiled {len(forests.roots)} trees, {len(forests.feature):,} nodes, depth {forests.depth} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    def compiled_path(rows):
+        return {category: np.maximum(0, values) for category, values in compiled.predict_categories(rows).items()}
+
+    mismatched = False
+    print(f"{'batch':>8} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8} {'default ms':>11} {'max diff':>9}")
+    for size in args.batch_sizes:
+        rows = feature_rows(trainer, size)
+        expected, sklearn_seconds = timed(sklearn_path._predict_categories, rows)
+        actual, compiled_seconds = timed(compiled_path, rows)
+        _, default_seconds = timed(default_path._predict_categories, rows)
+        identical = expected.keys() == actual.keys() and all(
+            np.array_equal(expected[category], actual[category]) for category in expected)
+        worst = max(float(np.max(np.abs(expected[category] - actual[category]))) for category in expected)
+        mismatched |= not identical
+        print(f"{size:>8} {sklearn_seconds * 1e3:>11.3f} {compiled_seconds * 1e3:>12.3f} "
+              f"{sklearn_seconds / compiled_seconds:>7.1f}x {default_seconds * 1e3:>11.3f} {worst:>9.2g}")
+    print(f"default: compiled up to {COMPILED_MAX_ROWS} rows, sklearn above")
+    print('parity: identical' if not mismatched else 'parity: MISMATCH')
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == '__main__':
+    main()
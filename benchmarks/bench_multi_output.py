@@ -0,0 +1,107 @@
+"""
+Benchmark the budget model kinds (app.utils.multi_output_budget.MODEL_KINDS):
+- per_category:    a scaler and a forest per category (the baseline)
+- multi_forest:    one scaler and one multi-output forest
+- multi_boosting:  one scaler and a gradient-boosted model per category
+
+Trains each kind on the same synthetic records, publishes it to a scratch
+registry and scores it through BudgetMLGenerator._predict_categories.
+Reports training time, pickled size, mean MAE / R2 over the categories on a
+separate synthetic test set, single-user latency and batch throughput.
+
+Usage:
+    python benchmarks/bench_multi_output.py [--train-records 10000] [--test-records 5000] [--trees 100] [--batch 10000]
+
+Needs no database.
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, r2_score
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.ml_budget_generator import FEATURE_COLUMNS, BudgetMLGenerator
+from app.utils.model_registry import ModelRegistry
+from app.utils.multi_output_budget import MODEL_KINDS
+from streamlined_train_budget_models import StreamlinedBudgetMLTrainer
+
+# Training logs every category; the scalers were fitted on DataFrames and scoring passes arrays
+logging.disable(logging.INFO)
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def synthetic_set(trainer, records, seed):
+    np.random.seed(seed)  # create_target_variables adds noise from the global generator
+    df = trainer.preprocess_data(trainer.generate_synthetic_data(records, seed=seed))
+    df['earning_member'] = df['earning_member'].astype(int)
+    return df, trainer.create_target_variables(df)
+
+
+def train(kind, records, trees, seed):
+    trainer = StreamlinedBudgetMLTrainer()
+    df, targets = synthetic_set(trainer, records, seed)
+    start = time.perf_counter()
+    trainer.train_models(df, targets, n_estimators=trees, kind=kind)
+    elapsed = time.perf_counter() - start
+
+    registry = ModelRegistry(tempfile.mkdtemp(prefix=f'budget-{kind}-'))
+    registry.publish(trainer.models, trainer.scalers, trainer.label_encoders, {'model_kind': kind})
+    size = len(pickle.dumps((trainer.models, trainer.scalers), protocol=pickle.HIGHEST_PROTOCOL))
+    return BudgetMLGenerator(registry), trainer, elapsed, size
+
+
+def accuracy(generator, features, targets):
+    predictions = generator._predict_categories(features)
+    maes, r2s = [], []
+    for category, predicted in predictions.items():
+        actual = np.asarray(targets[category], dtype=float)
+        maes.append(mean_absolute_error(actual, predicted))
+        r2s.append(r2_score(actual, predicted))
+    return float(np.mean(maes)), float(np.mean(r2s)), len(predictions)
+
+
+def latency(generator, features, singles, batch):
+    timings = []
+    for row in features[:singles]:
+        start = time.perf_counter()
+        generator._predict_categories(row.reshape(1, -1))
+        timings.append(time.perf_counter() - start)
+    rows = np.resize(features, (batch, features.shape[1]))
+    start = time.perf_counter()
+    generator._predict_categories(rows)
+    return float(np.median(timings)), batch / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-category vs multi-output budget models')
+    parser.add_argument('--train-records', type=int, default=10000)
+    parser.add_argument('--test-records', type=int, default=5000)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--singles', type=int, default=200)
+    parser.add_argument('--kinds', nargs='+', choices=list(MODEL_KINDS), default=list(MODEL_KINDS))
+    args = parser.parse_args()
+
+    print(f"{'kind':<16} {'train s':>8} {'size MB':>8} {'cats':>5} {'mean MAE':>9} {'mean R2':>8} "
+          f"{'1-user ms':>10} {'batch rows/s':>13}")
+    for kind in args.kinds:
+        generator, trainer, train_elapsed, size = train(kind, args.train_records, args.trees, seed=5)
+        test_df, test_targets = synthetic_set(trainer, args.test_records, seed=6)
+        features = test_df[FEATURE_COLUMNS].to_numpy(dtype=float)
+        mae, r2, categories = accuracy(generator, features, test_targets)
+        single, throughput = latency(generator, features, args.singles, args.batch)
+        print(f"{kind:<16} {train_elapsed:>8.1f} {size / 1e6:>8.1f} {categories:>5} {mae:>9.1f} {r2:>8.3f} "
+              f"{single * 1e3:>10.2f} {throughput:>13,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark synthetic training data generation: the per-record loop the
+training script used to run vs. the vectorized generator in
+streamlined_train_budget_models.
+
+Draws --sample records from both and tests that they follow the same
+distributions (chi-square for categorical and discrete columns and a few
+joint ones, two-sample Kolmogorov-Smirnov for amounts; fails below
+--alpha), then reports:
+- records/sec of the old loop (on --sample records)
+- records/sec of generate_synthetic_data over --records records
+- time to write --records records as chunk files and read them back
+
+Usage:
+    python benchmarks/bench_synthetic_data.py [--records 2000000] [--sample 20000] [--chunk-size 500000]
+
+Needs no database.
+"""
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from streamlined_train_budget_models import (
+    INCOME_RANGES, SYNTHETIC_LABELS, StreamlinedBudgetMLTrainer, read_synthetic_chunks
+)
+
+# The generator logs every call
+logging.disable(logging.INFO)
+
+DISCRETE = ['gender', 'marital_status', 'living_situation', 'transport_mode', 'eating_out_frequency',
+            'savings', 'country', 'division', 'district', 'earning_member', 'monthly_income',
+            'age', 'dependents']
+AMOUNTS = ['rent', 'transport_cost', 'grocery_cost', 'utilities_cost', 'mobile_internet_cost', 'loan_payment']
+JOINT = [('marital_status', 'dependents'), ('age_bracket', 'monthly_income'),
+         ('living_situation', 'has_rent'), ('earning_member', 'has_loan')]
+
+
+def legacy_generate(num_records):
+    """The generator before vectorizing: one record per loop iteration"""
+    labels = SYNTHETIC_LABELS
+    data = []
+    for i in range(num_records):
+        age = max(18, min(80, int(np.random.normal(35, 12))))
+        gender = random.choice(labels['gender'])
+        marital_status = random.choice(labels['marital_status'])
+        if marital_status == 'Single' and age < 30:
+            dependents = np.random.choice([0, 1], p=[0.8, 0.2])
+        elif marital_status == 'Married':
+            dependents = np.random.choice([0, 1, 2, 3, 4], p=[0.1, 0.3, 0.4, 0.15, 0.05])
+        else:
+            dependents = np.random.choice([0, 1, 2], p=[0.5, 0.3, 0.2])
+        if age < 25:
+            income_choice = INCOME_RANGES[:3][np.random.choice(3, p=[0.5, 0.4, 0.1])]
+        elif age < 35:
+            income_choice = INCOME_RANGES[1:5][np.random.choice(4, p=[0.3, 0.4, 0.2, 0.1])]
+        elif age < 50:
+            income_choice = INCOME_RANGES[2:][np.random.choice(4, p=[0.2, 0.3, 0.3, 0.2])]
+        else:
+            income_choice = INCOME_RANGES[3:][np.random.choice(3, p=[0.3, 0.4, 0.3])]
+        monthly_income_str, income = income_choice
+        living_situation = random.choice(labels['living_situation'])
+        if living_situation == 'Family':
+            rent = 0
+        elif living_situation == 'Shared':
+            rent = income * np.random.uniform(0.15, 0.25)
+        elif living_situation == 'Own':
+            rent = income * np.random.uniform(0.20, 0.35)
+        else:
+            rent = income * np.random.uniform(0.25, 0.40)
+        transport_mode = random.choice(labels['transport_mode'])
+        if transport_mode == 'Car':
+            transport_cost = income * np.random.uniform(0.08, 0.15)
+        elif transport_mode == 'Public Transport':
+            transport_cost = income * np.random.uniform(0.03, 0.08)
+        else:
+            transport_cost = income * np.random.uniform(0.01, 0.03)
+        grocery_cost = income * 0.12 * (1 + dependents * 0.3)
+        if living_situation == 'Family':
+            utilities_cost = income * np.random.uniform(0.02, 0.05)
+        else:
+            utilities_cost = income * np.random.uniform(0.05, 0.12)
+        mobile_internet_cost = income * np.random.uniform(0.02, 0.05)
+        has_loan = np.random.choice([True, False], p=[0.3, 0.7])
+        loan_payment = income * np.random.uniform(0.05, 0.20) if has_loan else 0
+        data.append({
+            'user_id': f"user_{i+1}", 'age': age, 'gender': gender, 'marital_status': marital_status,
+            'dependents': dependents, 'living_situation': living_situation, 'transport_mode': transport_mode,
+            'eating_out_frequency': random.choice(labels['eating_out_frequency']),
+            'savings': random.choice(labels['savings']), 'country': random.choice(labels['country']),
+            'division': random.choice(labels['division']), 'district': f"District_{random.randint(1, 10)}",
+            'earning_member': np.random.choice([True, False], p=[0.8, 0.2]),
+            'monthly_income': monthly_income_str, 'monthly_income_numeric': income,
+            'rent': max(0, rent), 'transport_cost': max(0, transport_cost), 'grocery_cost': max(0, grocery_cost),
+            'utilities_cost': max(0, utilities_cost), 'mobile_internet_cost': max(0, mobile_internet_cost),
+            'loan_payment': max(0, loan_payment)
+        })
+    return pd.DataFrame(data)
+
+
+def with_joint_columns(df):
+    df = df.copy()
+    df['age_bracket'] = np.digitize(df['age'], [25, 35, 50])
+    df['has_rent'] = df['rent'] > 0
+    df['has_loan'] = df['loan_payment'] > 0
+    return df
+
+
+def distribution_tests(legacy, vectorized):
+    """(test name, p-value) per column and joint pair"""
+    legacy, vectorized = with_joint_columns(legacy), with_joint_columns(vectorized)
+    results = []
+    for columns in [[column] for column in DISCRETE] + [list(pair) for pair in JOINT]:
+        counts = pd.concat([df.groupby(columns).size() for df in (legacy, vectorized)], axis=1).fillna(0)
+        results.append(('chi2 ' + ' x '.join(columns), stats.chi2_contingency(counts.to_numpy().T)[1]))
+    for column in AMOUNTS:
+        results.append((f'ks {column}', stats.ks_2samp(legacy[column], vectorized[column]).pvalue))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Loop vs vectorized synthetic data generation')
+    parser.add_argument('--records', type=int, default=2000000)
+    parser.add_argument('--sample', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=500000)
+    parser.add_argument('--alpha', type=float, default=0.001)
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    trainer = StreamlinedBudgetMLTrainer()
+    np.random.seed(args.seed)
+    random.seed(args.seed)
+
+    start = time.perf_counter()
+    legacy = legacy_generate(args.sample)
+    legacy_elapsed = time.perf_counter() - start
+
+    results = distribution_tests(legacy, trainer.generate_synthetic_data(args.sample, seed=args.seed))
+    failed = [(name, p) for name, p in results if p < args.alpha]
+    print(f"distribution tests on {args.sample} records: {len(results) - len(failed)}/{len(results)} "
+          f"pass (alpha {args.alpha}), lowest p {min(p for _, p in results):.4f}")
+    for name, p in failed:
+        print(f"  FAILED {name}: p={p:.2e}")
+
+    start = time.perf_counter()
+    df = trainer.generate_synthetic_data(args.records, seed=args.seed)
+    vectorized_elapsed = time.perf_counter() - start
+    del df
+
+    out_dir = tempfile.mkdtemp(prefix='synthetic-')
+    try:
+        start = time.perf_counter()
+        paths = trainer.write_synthetic_chunks(out_dir, args.records, args.chunk_size, seed=args.seed)
+        write_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        read_back = sum(len(chunk) for chunk in read_synthetic_chunks(paths))
+        read_elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    print(f"{'step':<22} {'records':>10} {'seconds':>9} {'records/sec':>13}")
+    for name, count, elapsed in (('legacy loop', args.sample, legacy_elapsed),
+                                 ('vectorized', args.records, vectorized_elapsed),
+                                 (f'write {len(paths)} {paths[0].rsplit(".", 1)[-1]} files', args.records, write_elapsed),
+                                 ('read chunks back', read_back, read_elapsed)):
+        print(f"{name:<22} {count:>10} {elapsed:>9.2f} {count / elapsed:>13,.0f}")
+    print(f"generation speedup {(legacy_elapsed / args.sample) / (vectorized_elapsed / args.records):.0f}x")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
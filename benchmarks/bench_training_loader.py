@@ -0,0 +1,196 @@
+"""
+Benchmark loading the budget training set: the old fetchall() + object
+DataFrame + per-column preprocessing path vs. app.utils.training_loader,
+which streams a server-side cursor into typed columns.
+
+A fake connection serves synthetic expense-habit rows (about 1% NULL
+districts and rents), generated chunk by chunk, so only the loader under
+test holds the data. Amounts arrive as floats; PyMySQL returns DECIMAL as
+Decimal, which costs both paths extra per value. Each (path, size) runs in
+a fresh process. The report shows load time, throughput, peak RSS growth
+over the process after imports, and the size of the resulting frame. A
+parity run first checks that both paths build the same features and
+encoders (exit status 1 if not).
+
+Usage:
+    python benchmarks/bench_training_loader.py [--sizes 100000 1000000 10000000] [--legacy-max 1000000]
+
+Needs no database.
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.ml_budget_generator import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, BudgetMLGenerator
+from app.utils.training_loader import DEFAULT_CHUNK_SIZE, TRAINING_COLUMNS, load_training_frame
+from streamlined_train_budget_models import RECORD_COLUMNS, StreamlinedBudgetMLTrainer
+
+# The loader logs every chunk
+logging.disable(logging.INFO)
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+GENERATE_CHUNK = 50000
+NULL_EVERY = 97
+
+
+class FakeCursor:
+    def __init__(self, rows, as_dicts):
+        self.total = rows
+        self.as_dicts = as_dicts
+        self.description = [(col,) for col in ['user_id'] + RECORD_COLUMNS]
+        self._chunks = None
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, args=None):
+        self._count = query.lstrip().startswith('SELECT COUNT')
+        frames = StreamlinedBudgetMLTrainer().iter_synthetic_chunks(self.total, GENERATE_CHUNK, seed=11)
+        self._chunks = (self._rows(frame) for frame in frames)
+
+    def _rows(self, frame):
+        null = np.arange(len(frame)) % NULL_EVERY == 0
+        frame['district'] = frame['district'].where(~null, None)
+        frame['rent'] = frame['rent'].astype(object).where(~null, None)
+        if self.as_dicts:
+            return frame.to_dict('records')
+        return list(zip(*[frame[col].tolist() for col in TRAINING_COLUMNS]))
+
+    def fetchone(self):
+        return {'row_count': self.total}
+
+    def fetchmany(self, size):
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer.extend(chunk)
+        rows, self._buffer = self._buffer[:size], self._buffer[size:]
+        return rows
+
+    def fetchall(self):
+        return [row for chunk in self._chunks for row in chunk]
+
+
+class FakeConnection:
+    def __init__(self, rows, as_dicts=False):
+        self.rows = rows
+        self.as_dicts = as_dicts
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self.rows, self.as_dicts)
+
+
+def legacy_load(conn, parse_income, label_encoders):
+    """prepare_data and _preprocess_data as they were before training_loader"""
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT ...')
+        rows = cursor.fetchall()
+        df = pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+    del rows
+
+    df = df.fillna({'rent': 0, 'transport_cost': 0, 'grocery_cost': 0, 'utilities_cost': 0,
+                    'mobile_internet_cost': 0, 'loan_payment': 0, 'dependents': 0,
+                    'country': 'Unknown', 'division': 'Unknown', 'district': 'Unknown'})
+    for col in ['age', 'rent', 'transport_cost', 'grocery_cost', 'utilities_cost',
+                'mobile_internet_cost', 'loan_payment', 'dependents']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['age'] = df['age'].fillna(df['age'].median() if df['age'].notna().any() else 30)
+    df['monthly_income_numeric'] = df['monthly_income'].apply(parse_income)
+    df['total_fixed_expenses'] = df['rent'] + df['utilities_cost'] + df['mobile_internet_cost'] + df['loan_payment']
+    df['total_variable_expenses'] = df['transport_cost'] + df['grocery_cost']
+    df['income_expense_ratio'] = df['monthly_income_numeric'] / (
+        df['total_fixed_expenses'] + df['total_variable_expenses'] + 1)
+    df['expense_per_dependent'] = df['total_fixed_expenses'] / (df['dependents'] + 1)
+    df['age_income_ratio'] = df['age'] / (df['monthly_income_numeric'] / 1000)
+    df['earning_member'] = df['earning_member'].fillna(0).astype(int)
+    for col in CATEGORICAL_COLUMNS:
+        if col not in label_encoders:
+            label_encoders[col] = LabelEncoder()
+            df[f'{col}_encoded'] = label_encoders[col].fit_transform(df[col].astype(str))
+        else:
+            df[f'{col}_encoded'] = label_encoders[col].transform(df[col].astype(str))
+    return df
+
+
+def load(path, rows):
+    parse_income = BudgetMLGenerator()._parse_income
+    encoders = {}
+    if path == 'legacy':
+        return legacy_load(FakeConnection(rows, as_dicts=True), parse_income, encoders), encoders
+    return load_training_frame(FakeConnection(rows), parse_income, encoders, DEFAULT_CHUNK_SIZE), encoders
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def worker(path, rows):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    df, _ = load(path, rows)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'seconds': elapsed,
+        'peak_mb': peak_rss_mb() - baseline,
+        'frame_mb': df.memory_usage(deep=True).sum() / 2 ** 20,
+    }))
+
+
+def parity(rows):
+    legacy, legacy_encoders = load('legacy', rows)
+    streamed, encoders = load('streaming', rows)
+    same_encoders = all(list(legacy_encoders[col].classes_) == list(encoders[col].classes_)
+                        for col in CATEGORICAL_COLUMNS)
+    expected = legacy[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    actual = streamed[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    return same_encoders and np.allclose(expected, actual, rtol=1e-6, equal_nan=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Old vs streaming typed training-data loading')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--legacy-max', type=int, default=1000000, help='Largest size to run the old path at')
+    parser.add_argument('--parity-rows', type=int, default=20000)
+    parser.add_argument('--worker', choices=['legacy', 'streaming'], help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.rows)
+        return
+
+    same = parity(args.parity_rows)
+    print(f"parity on {args.parity_rows} rows: {'identical features and encoders' if same else 'MISMATCH'}")
+    print(f"{'rows':>10} {'path':<10} {'load s':>8} {'rows/s':>10} {'peak RSS MB':>12} {'frame MB':>9}")
+    for size in args.sizes:
+        for path in ['legacy', 'streaming']:
+            if path == 'legacy' and size > args.legacy_max:
+                continue
+            out = subprocess.run([sys.executable, __file__, '--worker', path, '--rows', str(size)],
+                                 capture_output=True, text=True, check=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(f"{size:>10} {path:<10} {result['seconds']:>8.1f} {size / result['seconds']:>10,.0f} "
+                  f"{result['peak_mb']:>12,.0f} {result['frame_mb']:>9,.0f}")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Concurrency stress test for send_money: money must be conserved.
+
+Runs random transfers between a set of users from many threads and checks that
+the sum of their balances is unchanged and that every committed transfer has
+exactly one transactions row.
+
+Usage:
+    python benchmarks/stress_transfers.py --users U1 U2 U3 [--threads 16] [--transfers 50]
+
+Requires a reachable MySQL configured through the usual MYSQL_* variables. The
+listed users should have some balance; the script moves money only among them.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.utils.transaction_utils import send_money
+
+
+def total_balance(app, user_ids):
+    with app.app_context():
+        conn = app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(user_ids))
+                cursor.execute(f'SELECT COALESCE(SUM(balance), 0) AS total FROM users WHERE id IN ({placeholders})',
+                               tuple(user_ids))
+                return Decimal(str(cursor.fetchone()['total']))
+        finally:
+            conn.close()
+
+
+def count_transactions(app, note):
+    with app.app_context():
+        conn = app.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) AS n FROM transactions WHERE note = %s', (note,))
+                return cursor.fetchone()['n']
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='send_money concurrency stress test')
+    parser.add_argument('--users', nargs='+', required=True)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--transfers', type=int, default=50, help='Transfers per thread')
+    parser.add_argument('--max-amount', type=float, default=5.0)
+    args = parser.parse_args()
+
+    if len(args.users) < 2:
+        parser.error('need at least two users')
+
+    app = create_app()
+    note = f'stress-{int(time.time())}'
+    before = total_balance(app, args.users)
+
+    lock = threading.Lock()
+    latencies = []
+    outcomes = {'ok': 0, 'rejected': 0}
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(args.transfers):
+            sender, recipient = rng.sample(args.users, 2)
+            amount = round(rng.uniform(0.01, args.max_amount), 2)
+            start = time.perf_counter()
+            with app.app_context():
+                ok, _msg, _ = send_money(sender, recipient, amount, 'stress', note, None, 'Transfer')
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                outcomes['ok' if ok else 'rejected'] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    after = total_balance(app, args.users)
+    committed_rows = count_transactions(app, note)
+
+    ordered = sorted(latencies)
+    print(f"transfers: {len(latencies)} ok={outcomes['ok']} rejected={outcomes['rejected']} "
+          f"in {wall:.2f}s ({len(latencies) / wall:.1f}/s)")
+    print(f"latency: p50={statistics.median(ordered):.2f}ms "
+          f"p99={ordered[int(len(ordered) * 0.99) - 1]:.2f}ms max={ordered[-1]:.2f}ms")
+    print(f"total balance before={before} after={after}")
+    print(f"transactions rows={committed_rows} (expected {outcomes['ok']})")
+
+    if before != after or committed_rows != outcomes['ok']:
+        print('FAIL: money was created or destroyed')
+        sys.exit(1)
+    print('OK: money conserved')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+-- Incremental schema upgrades for existing FinGuard databases
+-- Fresh installs get these from DatabaseSchema_MySQL.sql; run each section once
+-- against a database created before the change:
+--   mysql -u root -p fin_guard < schema_upgrades.sql
+
+-- Per-user blockchain verification checkpoints
+ALTER TABLE blockchain
+  ADD COLUMN `hash_version` TINYINT NOT NULL DEFAULT 0;
+
+ALTER TABLE blockchain_transactions
+  ADD INDEX `idx_user_timestamp` (`user_id`, `timestamp`);
+
+CREATE TABLE IF NOT EXISTS `blockchain_verification_checkpoints` (
+  `user_id` CHAR(36) PRIMARY KEY,
+  `last_index` INT NOT NULL,
+  `last_hash` VARCHAR(255) NOT NULL,
+  `running_balance` DECIMAL(15,2) NOT NULL,
+  `last_timestamp` DATETIME,
+  `verified_blocks` INT NOT NULL DEFAULT 0,
+  `updated_at` DATETIME,
+  `full_verified_at` DATETIME,
+  FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Block appender: ledger entries get a sequence number and are chained later
+-- under the single blockchain_tip row lock
+ALTER TABLE blockchain_transactions
+  ADD COLUMN `seq` BIGINT NULL,
+  ADD COLUMN `block_index` INT NULL;
+
+UPDATE blockchain_transactions bt
+JOIN blockchain b ON b.transaction_id = bt.id
+SET bt.block_index = b.`index`;
+
+SET @ledger_seq := 0;
+UPDATE blockchain_transactions
+SET seq = (@ledger_seq := @ledger_seq + 1)
+ORDER BY block_index IS NULL, block_index, timestamp, id;
+
+ALTER TABLE blockchain_transactions
+  MODIFY COLUMN `seq` BIGINT NOT NULL AUTO_INCREMENT,
+  ADD UNIQUE KEY `uk_seq` (`seq`),
+  ADD INDEX `idx_user_seq` (`user_id`, `seq`),
+  ADD INDEX `idx_pending` (`block_index`, `seq`),
+  DROP INDEX `idx_user_timestamp`;
+
+CREATE TABLE IF NOT EXISTS `blockchain_tip` (
+  `id` TINYINT PRIMARY KEY,
+  `last_index` INT NOT NULL,
+  `last_hash` VARCHAR(255) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO blockchain_tip (id, last_index, last_hash)
+SELECT 1, COALESCE(MAX(`index`), -1),
+       COALESCE((SELECT hash FROM blockchain ORDER BY `index` DESC LIMIT 1), '0')
+FROM blockchain;
+
+ALTER TABLE blockchain_verification_checkpoints
+  ADD COLUMN `last_seq` BIGINT NOT NULL DEFAULT 0 AFTER `user_id`;
+
+-- Merkle batch blocks: one block per appender batch, a proof per ledger entry
+ALTER TABLE blockchain
+  ADD COLUMN `merkle_root` VARCHAR(64) NULL,
+  ADD COLUMN `tx_count` INT NOT NULL DEFAULT 1;
+
+ALTER TABLE blockchain_transactions
+  ADD COLUMN `leaf_index` INT NULL,
+  ADD COLUMN `merkle_proof` TEXT NULL;
+
+-- Transaction reports: per-user range scans on (sender_id|receiver_id, timestamp)
+ALTER TABLE transactions
+  ADD INDEX `idx_sender_timestamp` (`sender_id`, `timestamp`),
+  ADD INDEX `idx_receiver_timestamp` (`receiver_id`, `timestamp`);
+
+ALTER TABLE transactions
+  DROP INDEX `idx_sender_id`,
+  DROP INDEX `idx_receiver_id`;
+
+-- Per-user daily rollup; backfill it afterwards with `flask --app run rebuild-rollup`
+CREATE TABLE IF NOT EXISTS `user_daily_rollup` (
+  `user_id` CHAR(36) NOT NULL,
+  `day` DATE NOT NULL,
+  `direction` ENUM('sent', 'received') NOT NULL,
+  `type` VARCHAR(20) NOT NULL DEFAULT '',
+  `payment_method` VARCHAR(100) NOT NULL DEFAULT '',
+  `tx_count` INT NOT NULL DEFAULT 0,
+  `total_amount` DECIMAL(15,2) NOT NULL DEFAULT 0,
+  `sum_squares` DECIMAL(30,4) NOT NULL DEFAULT 0,
+  `business_hours_count` INT NOT NULL DEFAULT 0,
+  `small_count` INT NOT NULL DEFAULT 0,
+  `medium_count` INT NOT NULL DEFAULT 0,
+  `large_count` INT NOT NULL DEFAULT 0,
+  `last_timestamp` DATETIME,
+  PRIMARY KEY (`user_id`, `day`, `direction`, `type`, `payment_method`),
+  INDEX `idx_day` (`day`),
+  FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Expense category per transaction, set at write time by categorize_expense;
+-- fill existing rows afterwards with `flask --app run backfill-categories`
+ALTER TABLE transactions
+  ADD COLUMN `category` VARCHAR(50) NULL AFTER `location`,
+  ADD INDEX `idx_sender_category` (`sender_id`, `category`, `timestamp`);
+
+-- Stored budget feature vectors, kept current on expense habit / profile saves;
+-- fill it afterwards with `flask --app run rebuild-budget-features` (or let reads fill it)
+CREATE TABLE IF NOT EXISTS `user_budget_features` (
+  `user_id` CHAR(36) PRIMARY KEY,
+  `schema_version` CHAR(16) NOT NULL,
+  `features` VARBINARY(255) NOT NULL,
+  `monthly_income` DOUBLE NOT NULL,
+  `updated_at` DATETIME NOT NULL,
+  INDEX `idx_schema_version` (`schema_version`),
+  FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
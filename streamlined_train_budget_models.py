@@ -3,6 +3,7 @@ Streamlined Budget ML Training Script for FinGuard
 Generates synthetic data on-the-fly and trains ML models without saving generated data
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
@@ -13,7 +14,8 @@ import joblib
 import os
 import logging
 from typing import Dict, List, Tuple
-import random
+from app.utils.model_registry import ModelRegistry
+from app.utils.multi_output_budget import MODEL_KINDS, MULTI_OUTPUT_KEY, fit_multi_output_model
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,151 +29,220 @@ EXPENSE_CATEGORIES = [
     'Travel', 'Childcare', 'Pets', 'Other'
 ]
 
+# Categorical options for synthetic records, each drawn uniformly
+SYNTHETIC_LABELS = {
+    'gender': ['Male', 'Female', 'Other'],
+    'marital_status': ['Single', 'Married', 'Divorced', 'Widowed'],
+    'living_situation': ['Rent', 'Own', 'Family', 'Shared'],
+    'transport_mode': ['Car', 'Public Transport', 'Bike', 'Walk'],
+    'eating_out_frequency': ['Daily', 'Weekly', 'Monthly', 'Rarely'],
+    'savings': ['High', 'Medium', 'Low', 'None'],
+    'country': ['Bangladesh', 'India', 'Pakistan', 'USA', 'UK'],
+    'division': ['Dhaka', 'Chittagong', 'Sylhet', 'Rajshahi', 'Khulna'],
+    'district': [f"District_{i}" for i in range(1, 11)],
+}
+MARITAL_SINGLE = SYNTHETIC_LABELS['marital_status'].index('Single')
+MARITAL_MARRIED = SYNTHETIC_LABELS['marital_status'].index('Married')
+
+# Income ranges with realistic distributions
+INCOME_RANGES = [
+    ('below 20000', 15000),
+    ('20000-40000', 30000),
+    ('40000-60000', 50000),
+    ('60000-80000', 70000),
+    ('80000-100000', 90000),
+    ('above 100000', 120000)
+]
+INCOME_VALUES = np.array([value for _, value in INCOME_RANGES], dtype=float)
+
+# Per age bracket (<25, <35, <50, 50+): first income range and the odds of it and the ones after
+INCOME_BY_AGE = [
+    (0, [0.5, 0.4, 0.1]),
+    (1, [0.3, 0.4, 0.2, 0.1]),
+    (2, [0.2, 0.3, 0.3, 0.2]),
+    (3, [0.3, 0.4, 0.3]),
+]
+
+# Share of income as a (low, high) uniform range per option, in SYNTHETIC_LABELS order
+RENT_SHARE = [(0.25, 0.40), (0.20, 0.35), (0.0, 0.0), (0.15, 0.25)]            # Rent, Own, Family, Shared
+UTILITIES_SHARE = [(0.05, 0.12), (0.05, 0.12), (0.02, 0.05), (0.05, 0.12)]     # Family pays less
+TRANSPORT_SHARE = [(0.08, 0.15), (0.03, 0.08), (0.01, 0.03), (0.01, 0.03)]     # Car, Public Transport, Bike, Walk
+
+# Columns stored as codes, and the labels they index
+CODED_LABELS = dict(SYNTHETIC_LABELS, monthly_income=[label for label, _ in INCOME_RANGES])
+
+# Synthetic record columns after user_id
+RECORD_COLUMNS = [
+    'age', 'gender', 'marital_status', 'dependents', 'living_situation', 'transport_mode',
+    'eating_out_frequency', 'savings', 'country', 'division', 'district', 'earning_member',
+    'monthly_income', 'monthly_income_numeric', 'rent', 'transport_cost', 'grocery_cost',
+    'utilities_cost', 'mobile_internet_cost', 'loan_payment'
+]
+
+# Rows per generated chunk / file
+CHUNK_SIZE = 1000000
+
+
+def _choose(rng: np.random.Generator, p: List[float], n: int) -> np.ndarray:
+    """``n`` draws of 0..len(p)-1 with probabilities ``p``"""
+    codes = np.searchsorted(np.cumsum(p), rng.random(n), side='right')
+    return np.minimum(codes, len(p) - 1).astype(np.int64)
+
+
+def _uniform_by(rng: np.random.Generator, codes: np.ndarray, ranges: List[Tuple[float, float]]) -> np.ndarray:
+    """A uniform draw per row from the (low, high) range of the row's option"""
+    bounds = np.array(ranges)[codes]
+    return rng.uniform(bounds[:, 0], bounds[:, 1])
+
+
+def _synthetic_frame(columns: Dict[str, np.ndarray], start_id: int, labels: Dict = None) -> pd.DataFrame:
+    """DataFrame in the record layout the training steps expect, from coded column arrays"""
+    labels = labels or CODED_LABELS
+    n = len(columns['age'])
+    data = {'user_id': 'user_' + pd.RangeIndex(start_id, start_id + n).astype(str)}
+    for name in RECORD_COLUMNS:
+        values = columns[name]
+        if name in labels:
+            values = np.asarray(labels[name], dtype=object)[values]
+        data[name] = values
+    return pd.DataFrame(data)
+
+
+def read_synthetic_chunks(paths: List[str]):
+    """Yield the DataFrames written by StreamlinedBudgetMLTrainer.write_synthetic_chunks"""
+    for path in paths:
+        if path.endswith('.parquet'):
+            yield pd.read_parquet(path)
+            continue
+        with np.load(path) as data:
+            labels = {name[:-len('__labels')]: data[name].tolist()
+                      for name in data.files if name.endswith('__labels')}
+            yield _synthetic_frame(data, int(data['start_id']), labels)
+
+
 class StreamlinedBudgetMLTrainer:
     def __init__(self):
         self.models = {}
         self.scalers = {}
         self.label_encoders = {}
+        self.model_kind = 'per_category'
         
-    def generate_synthetic_data(self, num_records: int = 30000) -> pd.DataFrame:
+    def generate_synthetic_data(self, num_records: int = 30000, seed=None) -> pd.DataFrame:
         """
-        Generate synthetic expense habit data for training
+        Generate synthetic expense habit data for training; the same ``seed``
+        gives the same data
         """
         logger.info(f"Generating {num_records} synthetic records...")
-        
-        # Define realistic ranges and options
-        genders = ['Male', 'Female', 'Other']
-        marital_statuses = ['Single', 'Married', 'Divorced', 'Widowed']
-        living_situations = ['Rent', 'Own', 'Family', 'Shared']
-        transport_modes = ['Car', 'Public Transport', 'Bike', 'Walk']
-        eating_frequencies = ['Daily', 'Weekly', 'Monthly', 'Rarely']
-        savings_habits = ['High', 'Medium', 'Low', 'None']
-        countries = ['Bangladesh', 'India', 'Pakistan', 'USA', 'UK']
-        divisions = ['Dhaka', 'Chittagong', 'Sylhet', 'Rajshahi', 'Khulna']
-        
-        # Income ranges with realistic distributions
-        income_ranges = [
-            ('below 20000', 15000),
-            ('20000-40000', 30000),
-            ('40000-60000', 50000),
-            ('60000-80000', 70000),
-            ('80000-100000', 90000),
-            ('above 100000', 120000)
-        ]
-        
-        data = []
-        
-        for i in range(num_records):
-            # Basic demographics
-            age = np.random.normal(35, 12)  # Mean age 35, std 12
-            age = max(18, min(80, int(age)))  # Constrain to realistic range
-            
-            gender = random.choice(genders)
-            marital_status = random.choice(marital_statuses)
-            
-            # Dependents based on age and marital status
-            if marital_status == 'Single' and age < 30:
-                dependents = np.random.choice([0, 1], p=[0.8, 0.2])
-            elif marital_status == 'Married':
-                dependents = np.random.choice([0, 1, 2, 3, 4], p=[0.1, 0.3, 0.4, 0.15, 0.05])
-            else:
-                dependents = np.random.choice([0, 1, 2], p=[0.5, 0.3, 0.2])
-            
-            # Income based on age and demographics
-            if age < 25:
-                income_idx = np.random.choice(len(income_ranges[:3]), p=[0.5, 0.4, 0.1])
-                income_choice = income_ranges[:3][income_idx]
-            elif age < 35:
-                income_idx = np.random.choice(len(income_ranges[1:5]), p=[0.3, 0.4, 0.2, 0.1])
-                income_choice = income_ranges[1:5][income_idx]
-            elif age < 50:
-                income_idx = np.random.choice(len(income_ranges[2:]), p=[0.2, 0.3, 0.3, 0.2])
-                income_choice = income_ranges[2:][income_idx]
-            else:
-                income_idx = np.random.choice(len(income_ranges[3:]), p=[0.3, 0.4, 0.3])
-                income_choice = income_ranges[3:][income_idx]
-            
-            monthly_income_str, monthly_income_numeric = income_choice
-            
-            # Living situation affects rent
-            living_situation = random.choice(living_situations)
-            if living_situation == 'Family':
-                rent = 0
-            elif living_situation == 'Shared':
-                rent = monthly_income_numeric * np.random.uniform(0.15, 0.25)
-            elif living_situation == 'Own':
-                rent = monthly_income_numeric * np.random.uniform(0.20, 0.35)
-            else:  # Rent
-                rent = monthly_income_numeric * np.random.uniform(0.25, 0.40)
-            
-            # Other expenses based on income and lifestyle
-            transport_mode = random.choice(transport_modes)
-            if transport_mode == 'Car':
-                transport_cost = monthly_income_numeric * np.random.uniform(0.08, 0.15)
-            elif transport_mode == 'Public Transport':
-                transport_cost = monthly_income_numeric * np.random.uniform(0.03, 0.08)
-            else:
-                transport_cost = monthly_income_numeric * np.random.uniform(0.01, 0.03)
-            
-            # Grocery costs based on family size
-            base_grocery = monthly_income_numeric * 0.12
-            grocery_cost = base_grocery * (1 + dependents * 0.3)
-            
-            # Utilities based on living situation
-            if living_situation == 'Family':
-                utilities_cost = monthly_income_numeric * np.random.uniform(0.02, 0.05)
-            else:
-                utilities_cost = monthly_income_numeric * np.random.uniform(0.05, 0.12)
-            
-            # Other costs
-            mobile_internet_cost = monthly_income_numeric * np.random.uniform(0.02, 0.05)
-            
-            # Loan payment (some people have loans)
-            has_loan = np.random.choice([True, False], p=[0.3, 0.7])
-            if has_loan:
-                loan_payment = monthly_income_numeric * np.random.uniform(0.05, 0.20)
-            else:
-                loan_payment = 0
-            
-            # Other categorical data
-            eating_out_frequency = random.choice(eating_frequencies)
-            savings = random.choice(savings_habits)
-            country = random.choice(countries)
-            division = random.choice(divisions)
-            district = f"District_{random.randint(1, 10)}"
-            earning_member = np.random.choice([True, False], p=[0.8, 0.2])
-            
-            # Create record
-            record = {
-                'user_id': f"user_{i+1}",
-                'age': age,
-                'gender': gender,
-                'marital_status': marital_status,
-                'dependents': dependents,
-                'living_situation': living_situation,
-                'transport_mode': transport_mode,
-                'eating_out_frequency': eating_out_frequency,
-                'savings': savings,
-                'country': country,
-                'division': division,
-                'district': district,
-                'earning_member': earning_member,
-                'monthly_income': monthly_income_str,
-                'monthly_income_numeric': monthly_income_numeric,
-                'rent': max(0, rent),
-                'transport_cost': max(0, transport_cost),
-                'grocery_cost': max(0, grocery_cost),
-                'utilities_cost': max(0, utilities_cost),
-                'mobile_internet_cost': max(0, mobile_internet_cost),
-                'loan_payment': max(0, loan_payment)
-            }
-            
-            data.append(record)
-        
-        df = pd.DataFrame(data)
+        rng = np.random.default_rng(seed)
+        df = _synthetic_frame(self._synthetic_columns(rng, num_records), start_id=1)
         logger.info(f"Generated synthetic dataset with {len(df)} records")
         return df
     
+    def iter_synthetic_chunks(self, num_records: int, chunk_size: int = CHUNK_SIZE, seed=None):
+        """
+        Yield the synthetic data as DataFrames of at most ``chunk_size`` rows,
+        so datasets larger than memory can be generated; user ids continue
+        across chunks
+        """
+        rng = np.random.default_rng(seed)
+        for start in range(0, num_records, chunk_size):
+            count = min(chunk_size, num_records - start)
+            yield _synthetic_frame(self._synthetic_columns(rng, count), start_id=start + 1)
+    
+    def write_synthetic_chunks(self, out_dir: str, num_records: int, chunk_size: int = CHUNK_SIZE,
+                               seed=None, fmt: str = 'auto') -> List[str]:
+        """
+        Write the synthetic data to ``out_dir`` one file per chunk, as Parquet
+        (needs pyarrow) or NPZ (categorical columns stored as codes plus their
+        labels). ``fmt='auto'`` picks Parquet when pyarrow is installed.
+        Read them back with read_synthetic_chunks(). Returns the file paths.
+        """
+        if fmt == 'auto':
+            try:
+                import pyarrow  # noqa: F401
+                fmt = 'parquet'
+            except ImportError:
+                fmt = 'npz'
+        os.makedirs(out_dir, exist_ok=True)
+        
+        rng = np.random.default_rng(seed)
+        paths = []
+        for part, start in enumerate(range(0, num_records, chunk_size)):
+            columns = self._synthetic_columns(rng, min(chunk_size, num_records - start))
+            path = os.path.join(out_dir, f'part-{part:05d}.{fmt}')
+            if fmt == 'parquet':
+                _synthetic_frame(columns, start_id=start + 1).to_parquet(path, index=False)
+            else:
+                labels = {f'{name}__labels': np.array(values) for name, values in CODED_LABELS.items()}
+                np.savez(path, start_id=np.array(start + 1), **columns, **labels)
+            paths.append(path)
+        logger.info(f"Wrote {num_records} synthetic records to {len(paths)} {fmt} files in {out_dir}")
+        return paths
+    
+    def _synthetic_columns(self, rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+        """
+        Draw ``n`` records as column arrays; the CODED_LABELS columns hold
+        codes into their labels
+        """
+        # Basic demographics
+        age = np.clip(np.trunc(rng.normal(35, 12, n)), 18, 80).astype(np.int64)  # Mean age 35, std 12
+        gender = rng.integers(0, len(SYNTHETIC_LABELS['gender']), n, dtype=np.int8)
+        marital_status = rng.integers(0, len(SYNTHETIC_LABELS['marital_status']), n, dtype=np.int8)
+        
+        # Dependents based on age and marital status
+        single_young = (marital_status == MARITAL_SINGLE) & (age < 30)
+        married = marital_status == MARITAL_MARRIED
+        dependents = _choose(rng, [0.5, 0.3, 0.2], n)
+        dependents[single_young] = _choose(rng, [0.8, 0.2], single_young.sum())
+        dependents[married] = _choose(rng, [0.1, 0.3, 0.4, 0.15, 0.05], married.sum())
+        
+        # Income based on age: (age bracket, first income range, probabilities)
+        income_idx = np.empty(n, dtype=np.int8)
+        brackets = np.digitize(age, [25, 35, 50])
+        for bracket, (offset, p) in enumerate(INCOME_BY_AGE):
+            mask = brackets == bracket
+            income_idx[mask] = offset + _choose(rng, p, mask.sum())
+        income = INCOME_VALUES[income_idx]
+        
+        # Living situation affects rent and utilities (share of income per option)
+        living_situation = rng.integers(0, len(SYNTHETIC_LABELS['living_situation']), n, dtype=np.int8)
+        rent = income * _uniform_by(rng, living_situation, RENT_SHARE)
+        utilities_cost = income * _uniform_by(rng, living_situation, UTILITIES_SHARE)
+        
+        transport_mode = rng.integers(0, len(SYNTHETIC_LABELS['transport_mode']), n, dtype=np.int8)
+        transport_cost = income * _uniform_by(rng, transport_mode, TRANSPORT_SHARE)
+        
+        # Grocery costs based on family size
+        grocery_cost = income * 0.12 * (1 + dependents * 0.3)
+        mobile_internet_cost = income * rng.uniform(0.02, 0.05, n)
+        
+        # Loan payment (some people have loans)
+        has_loan = rng.random(n) < 0.3
+        loan_payment = np.where(has_loan, income * rng.uniform(0.05, 0.20, n), 0.0)
+        
+        columns = {
+            'age': age,
+            'gender': gender,
+            'marital_status': marital_status,
+            'dependents': dependents,
+            'living_situation': living_situation,
+            'transport_mode': transport_mode,
+            'monthly_income': income_idx,
+        }
+        for name in ('eating_out_frequency', 'savings', 'country', 'division', 'district'):
+            columns[name] = rng.integers(0, len(SYNTHETIC_LABELS[name]), n, dtype=np.int8)
+        columns.update({
+            'earning_member': rng.random(n) < 0.8,
+            'monthly_income_numeric': income,
+            'rent': rent,
+            'transport_cost': transport_cost,
+            'grocery_cost': grocery_cost,
+            'utilities_cost': utilities_cost,
+            'mobile_internet_cost': mobile_internet_cost,
+            'loan_payment': loan_payment,
+        })
+        return columns
+    
     def preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Preprocess the data for ML training
@@ -276,9 +347,11 @@ class StreamlinedBudgetMLTrainer:
         
         return targets
     
-    def train_models(self, df: pd.DataFrame, targets: Dict[str, pd.Series]) -> bool:
+    def train_models(self, df: pd.DataFrame, targets: Dict[str, pd.Series], n_estimators: int = 100,
+                     kind: str = 'per_category') -> bool:
         """
-        Train ML models for each expense category
+        Train ML models for each expense category; ``kind`` is a MODEL_KINDS
+        key (one forest per category, or one multi-output model)
         """
         logger.info("Training ML models...")
         
@@ -298,6 +371,9 @@ class StreamlinedBudgetMLTrainer:
         
         X = df[feature_columns]
         
+        if MODEL_KINDS[kind]:
+            return self._train_multi_output(X, targets, n_estimators, kind)
+        
         # Train models for each category
         for category in EXPENSE_CATEGORIES:
             if category not in targets:
@@ -324,7 +400,7 @@ class StreamlinedBudgetMLTrainer:
                 
                 # Train model
                 model = RandomForestRegressor(
-                    n_estimators=100,
+                    n_estimators=n_estimators,
                     random_state=42,
                     max_depth=10,
                     min_samples_split=5,
@@ -349,17 +425,31 @@ class StreamlinedBudgetMLTrainer:
         
         return len(self.models) > 0
     
-    def save_models(self, model_dir: str = "models"):
+    def _train_multi_output(self, X: pd.DataFrame, targets: Dict[str, pd.Series], n_estimators: int, kind: str) -> bool:
         """
-        Save trained models to disk
+        Train one MultiOutputBudgetModel for every category with target variance
         """
-        os.makedirs(model_dir, exist_ok=True)
+        usable = {category: targets[category] for category in EXPENSE_CATEGORIES
+                  if category in targets and targets[category].std() >= 0.01}
+        model, metrics = fit_multi_output_model(X, usable, MODEL_KINDS[kind], n_estimators)
+        for category, scores in metrics.items():
+            logger.info(f"Model for {category}: MAE={scores['mae']:.2f}, R2={scores['r2']:.3f}")
         
+        self.models = {MULTI_OUTPUT_KEY: model}
+        self.scalers = {}
+        self.model_kind = kind
+        return True
+    
+    def save_models(self, model_dir: str = "models"):
+        """
+        Publish trained models as a new version in the model registry
+        """
         try:
-            joblib.dump(self.models, f'{model_dir}/budget_models.pkl')
-            joblib.dump(self.scalers, f'{model_dir}/budget_scalers.pkl')
-            joblib.dump(self.label_encoders, f'{model_dir}/budget_encoders.pkl')
-            logger.info(f"Models saved successfully to {model_dir}")
+            version = ModelRegistry(os.path.abspath(model_dir)).publish(
+                self.models, self.scalers, self.label_encoders,
+                {'trainer': 'streamlined_train_budget_models', 'model_kind': self.model_kind}
+            )
+            logger.info(f"Models saved successfully to {model_dir} as version {version}")
         except Exception as e:
             logger.error(f"Error saving models: {e}")
     
@@ -394,6 +484,12 @@ class StreamlinedBudgetMLTrainer:
             'total_budget': 0
         }
         
+        if MULTI_OUTPUT_KEY in self.models:
+            for category, values in self.models[MULTI_OUTPUT_KEY].predict_categories(user_features).items():
+                predicted_amount = max(0, values[0])
+                budget['categories'][category] = round(predicted_amount, 2)
+                budget['total_budget'] += predicted_amount
+        
         for category in EXPENSE_CATEGORIES:
             if category in self.models:
                 try:
@@ -426,7 +522,7 @@ class StreamlinedBudgetMLTrainer:
         
         return budget
 
-def main():
+def main(kind: str = 'per_category'):
     """
     Main training function
     """
@@ -453,7 +549,7 @@ def main():
         
         # Step 4: Train models
         print("\n4. Training ML models...")
-        success = trainer.train_models(df, targets)
+        success = trainer.train_models(df, targets, kind=kind)
         
         if success:
             print(f"✓ Successfully trained {len(trainer.models)} models")
@@ -471,7 +567,9 @@ def main():
             print(f"\n🎉 Training completed successfully!")
             print(f"   - Trained models: {len(trainer.models)}")
             print(f"   - Training data: {len(df)} records")
-            print(f"   - Categories covered: {', '.join(trainer.models.keys())}")
+            categories = (trainer.models[MULTI_OUTPUT_KEY].categories if MULTI_OUTPUT_KEY in trainer.models
+                          else trainer.models.keys())
+            print(f"   - Categories covered: {', '.join(categories)}")
             
         else:
             print("✗ Model training failed")
@@ -485,4 +583,7 @@ def main():
     return True
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Train the budget models on synthetic data')
+    parser.add_argument('--kind', choices=list(MODEL_KINDS), default='per_category',
+                        help='One forest per category, or one multi-output model')
+    main(parser.parse_args().kind)